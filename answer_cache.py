@@ -0,0 +1,291 @@
+"""
+回答缓存模块
+把已完成的 LLM 回答持久化到 ~/.floating_word_explainer/，重复划词直接秒出、不再计费
+
+缓存键 = 规范化后的选中文本 + 上下文哈希 + 模型名 + Prompt 模板哈希
+淘汰策略：TTL 过期 + LRU（按最近访问时间）+ 条数 / 体积上限
+
+读取在调用方线程（通常是 UI 线程）只做一次 SELECT；写入、访问时间更新和淘汰
+都交给后台线程批量进行（与 history_store 相同），WAL 模式下读写互不阻塞
+"""
+
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+
+from config import CONFIG_DIR
+
+CACHE_FILE = CONFIG_DIR / "answer_cache.sqlite3"
+
+_STOP = object()
+
+
+def normalize_selection(text: str) -> str:
+    """规范化选中文本：去首尾空白、合并连续空白（保留大小写：US / us、Polish / polish 含义不同）"""
+    return " ".join(text.split())
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(selection: str, context: str, model_name: str, prompt: str) -> str:
+    parts = [
+        normalize_selection(selection),
+        _sha256(context.strip()),
+        model_name.strip(),
+        _sha256(prompt),
+    ]
+    return _sha256("\x1f".join(parts))
+
+
+class AnswerCache:
+    """
+    回答缓存（SQLite 持久化）。
+
+    标准解释：
+    只缓存正常结束的回答（取消或出错的流不会写入）。get() 只读：检查 TTL，
+    命中后把访问时间记在内存里；put() 只把回答放进队列并记入待写表，立即返回。
+    写入线程攒一批后在一个事务里写入新回答、刷新访问时间，再按 LRU 淘汰，
+    直到条数和总字节数都回到上限以内。连接使用 WAL + synchronous=NORMAL，
+    不在 UI 线程上等磁盘 fsync。
+
+    小学生解释：
+    同一个生词你一天要查好几十次，AI 老爷爷每次都要重新想、还要收钱。
+    现在我们把他的回答抄在小本子上，下次直接翻本子给你看。
+    抄本子的活交给小书童攒着一起抄，你这边翻本子一点也不耽误。
+    """
+
+    def __init__(
+        self,
+        path=CACHE_FILE,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 2000,
+        max_bytes: int = 20 * 1024 * 1024,
+        batch_size: int = 32,
+        flush_interval: float = 0.5,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        # 已放进队列、还没写入的回答：key -> (answer, created_at)
+        self._pending: dict[str, tuple[str, float]] = {}
+        # 命中后待刷新的访问时间：key -> accessed_at
+        self._touched: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "AnswerCache":
+        return cls(
+            ttl_seconds=float(config.get("answer_cache_ttl_hours", 168)) * 3600,
+            max_entries=int(config.get("answer_cache_max_entries", 2000)),
+            max_bytes=int(float(config.get("answer_cache_max_mb", 20)) * 1024 * 1024),
+        )
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                selection TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_answers_accessed ON answers(accessed_at)"
+        )
+        conn.commit()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._open()
+        return self._conn
+
+    # ==================== 读取 ====================
+
+    def get(self, key: str) -> str | None:
+        """查缓存：只读，过期的条目视为未命中（由写入线程删除）"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._pending.get(key)
+                if row is None:
+                    row = self._connect().execute(
+                        "SELECT answer, created_at FROM answers WHERE key = ?", (key,)
+                    ).fetchone()
+                if row is None or now - row[1] > self.ttl_seconds:
+                    self.misses += 1
+                    return None
+                self._touched[key] = now
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error:
+            return None
+
+    # ==================== 写入 ====================
+
+    def put(self, key: str, selection: str, answer: str) -> None:
+        """（任意线程）缓存一个回答，立即返回；实际写入由后台线程批量完成"""
+        if not answer.strip():
+            return
+        now = time.time()
+        size = len(answer.encode("utf-8")) + len(selection.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pending[key] = (answer, now)
+            self._touched.pop(key, None)
+        self._ensure_writer()
+        self._queue.put((key, selection, answer, size, now, now))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待队列里已有的回答和访问时间全部写入"""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="answer-cache-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self):
+        try:
+            conn = self._open()
+        except sqlite3.Error:
+            conn = None
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # 攒一批：到达上限、超时或遇到 flush / 停止信号就写
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if isinstance(item, tuple)]
+            with self._lock:
+                touched, self._touched = self._touched, {}
+            if conn is not None and (rows or touched):
+                try:
+                    with conn:
+                        self._write_batch(conn, rows, touched)
+                except sqlite3.Error:
+                    pass
+            if rows:
+                with self._lock:
+                    for row in rows:
+                        # 队列里同一个键有更新的回答时保留待写记录
+                        if self._pending.get(row[0], (None, None))[1] == row[4]:
+                            del self._pending[row[0]]
+
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    item.set()
+        if conn is not None:
+            conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, rows: list[tuple], touched: dict):
+        conn.executemany(
+            "INSERT OR REPLACE INTO answers "
+            "(key, selection, answer, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.executemany(
+            "UPDATE answers SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in touched.items()],
+        )
+        if rows:
+            self._evict(conn, time.time())
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        conn.execute(
+            "DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM answers ORDER BY accessed_at ASC"
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM answers WHERE key = ?", victims)
+
+    def clear(self) -> None:
+        self.flush()
+        try:
+            with self._lock:
+                self._pending.clear()
+                self._touched.clear()
+                conn = self._connect()
+                conn.execute("DELETE FROM answers")
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        """写完队列里剩余的回答（和待刷新的访问时间）后停止写入线程，关闭连接"""
+        if self._touched:
+            self._ensure_writer()
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join(timeout=5)
+
+    def stats(self) -> dict:
+        try:
+            with self._lock:
+                count, total = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers"
+                ).fetchone()
+        except sqlite3.Error:
+            count, total = 0, 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "bytes": total,
+        }
@@ -0,0 +1,233 @@
+"""
+异步 LLM 流式调用客户端
+在专用事件循环线程上用 httpx.AsyncClient 发请求，多个流可以同时进行；
+取消直接取消 asyncio 任务，正在等待的 socket 读取立即中止
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import httpx
+
+import http_pool
+from llm_client import BaseStreamWorker
+from sse_parser import SSEDecoder
+
+
+class AsyncRuntime:
+    """
+    异步运行时：一个常驻事件循环线程 + 按接口地址复用的 httpx.AsyncClient。
+
+    标准解释：
+    首次使用时启动守护线程运行事件循环；submit() 把协程投递到循环里并返回
+    concurrent.futures.Future，对它调用 cancel() 会取消对应的 asyncio 任务。
+    客户端的连接池参数与同步连接池（http_pool）共用一套配置，
+    连接复用统计也记在同一处。
+
+    小学生解释：
+    同步版是"一个快递员一次只送一单"；异步版是一个超能快递员，
+    同时拿着好几单，哪单的门先开就先送哪单，不想送了随时能撂下。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._clients: dict[tuple[str, str], httpx.AsyncClient] = {}
+        # 已被替换、但可能还有请求在读取响应的旧客户端：空闲后再关闭
+        self._retired: list[httpx.AsyncClient] = []
+        self._last_used: dict[tuple[str, str], float] = {}
+        self._options_key = None
+
+    # ==================== 事件循环 ====================
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            ready = threading.Event()
+            loop = asyncio.new_event_loop()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name="llm-asyncio", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    # ==================== 客户端 ====================
+
+    def get_client(self, api_base_url: str, api_key: str) -> httpx.AsyncClient:
+        """（只能在事件循环线程里调用）获取共享的异步客户端"""
+        key = (api_base_url.rstrip("/"), http_pool.fingerprint(api_key))
+        options = http_pool.client_options()
+        limits = options["limits"]
+        options_key = (
+            options["timeout"],
+            limits.max_connections,
+            limits.max_keepalive_connections,
+            limits.keepalive_expiry,
+            options["http2"],
+        )
+        if options_key != self._options_key:
+            # 连接池配置变了：换下旧客户端（进行中的请求结束后再关闭），按新参数重建
+            self._options_key = options_key
+            self._retired.extend(self._clients.values())
+            self._clients.clear()
+            self._last_used.clear()
+        self._last_used[key] = time.monotonic()
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            for stale in [k for k in self._clients if k[0] == key[0]]:
+                self._retired.append(self._clients.pop(stale))
+            client = httpx.AsyncClient(**options)
+            self._clients[key] = client
+        if self._retired:
+            # 顺带关闭已经用完的旧客户端
+            idle = [c for c in self._retired if http_pool.is_idle(c)]
+            self._retired = [c for c in self._retired if c not in idle]
+            for old in idle:
+                asyncio.ensure_future(old.aclose())
+        return client
+
+    def warm_up(self, api_base_url: str, api_key: str, if_idle: bool = False):
+        """
+        后台预热异步客户端的连接；if_idle=True 时最近用过的端点跳过
+        （与 http_pool.ensure_warm 的判断一致）。
+        _last_used 只由事件循环线程读写，判断也放到循环里做。
+        """
+        if not api_base_url or not api_key:
+            return
+
+        async def _run():
+            if if_idle:
+                key = (api_base_url.rstrip("/"), http_pool.fingerprint(api_key))
+                expiry = http_pool.client_options()["limits"].keepalive_expiry or 0
+                last_used = self._last_used.get(key)
+                if last_used is not None and time.monotonic() - last_used < expiry / 2:
+                    return
+            try:
+                client = self.get_client(api_base_url, api_key)
+                tracker, _ = http_pool.track_request()
+                await client.head(
+                    api_base_url.rstrip("/"),
+                    extensions={"trace": _async_trace(tracker)},
+                )
+                http_pool.record(tracker)
+            except Exception:
+                pass
+
+        self.submit(_run())
+
+    def shutdown(self):
+        """关闭所有客户端并停止事件循环"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+
+        async def _close():
+            clients = list(self._clients.values()) + self._retired
+            self._clients.clear()
+            self._retired = []
+            await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(_close(), loop)
+
+
+def _async_trace(tracker):
+    """httpcore 异步模式要求 trace 扩展是协程函数，这里包一层"""
+
+    async def trace(event_name: str, info: dict):
+        tracker(event_name, info)
+
+    return trace
+
+
+# 进程内唯一的异步运行时
+runtime = AsyncRuntime()
+
+
+class AsyncLLMStreamWorker(BaseStreamWorker):
+    """
+    在异步运行时里调用 LLM API，逐 token 发送给 UI。
+
+    与 LLMStreamWorker 的信号、构造参数、start / cancel / isRunning / wait 完全一致，
+    区别在于：多个请求共用一个事件循环线程并发执行；cancel() 取消 asyncio 任务，
+    正在等待的读取（包括还没收到响应头的请求）立即中止。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._future: concurrent.futures.Future | None = None
+
+    def start(self):
+        self._future = runtime.submit(self._run())
+
+    def isRunning(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def wait(self, msecs: int = 2000) -> bool:
+        """（仅供脚本 / 基准测试使用）等待任务结束"""
+        if self._future is None:
+            return True
+        done, _ = concurrent.futures.wait([self._future], timeout=msecs / 1000)
+        return bool(done)
+
+    def cancel(self):
+        super().cancel()
+        if self._future is not None:
+            self._future.cancel()
+
+    async def _run(self):
+        trace = self._trace
+        trace.mark("llm.request_start")
+        url, headers, payload = self._build_request()
+
+        try:
+            client = runtime.get_client(self.api_base_url, self.api_key)
+            tracker, _ = http_pool.track_request(self._on_http_event)
+            async with client.stream(
+                "POST",
+                url,
+                headers=headers,
+                json=payload,
+                extensions={"trace": _async_trace(tracker)},
+            ) as response:
+                http_pool.record(tracker)
+                trace.set("new_connection", tracker.new_connection)
+                if response.status_code != 200:
+                    error_body = (await response.aread()).decode("utf-8", errors="replace")
+                    self._emit_status_error(response.status_code, error_body)
+                    return
+
+                decoder = SSEDecoder()
+                async for chunk in response.aiter_bytes():
+                    trace.mark("llm.first_byte")
+                    self._handle_events(decoder.feed(chunk))
+                    if decoder.done:
+                        break
+                else:
+                    self._handle_events(decoder.flush())
+
+            self._finish(decoder)
+
+        except Exception as e:
+            # asyncio.CancelledError 不是 Exception 的子类，取消时直接向上抛出
+            if not self._cancelled:
+                self.error_occurred.emit(self._describe_error(e))
+
+
+def shutdown() -> None:
+    runtime.shutdown()
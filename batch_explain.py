@@ -0,0 +1,414 @@
+"""
+批量解释（无界面模式）
+使用与桌面端相同的 Prompt 模板和端点配置，批量预先生成术语解释（例如新人入门词汇表）
+
+- 输入：文本文件或标准输入（-）。每行一个术语，可用制表符分隔附带上下文：术语<TAB>上下文；
+  也可以是 .jsonl，每行 {"text": "...", "context": "..."}。空行和以 # 开头的行忽略
+- 并发：最多 --concurrency 个请求同时进行，每个端点按 rpm 限速（配置里的 rpm 优先，否则用 --rpm）
+- 输出：每完成一条就追加一行 JSONL；中断后用同一命令重跑，已成功的条目自动跳过
+- 成功的回答同时写入桌面端的回答缓存，之后在桌面端划到这些词直接秒出
+- 结束时报告吞吐（条/分钟）和 token 用量
+
+用法：
+    python batch_explain.py glossary.txt -o glossary.jsonl
+    python batch_explain.py terms.jsonl -o out.jsonl --concurrency 8 --rpm 60
+    cat terms.txt | python batch_explain.py - -o out.jsonl --no-cache
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+import http_pool
+import prompt_builder
+from answer_cache import AnswerCache, make_key
+from chat_request import build_request, cached_tokens
+from config import load_config
+from endpoint_pool import Endpoint, EndpointPool
+from sse_parser import DONE, SSEDecoder, extract_content, extract_usage
+
+# 值得换个端点 / 稍后重试的 HTTP 状态码
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def read_items(source: str) -> list[dict]:
+    """读取输入，返回 [{"text": ..., "context": ...}]，保持原有顺序"""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+        is_jsonl = False
+    else:
+        lines = Path(source).read_text(encoding="utf-8").splitlines()
+        is_jsonl = source.endswith(".jsonl")
+
+    items = []
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if is_jsonl:
+            data = json.loads(line)
+            text = data.get("text") or data.get("term") or ""
+            context = data.get("context") or ""
+        else:
+            text, _, context = line.partition("\t")
+        if text.strip():
+            items.append({"text": text.strip(), "context": context.strip()})
+    return items
+
+
+def load_finished(path: Path) -> set[str]:
+    """已经成功写入输出文件的条目（按缓存键），续跑时跳过"""
+    finished = set()
+    if not path.exists():
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 上次中断时写了一半的行
+                continue
+            if record.get("answer") and not record.get("error"):
+                finished.add(record["key"])
+    return finished
+
+
+class RateLimiter:
+    """按端点限速：相邻两次请求的发出时间至少间隔 60 / rpm 秒"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        # 事件循环是单线程的：先占好自己的发出时刻，再睡到那一刻
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class RequestError(Exception):
+    def __init__(self, message: str, retry: bool):
+        super().__init__(message)
+        self.retry = retry
+
+
+class BatchExplainer:
+    """
+    批量解释执行器。
+
+    标准解释：
+    在一个事件循环里用 httpx.AsyncClient 并发请求，信号量限制同时进行的请求数，
+    每个端点一个限速器。端点按桌面端同样的权重选择；超时、429、5xx 会记入端点失败
+    并换端点重试，401 / 404 等直接记为失败。每条结果一完成就追加写入 JSONL。
+
+    小学生解释：
+    老师一下子发了一百个生词让 AI 解释。我们同时派几个小跑腿去问，
+    每家 AI 每分钟只能问那么多次；哪个跑腿问到了答案，马上抄进本子里。
+    本子写到一半停电了也没关系，下次接着没问完的继续问。
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        output,
+        concurrency: int = 4,
+        default_rpm: float = 0.0,
+        retries: int = 2,
+        cache: AnswerCache | None = None,
+    ):
+        self.config = config
+        self.prompt = config.get("default_prompt", "请简明扼要地解释以下内容：\n\n{text}")
+        self.model_name = config.get("model_name", "deepseek-chat")
+        self.output = output
+        self.concurrency = max(1, concurrency)
+        self.default_rpm = default_rpm
+        self.retries = max(0, retries)
+        self.cache = cache
+        self.pool = EndpointPool()
+        self.pool.configure(config)
+        self._limiters: dict[tuple[str, str], RateLimiter] = {}
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self.results: list[dict] = []
+
+    def key_for(self, item: dict) -> str:
+        # 与桌面端查缓存时的键一致，预生成的回答才能被桌面端命中
+        return make_key(item["text"], item["context"], self.model_name, self.prompt)
+
+    async def run(self, items: list[dict]):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        total = len(items)
+
+        async def _one(index: int, item: dict):
+            async with semaphore:
+                record = await self._explain(item)
+            self._write(record)
+            mark = "✓" if not record["error"] else "✗"
+            detail = record["error"] or f"{record['elapsed_ms'] / 1000:.1f}s"
+            print(f"[{index}/{total}] {mark} {item['text'][:40]} ({detail})", file=sys.stderr)
+
+        try:
+            await asyncio.gather(*(_one(i, item) for i, item in enumerate(items, 1)))
+        finally:
+            for client in self._clients.values():
+                await client.aclose()
+
+    # ==================== 单条 ====================
+
+    async def _explain(self, item: dict) -> dict:
+        record = {
+            "key": self.key_for(item),
+            "text": item["text"],
+            "context": item["context"],
+            "answer": "",
+            "model": "",
+            "endpoint": "",
+            "attempts": 0,
+            "elapsed_ms": 0.0,
+            "ttft_ms": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "tokens_estimated": False,
+            "error": "",
+        }
+        tried: list[Endpoint] = []
+        started = time.monotonic()
+        for attempt in range(self.retries + 1):
+            endpoint = self._choose(tried)
+            if endpoint is None:
+                record["error"] = record["error"] or "没有可用的端点"
+                break
+            tried.append(endpoint)
+            record["attempts"] = attempt + 1
+            await self._limiter(endpoint).acquire()
+            try:
+                answer, usage, ttft_ms, prompt_tokens = await self._request(endpoint, item)
+            except RequestError as e:
+                self.pool.record_failure(endpoint)
+                record["error"] = str(e)
+                if not e.retry:
+                    break
+                await asyncio.sleep(min(2**attempt, 10))
+                continue
+
+            record.update(
+                answer=answer,
+                model=endpoint.model_name,
+                endpoint=endpoint.name,
+                ttft_ms=ttft_ms,
+                error="",
+            )
+            if usage:
+                record["prompt_tokens"] = int(usage.get("prompt_tokens") or 0)
+                record["completion_tokens"] = int(usage.get("completion_tokens") or 0)
+                record["cached_tokens"] = cached_tokens(usage)
+            else:
+                # 服务端没返回 usage：用发送前的分词计数
+                record["prompt_tokens"] = prompt_tokens
+                record["completion_tokens"] = prompt_builder.count_tokens(
+                    answer, endpoint.model_name
+                )
+                record["tokens_estimated"] = True
+            if self.cache is not None:
+                # 重试可能换到另一个模型的端点：按实际回答的模型写缓存，
+                # 不能记到默认模型名下（record["key"] 只用于断点续跑时识别条目）
+                cache_key = make_key(
+                    item["text"], item["context"], endpoint.model_name, self.prompt
+                )
+                self.cache.put(cache_key, item["text"], answer)
+            break
+
+        record["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return record
+
+    def _choose(self, tried: list[Endpoint]) -> Endpoint | None:
+        # 重试时优先换一个还没试过的端点，都试过了再回到按权重选择
+        if tried:
+            candidate = self.pool.hedge_candidate(tried)
+            if candidate is not None:
+                return candidate
+        return self.pool.choose()
+
+    def _limiter(self, endpoint: Endpoint) -> RateLimiter:
+        limiter = self._limiters.get(endpoint.key)
+        if limiter is None:
+            limiter = RateLimiter(endpoint.rpm or self.default_rpm)
+            self._limiters[endpoint.key] = limiter
+        return limiter
+
+    def _client(self, endpoint: Endpoint) -> httpx.AsyncClient:
+        client = self._clients.get(endpoint.api_base_url)
+        if client is None:
+            client = httpx.AsyncClient(**http_pool.client_options())
+            self._clients[endpoint.api_base_url] = client
+        return client
+
+    async def _request(
+        self, endpoint: Endpoint, item: dict
+    ) -> tuple[str, dict | None, float, int]:
+        """发出一次流式请求，返回 (回答, usage, 首 token 毫秒数, 发送前统计的 Prompt token 数)"""
+        built = prompt_builder.build(
+            self.prompt, item["text"], item["context"], endpoint.model_name
+        )
+        url, headers, payload = build_request(
+            endpoint.api_base_url, endpoint.api_key, endpoint.model_name, built.messages
+        )
+
+        parts: list[str] = []
+        usage = None
+        ttft_ms = None
+        start = time.monotonic()
+
+        def handle(events: list[bytes]):
+            nonlocal usage, ttft_ms
+            for data in events:
+                if data == DONE:
+                    return
+                try:
+                    content = extract_content(data)
+                    usage = extract_usage(data) or usage
+                except ValueError:
+                    continue
+                if content:
+                    if ttft_ms is None:
+                        ttft_ms = (time.monotonic() - start) * 1000
+                        self.pool.record_first_token(endpoint, ttft_ms, won=True)
+                    parts.append(content)
+
+        self.pool.record_start(endpoint)
+        try:
+            async with self._client(endpoint).stream(
+                "POST", url, headers=headers, json=payload
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise RequestError(
+                        f"HTTP {response.status_code}：{body[:200]}",
+                        retry=response.status_code in RETRY_STATUS,
+                    )
+                decoder = SSEDecoder()
+                async for chunk in response.aiter_bytes():
+                    handle(decoder.feed(chunk))
+                    if decoder.done:
+                        break
+                else:
+                    handle(decoder.flush())
+        except httpx.TimeoutException:
+            raise RequestError("请求超时", retry=True)
+        except httpx.TransportError as e:
+            raise RequestError(f"网络错误：{e}", retry=True)
+
+        answer = "".join(parts)
+        if not answer.strip():
+            raise RequestError("服务端返回了空回答", retry=True)
+        return answer, usage, round(ttft_ms, 1), built.prompt_tokens
+
+    # ==================== 输出 ====================
+
+    def _write(self, record: dict):
+        self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output.flush()
+        self.results.append(record)
+
+    def report(self, elapsed: float, skipped: int) -> str:
+        ok = [r for r in self.results if not r["error"]]
+        failed = len(self.results) - len(ok)
+        prompt_tokens = sum(r["prompt_tokens"] for r in ok)
+        completion_tokens = sum(r["completion_tokens"] for r in ok)
+        cached = sum(r.get("cached_tokens", 0) for r in ok)
+        estimated = sum(1 for r in ok if r["tokens_estimated"])
+        per_minute = len(ok) / elapsed * 60 if elapsed else 0.0
+
+        lines = [
+            f"完成 {len(ok)} 条 / 失败 {failed} 条 / 跳过 {skipped} 条（已完成或重复），"
+            f"用时 {elapsed:.1f} 秒，吞吐 {per_minute:.1f} 条/分钟",
+            f"token 用量：输入 {prompt_tokens}，输出 {completion_tokens}，"
+            f"合计 {prompt_tokens + completion_tokens}"
+            + (f"（其中 {estimated} 条为估算）" if estimated else ""),
+        ]
+        if cached:
+            lines.append(
+                f"前缀缓存命中：{cached} 个输入 token（{cached / max(prompt_tokens, 1):.0%}）"
+            )
+        ttfts = sorted(r["ttft_ms"] for r in ok if r["ttft_ms"] is not None)
+        if ttfts:
+            lines.append(
+                f"首 token：p50 {ttfts[len(ttfts) // 2]:.0f}ms，"
+                f"p95 {ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))]:.0f}ms"
+            )
+        by_endpoint: dict[str, int] = {}
+        for r in ok:
+            by_endpoint[r["endpoint"]] = by_endpoint.get(r["endpoint"], 0) + 1
+        for name, count in sorted(by_endpoint.items()):
+            lines.append(f"端点 {name}：{count} 条")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="输入文件（.txt / .tsv / .jsonl），- 表示标准输入")
+    parser.add_argument("-o", "--output", required=True, help="输出 JSONL 文件（追加写入）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的请求数")
+    parser.add_argument(
+        "--rpm", type=float, default=0, help="配置里没设 rpm 的端点每分钟请求上限（0 = 不限）"
+    )
+    parser.add_argument("--retries", type=int, default=2, help="超时 / 429 / 5xx 的重试次数")
+    parser.add_argument("--no-cache", action="store_true", help="不写入桌面端的回答缓存")
+    parser.add_argument("--no-resume", action="store_true", help="不跳过输出文件里已完成的条目")
+    args = parser.parse_args()
+
+    config = load_config()
+    http_pool.configure(config)
+    prompt_builder.configure(config)
+    cache = None
+    if not args.no_cache and config.get("answer_cache_enabled", True):
+        cache = AnswerCache.from_config(config)
+
+    output_path = Path(args.output)
+    with open(output_path, "a", encoding="utf-8") as output:
+        explainer = BatchExplainer(
+            config,
+            output,
+            concurrency=args.concurrency,
+            default_rpm=args.rpm,
+            retries=args.retries,
+            cache=cache,
+        )
+        if not explainer.pool.endpoints:
+            sys.exit("还没有配置 API Key：请先在桌面端设置里填写，或设置 API_KEY 环境变量")
+        # 开始发送前加载好分词器，避免前几条请求按估算值计数
+        prompt_builder.preload_tokenizers(e.model_name for e in explainer.pool.endpoints)
+
+        items = read_items(args.input)
+        finished = set() if args.no_resume else load_finished(output_path)
+        # 输入里重复的条目只请求一次
+        pending, seen = [], set(finished)
+        for item in items:
+            key = explainer.key_for(item)
+            if key not in seen:
+                seen.add(key)
+                pending.append(item)
+        skipped = len(items) - len(pending)
+
+        start = time.monotonic()
+        try:
+            asyncio.run(explainer.run(pending))
+        except KeyboardInterrupt:
+            print("\n已中断：已完成的条目都已写入，重跑同一命令即可继续", file=sys.stderr)
+        finally:
+            if cache is not None:
+                cache.close()
+        print(explainer.report(time.monotonic() - start, skipped))
+
+
+if __name__ == "__main__":
+    main()
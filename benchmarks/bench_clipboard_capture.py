@@ -0,0 +1,77 @@
+"""
+剪贴板获取延迟基准测试
+用内存剪贴板模拟"目标程序 N 毫秒后才完成复制"，对比旧的固定 sleep 与事件等待
+
+用法：
+    python benchmarks/bench_clipboard_capture.py
+    python benchmarks/bench_clipboard_capture.py --app-delays 5 30 120 --runs 20
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clipboard_waiter import ClipboardWaiter, FakeClipboardBackend  # noqa: E402
+
+# 旧实现中选中文本 / 全选两个阶段的固定等待
+LEGACY_SELECTION_SLEEPS = (0.05, 0.2)
+LEGACY_SELECT_ALL_SLEEPS = (0.05, 0.1, 0.25, 0.05)
+
+
+def legacy_capture(backend: FakeClipboardBackend, text: str, app_delay: float, sleeps):
+    """旧路径：固定 sleep 之后读剪贴板，程序太慢时拿到的是空文本"""
+    backend.set_text("")
+    time.sleep(sleeps[0])
+    backend.simulate_copy(text, app_delay)
+    for pause in sleeps[1:]:
+        time.sleep(pause)
+    return backend.get_text()
+
+
+def waiter_capture(waiter: ClipboardWaiter, text: str, app_delay: float, strategy: str):
+    sequence = waiter.clear()
+    waiter.backend.simulate_copy(text, app_delay)
+    return waiter.wait_for_text(sequence, 0.8, strategy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-delays", type=float, nargs="+", default=[5, 30, 120, 400])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'程序延迟(ms)':>12} | {'阶段':<10} | {'旧路径(ms)':>10} | {'旧路径丢失':>8} | {'事件等待(ms)':>12}")
+    print("-" * 66)
+    for delay_ms in args.app_delays:
+        delay = delay_ms / 1000
+        for stage, sleeps in (
+            ("selection", LEGACY_SELECTION_SLEEPS),
+            ("select_all", LEGACY_SELECT_ALL_SLEEPS),
+        ):
+            backend = FakeClipboardBackend()
+            legacy_total = 0.0
+            legacy_missed = 0
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                if not legacy_capture(backend, "hello", delay, sleeps):
+                    legacy_missed += 1
+                legacy_total += time.perf_counter() - start
+                time.sleep(delay)  # 等上一次模拟复制落地，避免干扰下一轮
+
+            waiter = ClipboardWaiter(FakeClipboardBackend())
+            for _ in range(args.runs):
+                waiter_capture(waiter, "hello", delay, stage)
+            stats = waiter.latency_stats()[stage]
+
+            print(
+                f"{delay_ms:>12.0f} | {stage:<10} | "
+                f"{legacy_total / args.runs * 1000:>10.1f} | "
+                f"{legacy_missed:>4}/{args.runs:<3} | {stats['avg_ms']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+上下文选择基准测试
+在模拟长页面上对比"取前 5000 字符截断"与"以选中内容为中心的预算窗口"：
+prompt token 数、选中内容是否落在上下文中、选择耗时；
+提供 --api-key 时还会对真实接口测量首 token 时间（TTFT）
+
+用法：
+    python benchmarks/bench_context_selection.py
+    python benchmarks/bench_context_selection.py --budget 1000 --api-key sk-xxx
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from context_selector import estimate_tokens, select_context  # noqa: E402
+
+LEGACY_MAX_CHARS = 5000
+
+_EN_SENTENCES = [
+    "The scheduler assigns each task to the least loaded worker.",
+    "Latency is dominated by the time spent waiting on the network.",
+    "A closure keeps a reference to the variables of its enclosing scope.",
+    "Backpressure prevents a fast producer from overwhelming a slow consumer.",
+    "The cache is invalidated whenever the upstream document changes.",
+]
+_ZH_SENTENCES = [
+    "调度器会把每个任务分配给负载最低的工作线程。",
+    "延迟主要消耗在等待网络返回的时间上。",
+    "背压机制可以防止生产者压垮处理较慢的消费者。",
+    "只要上游文档发生变化，缓存就会失效。",
+    "连接复用能够省掉重复的握手开销。",
+]
+
+
+def make_page(sentences: list[str], paragraphs: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(sentences) for _ in range(rng.randint(4, 9)))
+        for _ in range(paragraphs)
+    ]
+
+
+def build_corpus() -> list[tuple[str, str, str]]:
+    """返回 [(名称, 整页文本, 选中内容)]：选中内容分别位于页面前部 / 中部 / 尾部"""
+    corpus = []
+    for lang, sentences, term in (
+        ("en", _EN_SENTENCES, "speculative decoding"),
+        ("zh", _ZH_SENTENCES, "推测解码"),
+    ):
+        paragraphs = make_page(sentences, 240, seed=len(lang))
+        for where, ratio in (("head", 0.05), ("middle", 0.5), ("tail", 0.92)):
+            page = list(paragraphs)
+            index = int(len(page) * ratio)
+            page[index] = f"{page[index]} {term} {page[index]}"
+            corpus.append((f"{lang}-{where}", "\n\n".join(page), term))
+    return corpus
+
+
+def measure_ttft(args, context: str, selection: str) -> float:
+    """对真实接口发送一次流式请求，返回首个内容 token 的耗时（秒）"""
+    import httpx
+
+    prompt = Path(__file__).resolve().parent.parent.joinpath("system_prompt.txt")
+    full_prompt = prompt.read_text(encoding="utf-8").replace("{text}", selection)
+    full_prompt = full_prompt.replace("{context}", context)
+    payload = {
+        "model": args.model,
+        "messages": [{"role": "user", "content": full_prompt}],
+        "stream": True,
+        "max_tokens": 1,
+    }
+    headers = {"Authorization": f"Bearer {args.api_key}"}
+    start = time.perf_counter()
+    with httpx.Client(timeout=60.0) as client:
+        with client.stream(
+            "POST",
+            f"{args.base_url.rstrip('/')}/v1/chat/completions",
+            headers=headers,
+            json=payload,
+        ) as response:
+            for line in response.iter_lines():
+                if line.startswith("data: ") and '"content"' in line:
+                    return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--no-relevance", action="store_true")
+    parser.add_argument("--api-key", default="")
+    parser.add_argument("--base-url", default="https://api.deepseek.com")
+    parser.add_argument("--model", default="deepseek-chat")
+    args = parser.parse_args()
+
+    header = (
+        f"{'页面':<10} | {'截断 tokens':>11} | {'截断含选中':>8} | "
+        f"{'窗口 tokens':>11} | {'窗口含选中':>8} | {'选择耗时(ms)':>12}"
+    )
+    if args.api_key:
+        header += f" | {'截断 TTFT':>9} | {'窗口 TTFT':>9}"
+    print(header)
+    print("-" * 96)
+
+    for name, page, term in build_corpus():
+        legacy = page[:LEGACY_MAX_CHARS]
+        start = time.perf_counter()
+        windowed = select_context(
+            page, term, token_budget=args.budget, relevance=not args.no_relevance
+        )
+        elapsed = time.perf_counter() - start
+        row = (
+            f"{name:<10} | {estimate_tokens(legacy):>11} | {str(term in legacy):>8} | "
+            f"{estimate_tokens(windowed):>11} | {str(term in windowed):>8} | "
+            f"{elapsed * 1000:>12.2f}"
+        )
+        if args.api_key:
+            row += (
+                f" | {measure_ttft(args, legacy, term):>8.2f}s"
+                f" | {measure_ttft(args, windowed, term):>8.2f}s"
+            )
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
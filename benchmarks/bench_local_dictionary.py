@@ -0,0 +1,143 @@
+"""
+本地词典基准测试
+生成一个 100 万词条以上的模拟词典（或导入 --source 指定的真实词典），
+报告索引生成耗时与体积、打开耗时，以及精确 / 变形表 / 规则还原 / 未命中 / 前缀
+几类查询的延迟分布（微秒）
+
+用法：
+    python benchmarks/bench_local_dictionary.py
+    python benchmarks/bench_local_dictionary.py --entries 3000000 --queries 50000
+    python benchmarks/bench_local_dictionary.py --source ecdict.csv --json dict.json
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import local_dictionary  # noqa: E402
+from dictionary_builder import build_index, read_source  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+_POS = ("n.", "v.", "adj.", "adv.")
+
+
+def synthetic_entries(count: int, seed: int):
+    """随机拼出 count 个不重复的英文词条；约 1/5 带变形表（过去式 / 进行时）"""
+    rng = random.Random(seed)
+    seen = set()
+    while len(seen) < count:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 14)))
+        if word in seen:
+            continue
+        seen.add(word)
+        forms = [word + "ed", word + "ing"] if len(seen) % 5 == 0 else []
+        translation = f"{rng.choice(_POS)} 释义{len(seen)}\n{rng.choice(_POS)} 用法{len(seen)}"
+        yield word, word, translation, f"definition of {word}", "cet4" if len(seen) % 7 else "", forms
+
+
+def make_queries(path: Path, count: int, seed: int) -> dict[str, list[str]]:
+    """从索引里抽样出各类查询"""
+    rng = random.Random(seed)
+    dictionary = local_dictionary.LocalDictionary(path)
+    try:
+        indexes = [rng.randrange(dictionary.entries) for _ in range(count)]
+        words = [dictionary._fields(i)[0] for i in indexes]
+        forms = [
+            dictionary._form_key(rng.randrange(dictionary.forms)).decode("utf-8")
+            for _ in range(count)
+        ] if dictionary.forms else []
+    finally:
+        dictionary.close()
+    ascii_words = [w for w in words if w.isascii() and w.isalpha() and len(w) >= 3]
+    return {
+        "exact": words,
+        "form": forms,
+        "lemma": [w + "s" for w in ascii_words],
+        "miss": ["".join(rng.choices("qxz", k=rng.randint(5, 12))) for _ in range(count)],
+        "prefix": [w[: max(2, len(w) // 2)] for w in words],
+    }
+
+
+def time_queries(dictionary, kind: str, queries: list[str]) -> dict:
+    call = dictionary.prefix if kind == "prefix" else dictionary.lookup
+    samples = []
+    hits = 0
+    for query in queries:
+        start = time.perf_counter_ns()
+        result = call(query)
+        samples.append((time.perf_counter_ns() - start) / 1000)
+        hits += bool(result)
+    return {
+        "queries": len(queries),
+        "hit_rate": hits / len(queries) if queries else 0.0,
+        "p50_us": percentile(samples, 50),
+        "p95_us": percentile(samples, 95),
+        "p99_us": percentile(samples, 99),
+        "max_us": max(samples, default=0.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000, help="模拟词典的词条数")
+    parser.add_argument("--queries", type=int, default=20000, help="每类查询的次数")
+    parser.add_argument("--source", type=Path, help="改用真实词典（ECDICT .csv / StarDict .ifo / TSV）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=Path, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "dictionary.fwd"
+        entries = (
+            read_source(args.source)
+            if args.source
+            else synthetic_entries(args.entries, args.seed)
+        )
+        start = time.perf_counter()
+        built = build_index(entries, path)
+        build_s = time.perf_counter() - start
+        print(
+            f"索引：{built['entries']} 个词条，{built['forms']} 个变形，"
+            f"{built['size_mb']} MB，生成用时 {build_s:.1f} 秒"
+        )
+
+        queries = make_queries(path, args.queries, args.seed)
+
+        start = time.perf_counter()
+        dictionary = local_dictionary.LocalDictionary(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        print(f"打开（mmap）用时 {open_ms:.2f} ms\n")
+
+        report = {"build": {**built, "seconds": build_s}, "open_ms": open_ms, "lookups": {}}
+        print(
+            f"{'查询':<8} | {'次数':>7} | {'命中率':>7} | {'p50(µs)':>8} | "
+            f"{'p95(µs)':>8} | {'p99(µs)':>8} | {'max(µs)':>9}"
+        )
+        print("-" * 74)
+        try:
+            for kind, items in queries.items():
+                if not items:
+                    continue
+                result = time_queries(dictionary, kind, items)
+                report["lookups"][kind] = result
+                print(
+                    f"{kind:<8} | {result['queries']:>7} | {result['hit_rate']:>7.1%} | "
+                    f"{result['p50_us']:>8.1f} | {result['p95_us']:>8.1f} | "
+                    f"{result['p99_us']:>8.1f} | {result['max_us']:>9.1f}"
+                )
+        finally:
+            dictionary.close()
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+本地模型基准测试（CPU）
+用 local_model 运行时加载 GGUF 模型，按真实划词的顺序做几次查词：
+同一页的第一次（冷）→ 同一页换个词（复用 KV 前缀）→ 换一页 → 回到第一页，
+报告模型加载耗时、每次的 Prompt / 复用 token 数、首 token 时间（TTFT）和生成速度（tok/s）
+
+需要：pip install llama-cpp-python，以及一个 GGUF 模型文件
+
+用法：
+    python benchmarks/bench_local_llm.py --model qwen2.5-1.5b-instruct-q4_k_m.gguf
+    python benchmarks/bench_local_llm.py --model m.gguf --threads 8 --n-ctx 8192 --runs 3
+    python benchmarks/bench_local_llm.py --model m.gguf --cache-mb 0 --json local.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import local_model  # noqa: E402
+import prompt_builder  # noqa: E402
+from bench_context_selection import _EN_SENTENCES, _ZH_SENTENCES, make_page  # noqa: E402
+from context_selector import select_context  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+# (场景, 页面, 选中内容)：页面 a / b 各插入两个术语
+_TERMS = {"a": ("背压", "连接复用"), "b": ("closure", "scheduler")}
+SCENARIOS = (
+    ("cold", "a", 0),
+    ("same_page", "a", 1),
+    ("new_page", "b", 0),
+    ("same_page_b", "b", 1),
+    ("back_to_a", "a", 0),
+)
+
+
+def build_pages() -> dict[str, str]:
+    pages = {}
+    for name, sentences in (("a", _ZH_SENTENCES), ("b", _EN_SENTENCES)):
+        paragraphs = make_page(sentences, 60, seed=ord(name))
+        for i, term in enumerate(_TERMS[name]):
+            index = 20 + i * 3
+            paragraphs[index] = f"{paragraphs[index]} {term} {paragraphs[index]}"
+        pages[name] = "\n\n".join(paragraphs)
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", type=Path, required=True, help="GGUF 模型文件")
+    parser.add_argument("--threads", type=int, default=0, help="0 = 由 llama.cpp 决定")
+    parser.add_argument("--n-ctx", type=int, default=4096)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--cache-mb", type=int, default=256, help="多页 KV 缓存，0 = 只复用上一次")
+    parser.add_argument("--budget", type=int, default=1500, help="上下文 token 预算")
+    parser.add_argument("--runs", type=int, default=1, help="整组场景重复几轮（每轮重新加载模型）")
+    parser.add_argument(
+        "--template",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "system_prompt.txt",
+    )
+    parser.add_argument("--json", type=Path, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    if not local_model.HAS_LLAMA_CPP:
+        sys.exit("需要先安装 llama-cpp-python：pip install llama-cpp-python")
+
+    config = {
+        "local_llm_model_path": str(args.model),
+        "local_llm_threads": args.threads,
+        "local_llm_n_ctx": args.n_ctx,
+        "local_llm_max_tokens": args.max_tokens,
+        "local_llm_cache_mb": args.cache_mb,
+        # 贪心解码：每轮输出一致，tok/s 可比
+        "local_llm_temperature": 0.0,
+    }
+    prompt_builder.configure({"prompt_cache_layout": True})
+    template = args.template.read_text(encoding="utf-8")
+    pages = build_pages()
+    name = local_model.model_name(config)
+
+    results: dict[str, list[dict]] = {scenario: [] for scenario, _, _ in SCENARIOS}
+    load_ms = []
+    for _ in range(args.runs):
+        runtime = local_model.LocalModel()
+        runtime.configure(config)
+        if not runtime.wait_ready():
+            sys.exit(runtime.error)
+        load_ms.append(runtime.load_ms)
+
+        for scenario, page, term_index in SCENARIOS:
+            term = _TERMS[page][term_index]
+            context = select_context(pages[page], term, token_budget=args.budget, stable=True)
+            built = prompt_builder.build(
+                template, term, context, name, budget=runtime.prompt_budget()
+            )
+            stats = runtime.generate(built.messages, lambda _text: None)
+            results[scenario].append(stats)
+        runtime.shutdown()
+
+    print(f"模型：{args.model.name}  加载用时 p50 {percentile(load_ms, 50) / 1000:.1f}s\n")
+    print(
+        f"{'场景':<12} | {'Prompt':>7} | {'复用':>6} | {'TTFT p50':>9} | "
+        f"{'TTFT max':>9} | {'tok/s p50':>9} | {'生成 token':>9}"
+    )
+    print("-" * 80)
+    summary = {}
+    for scenario, runs in results.items():
+        ttfts = [r["ttft_ms"] for r in runs]
+        rates = [r["decode_tokens_per_s"] for r in runs]
+        summary[scenario] = {
+            "prompt_tokens": runs[0]["prompt_tokens"],
+            "reused_tokens": runs[0]["reused_tokens"],
+            "ttft_p50_ms": percentile(ttfts, 50),
+            "ttft_max_ms": max(ttfts),
+            "decode_tokens_per_s_p50": percentile(rates, 50),
+            "completion_tokens": runs[0]["completion_tokens"],
+        }
+        s = summary[scenario]
+        print(
+            f"{scenario:<12} | {s['prompt_tokens']:>7} | {s['reused_tokens']:>6} | "
+            f"{s['ttft_p50_ms']:>7.0f}ms | {s['ttft_max_ms']:>7.0f}ms | "
+            f"{s['decode_tokens_per_s_p50']:>9.1f} | {s['completion_tokens']:>9}"
+        )
+
+    if args.json:
+        report = {"model": str(args.model), "load_ms": load_ms, "scenarios": summary, "runs": results}
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
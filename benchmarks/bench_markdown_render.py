@@ -0,0 +1,164 @@
+"""
+Markdown 流式渲染基准测试
+对比三种渲染方式的总耗时、单 token 最坏耗时、每次渲染的 CPU 时间和 Python 内存分配：
+  旧路径   - 每个 token 全量 markdown.markdown() + 内联 <style> + setHtml
+  增量     - 增量渲染，但每次转换都新建解析器（共享渲染上下文之前的做法）
+  增量共享 - 增量渲染 + 复用 markdown.Markdown 实例（reset）+ 样式表只设置一次
+
+内存分配用 tracemalloc 在单独一轮里统计（只统计 Python 层的分配，Qt 内部的不计），
+避免追踪开销影响计时
+
+用法：
+    python benchmarks/bench_markdown_render.py
+    python benchmarks/bench_markdown_render.py --sizes 500 2000 8000
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import markdown  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QTextBrowser  # noqa: E402
+
+from markdown_renderer import (  # noqa: E402
+    MARKDOWN_CSS,
+    MARKDOWN_EXTENSIONS,
+    IncrementalMarkdownRenderer,
+    RenderContext,
+    shared_context,
+)
+
+_SECTIONS = [
+    "## 📖 基本概念\n\n**Closure（闭包）** 是指函数与其词法环境的组合，"
+    "即使外层函数已经返回，内部函数仍然可以访问外层作用域中的变量。\n\n",
+    "## 🎯 使用场景\n\n- 回调函数中保存状态\n- 实现私有变量\n"
+    "- 函数工厂与柯里化\n- 装饰器\n\n",
+    "```python\ndef counter():\n    n = 0\n    def inc():\n        nonlocal n\n"
+    "        n += 1\n        return n\n    return inc\n```\n\n",
+    "| 语言 | 是否支持 | 备注 |\n|---|---|---|\n| Python | 是 | nonlocal |\n"
+    "| JavaScript | 是 | 最常见 |\n| C | 否 | 需要手动传参 |\n\n",
+    "> 💡 在当前文章中，作者用闭包来说明回调为何能记住循环变量。\n\n",
+]
+
+
+def make_tokens(count: int) -> list[str]:
+    """生成约 count 个 token 的模拟回答（每个 token 约 4 个字符）"""
+    text = ""
+    i = 0
+    while len(text) < count * 4:
+        text += _SECTIONS[i % len(_SECTIONS)]
+        i += 1
+    return [text[j : j + 4] for j in range(0, count * 4, 4)]
+
+
+def legacy_render(text: str) -> str:
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    return f"<style>{MARKDOWN_CSS}</style>{html}"
+
+
+class FreshParserContext(RenderContext):
+    """每次转换都新建解析器（共享渲染上下文之前的做法），作为对照组"""
+
+    def to_html(self, text: str) -> str:
+        return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+
+def make_legacy(browser: QTextBrowser):
+    browser.clear()
+    browser.document().setDefaultStyleSheet("")
+    text = ""
+
+    def render(token: str):
+        nonlocal text
+        text += token
+        browser.setHtml(legacy_render(text))
+
+    return render
+
+
+def make_incremental(context: RenderContext):
+    def factory(browser: QTextBrowser):
+        browser.clear()
+        return IncrementalMarkdownRenderer(browser.document(), context).append
+
+    return factory
+
+
+def run_timed(browser: QTextBrowser, factory, tokens: list[str]) -> dict:
+    render = factory(browser)
+    worst = 0.0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for token in tokens:
+        t0 = time.perf_counter()
+        render(token)
+        worst = max(worst, time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    return {
+        "total_ms": total * 1000,
+        "worst_ms": worst * 1000,
+        "cpu_us_per_render": cpu / len(tokens) * 1e6,
+    }
+
+
+def run_allocations(browser: QTextBrowser, factory, tokens: list[str]) -> dict:
+    """每次渲染过程中的 Python 内存分配峰值（临时对象）与渲染结束后的净增长"""
+    render = factory(browser)
+    tracemalloc.start()
+    transient = 0
+    before, _ = tracemalloc.get_traced_memory()
+    for token in tokens:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        render(token)
+        _, peak = tracemalloc.get_traced_memory()
+        transient += peak - current
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "alloc_kb_per_render": transient / len(tokens) / 1024,
+        "retained_kb": (after - before) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 8000])
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+    browser = QTextBrowser()
+    browser.resize(380, 400)
+
+    variants = (
+        ("旧路径", make_legacy),
+        ("增量", make_incremental(FreshParserContext())),
+        ("增量共享", make_incremental(shared_context)),
+    )
+
+    print(
+        f"{'tokens':>7} | {'方案':<8} | {'总耗时(ms)':>11} | {'单 token 最坏(ms)':>16} | "
+        f"{'CPU/次(µs)':>11} | {'分配/次(KB)':>11} | {'净增长(KB)':>10}"
+    )
+    print("-" * 98)
+    for size in args.sizes:
+        tokens = make_tokens(size)
+        for name, factory in variants:
+            timed = run_timed(browser, factory, tokens)
+            allocs = run_allocations(browser, factory, tokens)
+            print(
+                f"{size:>7} | {name:<8} | {timed['total_ms']:>11.1f} | "
+                f"{timed['worst_ms']:>16.2f} | {timed['cpu_us_per_render']:>11.1f} | "
+                f"{allocs['alloc_kb_per_render']:>11.1f} | {allocs['retained_kb']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+前缀缓存基准测试
+在同一页上连续划几个相邻的词，对比两种消息布局的首 token 时间（TTFT）：
+single（整个模板填成一条 user 消息，上下文以选中内容为中心截取）与
+cached（固定指令放 system 消息、上下文按固定窗口截取、选中文本放最后）。
+报告冷启动 / 重复查词的 TTFT、与上一次请求的公共前缀占比、服务端报告的缓存命中 token 数
+
+默认用本地模拟服务器（按未命中缓存的 Prompt token 计预填充耗时）；
+提供 --api-key 时改为请求真实接口（服务端缓存无法清空，第一次请求也可能已经命中）
+
+用法：
+    python benchmarks/bench_prompt_cache.py
+    python benchmarks/bench_prompt_cache.py --lookups 12 --prefill-ms-per-token 0.8
+    python benchmarks/bench_prompt_cache.py --api-key sk-xxx --model deepseek-chat
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+import prompt_builder  # noqa: E402
+from bench_context_selection import _ZH_SENTENCES, make_page  # noqa: E402
+from chat_request import build_request, cached_tokens  # noqa: E402
+from context_selector import select_context  # noqa: E402
+from mock_sse_server import MockSettings, MockSSEServer, common_prefix  # noqa: E402
+from sse_parser import DONE, SSEDecoder, extract_content, extract_usage  # noqa: E402
+
+LAYOUTS = ("single", "cached")
+
+_TERMS = ["推测解码", "前缀缓存", "连接复用", "背压", "增量渲染", "闭包", "事件循环", "分词器"]
+
+
+def build_page(lookups: int, spread: int) -> tuple[str, list[str]]:
+    """返回 (整页文本, 各次查词的选中内容)：选中内容从页面中部开始每隔 spread 段出现一次"""
+    paragraphs = make_page(_ZH_SENTENCES, 240, seed=7)
+    terms = []
+    for i in range(lookups):
+        term = _TERMS[i % len(_TERMS)] + (str(i // len(_TERMS)) if i >= len(_TERMS) else "")
+        index = 100 + i * spread
+        paragraphs[index] = f"{paragraphs[index]}{term}。{paragraphs[index]}"
+        terms.append(term)
+    return "\n\n".join(paragraphs), terms
+
+
+def flatten(messages: list[dict]) -> str:
+    return "".join(f"{m['role']}\n{m['content']}\n" for m in messages)
+
+
+def lookup(client: httpx.Client, base_url: str, api_key: str, model: str, messages, max_tokens):
+    """发送一次流式请求，返回 (TTFT 毫秒, usage)"""
+    url, headers, payload = build_request(base_url, api_key, model, messages)
+    payload["max_tokens"] = max_tokens
+    ttft_ms = None
+    usage = None
+    start = time.perf_counter()
+    with client.stream("POST", url, headers=headers, json=payload) as response:
+        response.raise_for_status()
+        decoder = SSEDecoder()
+        for chunk in response.iter_bytes():
+            for data in decoder.feed(chunk):
+                if data == DONE:
+                    break
+                if extract_content(data):
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                else:
+                    usage = extract_usage(data) or usage
+            if decoder.done:
+                break
+    return ttft_ms or (time.perf_counter() - start) * 1000, usage
+
+
+def run_layout(args, layout: str, page: str, terms: list[str], base_url: str) -> list[dict]:
+    """用一种布局依次查完所有词，返回每次的指标"""
+    cache_layout = layout == "cached"
+    prompt_builder.configure(
+        {"prompt_cache_layout": cache_layout, "prompt_token_budget": args.prompt_budget}
+    )
+    template = args.template.read_text(encoding="utf-8")
+    results = []
+    previous = ""
+    with httpx.Client(timeout=60.0) as client:
+        for term in terms:
+            # 与划词时一致：先按上下文预算截取，再按模型预算组装
+            context = select_context(
+                page,
+                term,
+                token_budget=args.budget,
+                relevance=not cache_layout,
+                stable=cache_layout,
+            )
+            built = prompt_builder.build(template, term, context, args.model)
+            text = flatten(built.messages)
+            shared = common_prefix(previous, text) / len(text) if previous else 0.0
+            previous = text
+            ttft_ms, usage = lookup(
+                client,
+                base_url,
+                args.api_key or "mock-key",
+                args.model,
+                built.messages,
+                args.max_tokens,
+            )
+            prompt_tokens = int((usage or {}).get("prompt_tokens") or built.prompt_tokens)
+            results.append(
+                {
+                    "term": term,
+                    "ttft_ms": ttft_ms,
+                    "prompt_tokens": prompt_tokens,
+                    "cached_tokens": cached_tokens(usage),
+                    "shared_prefix": shared,
+                }
+            )
+    return results
+
+
+def summarize(results: list[dict]) -> dict:
+    repeats = sorted(r["ttft_ms"] for r in results[1:]) or [results[0]["ttft_ms"]]
+    prompt_tokens = sum(r["prompt_tokens"] for r in results[1:]) or 1
+    return {
+        "cold_ttft_ms": results[0]["ttft_ms"],
+        "repeat_p50_ms": repeats[len(repeats) // 2],
+        "repeat_p95_ms": repeats[min(len(repeats) - 1, int(len(repeats) * 0.95))],
+        "cached_ratio": sum(r["cached_tokens"] for r in results[1:]) / prompt_tokens,
+        "shared_prefix": sum(r["shared_prefix"] for r in results[1:]) / max(len(results) - 1, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=8, help="同一页上连续查几个词")
+    parser.add_argument("--spread", type=int, default=2, help="相邻两次查词之间隔几段")
+    parser.add_argument("--budget", type=int, default=1500, help="上下文 token 预算")
+    parser.add_argument("--prompt-budget", type=int, default=4000)
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=list(LAYOUTS))
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5)
+    parser.add_argument("--max-tokens", type=int, default=16)
+    parser.add_argument(
+        "--template",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent / "system_prompt.txt",
+    )
+    parser.add_argument("--api-key", default="")
+    parser.add_argument("--base-url", default="https://api.deepseek.com")
+    parser.add_argument("--model", default="deepseek-chat")
+    parser.add_argument("--json", type=Path, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    page, terms = build_page(args.lookups, args.spread)
+    server = None
+    base_url = args.base_url
+    if not args.api_key:
+        settings = MockSettings(
+            tokens=args.max_tokens,
+            token_rate=0,
+            first_byte_delay=0.02,
+            prefill_ms_per_token=args.prefill_ms_per_token,
+            prefix_cache=True,
+        )
+        server = MockSSEServer(settings).start()
+        base_url = server.base_url
+
+    report = {}
+    try:
+        for layout in args.layouts:
+            if server is not None:
+                server.clear_cache()
+            results = run_layout(args, layout, page, terms, base_url)
+            report[layout] = {"summary": summarize(results), "lookups": results}
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(
+        f"{'布局':<8} | {'冷启动 TTFT':>11} | {'重复 p50':>9} | {'重复 p95':>9} | "
+        f"{'缓存命中':>8} | {'公共前缀':>8}"
+    )
+    print("-" * 72)
+    for layout, item in report.items():
+        s = item["summary"]
+        print(
+            f"{layout:<8} | {s['cold_ttft_ms']:>9.0f}ms | {s['repeat_p50_ms']:>7.0f}ms | "
+            f"{s['repeat_p95_ms']:>7.0f}ms | {s['cached_ratio']:>8.0%} | {s['shared_prefix']:>8.0%}"
+        )
+    if len(report) == 2:
+        single = report["single"]["summary"]["repeat_p50_ms"]
+        cached = report["cached"]["summary"]["repeat_p50_ms"]
+        print(f"\n重复查词 TTFT p50：{single:.0f}ms → {cached:.0f}ms（{cached / single - 1:+.0%}）")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
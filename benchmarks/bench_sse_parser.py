@@ -0,0 +1,157 @@
+"""
+SSE 解析微基准测试
+对比旧的"iter_lines + startswith + json.loads 整个事件"与字节级 SSEDecoder + 快速 content 提取，
+同时校验两者解析出的文本是否一致（旧路径遇到跨读取的事件会丢内容）
+
+用法：
+    python benchmarks/bench_sse_parser.py
+    python benchmarks/bench_sse_parser.py --record stream.txt   # 用 curl -N 录下的真实流
+"""
+
+import argparse
+import codecs
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_sse_server import make_tokens  # noqa: E402
+from sse_parser import DONE, HAS_ORJSON, SSEDecoder, extract_content  # noqa: E402
+
+
+def record_stream(tokens: int, chunk_size: int = 1) -> bytes:
+    """生成一段与 OpenAI 格式一致的流（含 role 首事件、usage 尾事件和 [DONE]）"""
+    parts = ['data: {"choices":[{"index":0,"delta":{"role":"assistant","content":""}}]}\n\n']
+    words = make_tokens(tokens)
+    for i in range(0, len(words), chunk_size):
+        event = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "deepseek-chat",
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"content": "".join(words[i : i + chunk_size])},
+                    "logprobs": None,
+                    "finish_reason": None,
+                }
+            ],
+        }
+        parts.append(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+    parts.append('data: {"choices":[],"usage":{"prompt_tokens":600,"completion_tokens":1}}\n\n')
+    parts.append("data: [DONE]\n\n")
+    return "".join(parts).encode("utf-8")
+
+
+def split_event_aligned(raw: bytes) -> list[bytes]:
+    """每个网络块恰好是一个事件（理想情况）"""
+    return [part + b"\n\n" for part in raw.split(b"\n\n") if part]
+
+
+def split_random(raw: bytes, average: int = 64, seed: int = 7) -> list[bytes]:
+    """随机切块，模拟 TCP 分段 / 代理重新分块"""
+    rng = random.Random(seed)
+    chunks, pos = [], 0
+    while pos < len(raw):
+        size = rng.randint(1, average * 2)
+        chunks.append(raw[pos : pos + size])
+        pos += size
+    return chunks
+
+
+def legacy_parse(chunks: list[bytes]) -> str:
+    """旧路径：按 httpx.iter_lines 的方式逐行解码，再逐行 json.loads"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts, buffer = [], ""
+
+    def lines():
+        nonlocal buffer
+        for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *complete, buffer = buffer.split("\n")
+            yield from complete
+        if buffer:
+            yield buffer
+
+    for line in lines():
+        if not line or not line.startswith("data: "):
+            continue
+        data_str = line[6:]
+        if data_str.strip() == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data_str)
+            delta = chunk.get("choices", [{}])[0].get("delta", {})
+            content = delta.get("content", "")
+            if content:
+                parts.append(content)
+        except (json.JSONDecodeError, IndexError):
+            continue
+    return "".join(parts)
+
+
+def fast_parse(chunks: list[bytes]) -> str:
+    decoder = SSEDecoder()
+    parts = []
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == DONE:
+                break
+            try:
+                content = extract_content(data)
+            except ValueError:
+                continue
+            if content:
+                parts.append(content)
+        if decoder.done:
+            break
+    return "".join(parts)
+
+
+def bench(func, chunks: list[bytes], repeat: int) -> tuple[float, str]:
+    best = float("inf")
+    result = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--record", help="录制的原始 SSE 流文件（curl -N 的输出）")
+    args = parser.parse_args()
+
+    if args.record:
+        streams = {"recorded": Path(args.record).read_bytes()}
+    else:
+        streams = {
+            "1 token/事件": record_stream(args.tokens, 1),
+            "8 token/事件": record_stream(args.tokens, 8),
+        }
+
+    print(f"JSON 后端：{'orjson' if HAS_ORJSON else 'json（标准库）'}")
+    print(f"{'流':<14} | {'分块':<6} | {'旧路径(ms)':>10} | {'新路径(ms)':>10} | {'加速':>6} | 结果一致")
+    print("-" * 72)
+    for name, raw in streams.items():
+        for split_name, splitter in (("按事件", split_event_aligned), ("随机", split_random)):
+            chunks = splitter(raw)
+            legacy_time, legacy_text = bench(legacy_parse, chunks, args.repeat)
+            fast_time, fast_text = bench(fast_parse, chunks, args.repeat)
+            print(
+                f"{name:<14} | {split_name:<6} | {legacy_time * 1000:>10.2f} | "
+                f"{fast_time * 1000:>10.2f} | {legacy_time / fast_time:>5.1f}x | "
+                f"{'是' if legacy_text == fast_text else '否'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+启动耗时基准测试
+用 python -X importtime 在子进程里导入 main，统计启动阶段的模块导入耗时，
+列出最慢的模块，并检查本该推迟加载的重模块有没有被提前导入；
+超出耗时预算或提前导入了重模块时以非零状态码退出，可直接放进 CI
+
+用法：
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 300 --top 15
+    python benchmarks/bench_startup.py --json startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 启动时不应导入的模块：由后台预热或第一次使用时加载
+DEFERRED_MODULES = (
+    "markdown",
+    "httpx",
+    "pyautogui",
+    "dotenv",
+    "http_pool",
+    "request_executor",
+    "llm_client",
+    "async_llm_client",
+    "local_model",
+    "local_llm_client",
+    "llama_cpp",
+    "markdown_renderer",
+    "floating_window",
+    "settings_dialog",
+    "history_dialog",
+)
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """
+    解析 -X importtime 的输出，每行形如：
+        import time:       self [us] | cumulative | imported package
+        import time:       120 |        340 |   json.decoder
+    包名前的缩进表示嵌套层级（每层两个空格）
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # 表头
+        raw_name = fields[2].rstrip()
+        name = raw_name.lstrip()
+        depth = (len(raw_name) - len(name) - 1) // 2
+        records.append(
+            {"name": name, "depth": depth, "self_us": self_us, "cumulative_us": cumulative_us}
+        )
+    return records
+
+
+def measure(module: str) -> dict:
+    """在干净的子进程里导入 module 一次，返回导入耗时明细"""
+    env = {**os.environ, "QT_QPA_PLATFORM": "offscreen", "PYTHONDONTWRITEBYTECODE": "1"}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        # importtime 的输出和异常信息都在 stderr 里，只保留异常部分
+        error = "\n".join(
+            line for line in proc.stderr.splitlines() if not line.startswith("import time:")
+        )
+        raise RuntimeError(f"导入 {module} 失败：\n{error}")
+
+    records = parse_importtime(proc.stderr)
+    target = next((r for r in records if r["name"] == module and r["depth"] == 0), None)
+    return {
+        "wall_ms": wall_ms,
+        "import_ms": target["cumulative_us"] / 1000 if target else 0.0,
+        "modules": {r["name"] for r in records},
+        "records": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main", help="要测量的入口模块")
+    parser.add_argument("--runs", type=int, default=3, help="重复次数（取最小值，排除冷缓存抖动）")
+    parser.add_argument("--budget-ms", type=float, default=400.0, help="导入耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的前 N 个模块")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，作为回归基线")
+    args = parser.parse_args()
+
+    # 第一次运行顺带生成 .pyc，不计入结果
+    measure(args.module)
+    results = [measure(args.module) for _ in range(args.runs)]
+    best = min(results, key=lambda r: r["import_ms"])
+
+    print(
+        f"导入 {args.module}：{best['import_ms']:.1f} ms（预算 {args.budget_ms:.0f} ms），"
+        f"进程总耗时 {best['wall_ms']:.1f} ms，共 {len(best['modules'])} 个模块"
+    )
+
+    # 只看入口模块的直接依赖，避免同一份耗时在父子模块里重复出现
+    direct = [r for r in best["records"] if r["depth"] == 1]
+    direct.sort(key=lambda r: r["cumulative_us"], reverse=True)
+    print(f"\n{'模块':<32}{'累计(ms)':>10}{'自身(ms)':>10}")
+    print("-" * 52)
+    for record in direct[: args.top]:
+        print(
+            f"{record['name']:<32}{record['cumulative_us'] / 1000:>10.1f}"
+            f"{record['self_us'] / 1000:>10.1f}"
+        )
+
+    eager = [name for name in DEFERRED_MODULES if name in best["modules"]]
+    over_budget = best["import_ms"] > args.budget_ms
+    print()
+    if eager:
+        print(f"❌ 启动时提前导入了应推迟加载的模块：{', '.join(eager)}")
+    if over_budget:
+        print(f"❌ 导入耗时超出预算 {best['import_ms'] - args.budget_ms:.1f} ms")
+    if not eager and not over_budget:
+        print("✅ 启动耗时在预算内")
+
+    if args.json:
+        report = {
+            "module": args.module,
+            "budget_ms": args.budget_ms,
+            "import_ms": best["import_ms"],
+            "wall_ms": best["wall_ms"],
+            "eager_deferred_modules": eager,
+            "top_modules": [
+                {"name": r["name"], "cumulative_ms": r["cumulative_us"] / 1000}
+                for r in direct[: args.top]
+            ],
+        }
+        Path(args.json).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"结果已写入 {args.json}")
+
+    sys.exit(1 if eager or over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
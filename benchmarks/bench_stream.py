@@ -0,0 +1,239 @@
+"""
+端到端流式基准测试（离线）
+用本地模拟 SSE 服务器驱动真实的 LLMStreamWorker + 离屏 FloatingWindow，
+报告首 token 时间、解析吞吐、UI 帧数、窗口重绘 / 重排次数、CPU 时间和峰值内存，
+方便对比每次性能改动
+
+用法：
+    python benchmarks/bench_stream.py
+    python benchmarks/bench_stream.py --runs 5 --scenarios fast chunky malformed
+    python benchmarks/bench_stream.py --json baseline.json
+    python benchmarks/bench_stream.py --backend asyncio
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from PyQt6.QtCore import QEvent, QEventLoop, QObject, QTimer  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+import async_llm_client  # noqa: E402
+import http_pool  # noqa: E402
+from floating_window import FloatingWindow  # noqa: E402
+from llm_client import LLMStreamWorker  # noqa: E402
+from mock_sse_server import MockSettings, MockSSEServer  # noqa: E402
+
+try:
+    import resource
+
+    def peak_rss_mb() -> float:
+        # Linux 上 ru_maxrss 单位是 KB，macOS 上是字节
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+except ImportError:  # Windows
+
+    def peak_rss_mb() -> float:
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return 0.0
+
+
+# 场景名 -> 模拟服务器参数
+SCENARIOS = {
+    "fast": MockSettings(tokens=400, token_rate=0, first_byte_delay=0.05),
+    "realistic": MockSettings(tokens=400, token_rate=80, first_byte_delay=0.3),
+    "chunky": MockSettings(tokens=800, token_rate=0, chunk_size=8, first_byte_delay=0.05),
+    "split": MockSettings(tokens=400, token_rate=0, split_events=True, first_byte_delay=0.05),
+    "malformed": MockSettings(tokens=400, token_rate=0, malformed_every=5, first_byte_delay=0.05),
+    "long": MockSettings(tokens=3000, token_rate=0, first_byte_delay=0.05),
+    "http_500": MockSettings(error_code=500, first_byte_delay=0.05),
+}
+
+_PROMPT = "请解释：{text}\n\n上下文：{context}"
+
+
+class _PaintCounter(QObject):
+    """统计文本区域视口实际收到的绘制事件数（= 真正画到屏幕上的帧）"""
+
+    def __init__(self):
+        super().__init__()
+        self.paints = 0
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            self.paints += 1
+        return False
+
+
+def run_lookup(
+    window: FloatingWindow, worker_class, base_url: str, flush_ms: int, timeout: float
+) -> dict:
+    """模拟一次查词：弹窗 → 发请求 → 等流结束，返回本次的各项指标"""
+    window.show_at(200, 200)
+    # 离屏平台下窗口拿不到焦点，关掉失焦自动关闭，否则 300ms 后窗口就被隐藏了
+    window._focus_timer.stop()
+
+    worker = worker_class(
+        api_key="mock-key",
+        api_base_url=base_url,
+        model_name="mock-model",
+        prompt=_PROMPT,
+        user_text="closure",
+        context="JavaScript closures capture variables from the enclosing scope.",
+        flush_interval_ms=flush_ms,
+    )
+    result = {"ttft_ms": None, "ui_updates": 0, "error": ""}
+    loop = QEventLoop()
+
+    def on_token(token: str):
+        if result["ttft_ms"] is None:
+            result["ttft_ms"] = (time.perf_counter() - start) * 1000
+        result["ui_updates"] += 1
+        window.append_token(token)
+
+    def on_error(message: str):
+        result["error"] = message
+        window.show_error(message)
+        loop.quit()
+
+    worker.token_received.connect(on_token)
+    worker.stream_finished.connect(window.finish_stream)
+    worker.stream_finished.connect(loop.quit)
+    worker.error_occurred.connect(on_error)
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    worker.start()
+    loop.exec()
+    elapsed = time.perf_counter() - start
+    # 把尚未处理的重绘事件跑完，再计 CPU 时间
+    QApplication.processEvents()
+    cpu = time.process_time() - cpu_start
+
+    worker.cancel()
+    worker.wait(2000)
+    stats = worker.stats()
+    result.update(
+        elapsed_ms=elapsed * 1000,
+        cpu_ms=cpu * 1000,
+        deltas=stats["deltas_received"],
+        tokens_per_s=stats["deltas_received"] / elapsed if elapsed else 0.0,
+        chars=len(worker.answer_text),
+        **window.render_stats(),
+    )
+    worker.deleteLater()
+    return result
+
+
+def run_scenario(
+    window: FloatingWindow,
+    counter: _PaintCounter,
+    name: str,
+    settings: MockSettings,
+    worker_class,
+    runs: int,
+    flush_ms: int,
+    timeout: float,
+) -> dict:
+    results = []
+    with MockSSEServer(settings) as server:
+        for _ in range(runs):
+            counter.paints = 0
+            result = run_lookup(window, worker_class, server.base_url, flush_ms, timeout)
+            result["frames"] = counter.paints
+            results.append(result)
+        requests = server.requests
+
+    def avg(key):
+        values = [r[key] for r in results if r[key] is not None]
+        return sum(values) / len(values) if values else 0.0
+
+    return {
+        "scenario": name,
+        "runs": runs,
+        "requests": requests,
+        "errors": sum(1 for r in results if r["error"]),
+        "ttft_ms": avg("ttft_ms"),
+        "elapsed_ms": avg("elapsed_ms"),
+        "tokens_per_s": avg("tokens_per_s"),
+        "deltas": avg("deltas"),
+        "ui_updates": avg("ui_updates"),
+        "frames": avg("frames"),
+        "repaints": avg("repaints"),
+        "relayouts": avg("relayouts"),
+        "cpu_ms": avg("cpu_ms"),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=3, help="每个场景重复次数")
+    parser.add_argument("--flush-ms", type=int, default=16, help="token 合并间隔")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单次查词超时（秒）")
+    parser.add_argument("--backend", choices=["thread", "asyncio"], default="thread")
+    parser.add_argument("--json", help="把结果写入 JSON 文件，作为回归基线")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+    window = FloatingWindow()
+    counter = _PaintCounter()
+    window._text_browser.viewport().installEventFilter(counter)
+
+    print(
+        f"{'场景':<10} | {'TTFT(ms)':>9} | {'总耗时(ms)':>10} | {'tok/s':>8} | "
+        f"{'UI更新':>6} | {'帧数':>5} | {'重绘':>5} | {'重排':>5} | {'CPU(ms)':>8} | "
+        f"{'峰值RSS(MB)':>11} | 错误"
+    )
+    print("-" * 116)
+    worker_class = (
+        async_llm_client.AsyncLLMStreamWorker if args.backend == "asyncio" else LLMStreamWorker
+    )
+    reports = []
+    for name in args.scenarios:
+        report = run_scenario(
+            window,
+            counter,
+            name,
+            SCENARIOS[name],
+            worker_class,
+            args.runs,
+            args.flush_ms,
+            args.timeout,
+        )
+        reports.append(report)
+        print(
+            f"{name:<10} | {report['ttft_ms']:>9.1f} | {report['elapsed_ms']:>10.1f} | "
+            f"{report['tokens_per_s']:>8.0f} | {report['ui_updates']:>6.0f} | "
+            f"{report['frames']:>5.0f} | {report['repaints']:>5.0f} | "
+            f"{report['relayouts']:>5.0f} | {report['cpu_ms']:>8.1f} | "
+            f"{report['peak_rss_mb']:>11.1f} | {report['errors']}/{report['runs']}"
+        )
+
+    print(f"\n连接池：{http_pool.stats()}")
+    http_pool.close_all()
+    async_llm_client.shutdown()
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps(reports, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
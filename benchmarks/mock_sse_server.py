@@ -0,0 +1,280 @@
+"""
+本地模拟 OpenAI 兼容流式接口（/v1/chat/completions）
+可配置 token 速率、每个 SSE 事件的 token 数、首字节延迟、错误码、畸形行，
+以及按 Prompt 长度计的预填充耗时和服务端前缀缓存（DeepSeek / OpenAI 的自动 KV 缓存），
+用于在没有真实 API Key / 网络的情况下做性能基准测试
+
+用法（单独启动，然后把设置里的接口地址改成 http://127.0.0.1:8765）：
+    python benchmarks/mock_sse_server.py --port 8765 --token-rate 200
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ANSWER = (
+    "## 📖 基本概念\n\n**Closure（闭包）** 是函数与其词法环境的组合，"
+    "即使外层函数已经返回，内部函数仍然可以访问外层作用域中的变量。\n\n"
+    "## 🎯 使用场景\n\n- 回调函数中保存状态\n- 实现私有变量\n- 装饰器与函数工厂\n\n"
+    "```python\ndef counter():\n    n = 0\n    def inc():\n        nonlocal n\n"
+    "        n += 1\n        return n\n    return inc\n```\n\n"
+    "## 💡 上下文关联\n\n> 在当前文章中，作者用闭包说明回调为何能记住循环变量。\n\n"
+)
+
+
+# 模拟前缀缓存的粒度：公共前缀按整块命中（DeepSeek 为 64 token 一块）
+CACHE_BLOCK_CHARS = 64
+
+
+def rough_tokens(text: str) -> int:
+    """粗算 token 数：UTF-8 每 4 字节约 1 token（中文约 0.75 token/字）"""
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def common_prefix(a: str, b: str) -> int:
+    """两个字符串公共前缀的长度"""
+    size = min(len(a), len(b))
+    low, high = 0, size
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def make_tokens(count: int) -> list[str]:
+    """把示例回答切成约 count 个 token（每个 2~4 个字符）"""
+    text = _ANSWER * (count * 3 // len(_ANSWER) + 1)
+    tokens = []
+    pos = 0
+    while len(tokens) < count:
+        step = 2 + len(tokens) % 3
+        tokens.append(text[pos : pos + step])
+        pos += step
+    return tokens
+
+
+class MockSettings:
+    """一次模拟响应的行为参数"""
+
+    def __init__(
+        self,
+        tokens: int = 400,
+        token_rate: float = 200.0,
+        chunk_size: int = 1,
+        first_byte_delay: float = 0.2,
+        error_code: int = 0,
+        malformed_every: int = 0,
+        split_events: bool = False,
+        include_usage: bool = True,
+        prefill_ms_per_token: float = 0.0,
+        prefix_cache: bool = False,
+    ):
+        self.tokens = tokens
+        self.token_rate = token_rate  # 每秒 token 数，<=0 表示不限速
+        self.chunk_size = chunk_size  # 每个 SSE 事件包含的 token 数
+        self.first_byte_delay = first_byte_delay  # 秒
+        self.error_code = error_code  # 非 0 时直接返回该 HTTP 状态码
+        self.malformed_every = malformed_every  # 每 N 个事件插入一行畸形数据
+        self.split_events = split_events  # 把一个事件拆成多次写入，考验解析器
+        self.include_usage = include_usage
+        self.prefill_ms_per_token = prefill_ms_per_token  # 每个未命中缓存的 Prompt token 的预填充耗时
+        self.prefix_cache = prefix_cache  # 与之前请求的公共前缀免预填充
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        # 连接预热用
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        server: "MockSSEServer" = self.server.owner
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        settings = server.settings
+        server.requests += 1
+
+        if settings.first_byte_delay > 0:
+            time.sleep(settings.first_byte_delay)
+
+        if settings.error_code:
+            payload = json.dumps({"error": {"message": "mock error"}}).encode()
+            self.send_response(settings.error_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        prompt_tokens, cached_tokens = server.prefill(body.get("messages") or [])
+        uncached = prompt_tokens - cached_tokens
+        if settings.prefill_ms_per_token > 0 and uncached > 0:
+            time.sleep(uncached * settings.prefill_ms_per_token / 1000)
+
+        tokens = make_tokens(settings.tokens)
+        interval = (
+            settings.chunk_size / settings.token_rate if settings.token_rate > 0 else 0
+        )
+        model = body.get("model", "mock-model")
+        try:
+            for index in range(0, len(tokens), settings.chunk_size):
+                content = "".join(tokens[index : index + settings.chunk_size])
+                event = {
+                    "id": "mock",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": {"content": content}, "finish_reason": None}
+                    ],
+                }
+                data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode()
+                if settings.split_events and len(data) > 8:
+                    half = len(data) // 2
+                    self._write_chunk(data[:half])
+                    self._write_chunk(data[half:])
+                else:
+                    self._write_chunk(data)
+                event_no = index // settings.chunk_size + 1
+                if settings.malformed_every and event_no % settings.malformed_every == 0:
+                    self._write_chunk(b'data: {"choices": [{"delta": {"con\n\n')
+                    self._write_chunk(b": keep-alive comment\n\n")
+                if interval:
+                    time.sleep(interval)
+
+            if settings.include_usage:
+                usage = {
+                    "choices": [],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": prompt_tokens + len(tokens),
+                        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+                    },
+                }
+                self._write_chunk(f"data: {json.dumps(usage)}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端取消请求
+            pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class MockSSEServer:
+    """
+    在后台线程运行的模拟 SSE 服务器。
+
+    标准解释：
+    基于 ThreadingHTTPServer，每个请求按 settings 流式返回 chat.completion.chunk，
+    支持限速、首字节延迟、错误码、畸形行、事件拆包，以及末尾的 usage 事件。
+    开启 prefix_cache 时记住最近的 Prompt，新请求与它们的最长公共前缀（按块取整）
+    视为缓存命中，只有剩余部分计入预填充耗时，usage 里报告 cached_tokens。
+
+    小学生解释：
+    一个假装自己是 AI 的"陪练机器人"，说话快慢、会不会结巴、会不会出错都能调，
+    这样不用联网、不用花钱也能测出程序跑得快不快。
+    """
+
+    def __init__(self, settings: MockSettings | None = None, host="127.0.0.1", port=0):
+        self.settings = settings or MockSettings()
+        self.requests = 0
+        self._prompts: list[str] = []
+        self._prompts_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.owner = self
+        self._thread = None
+
+    def prefill(self, messages: list[dict]) -> tuple[int, int]:
+        """返回 (Prompt token 数, 命中前缀缓存的 token 数)，并记住这次的 Prompt"""
+        prompt = "".join(f"{m.get('role')}\n{m.get('content')}\n" for m in messages)
+        total = rough_tokens(prompt) if prompt else 600
+        if not self.settings.prefix_cache or not prompt:
+            return total, 0
+        with self._prompts_lock:
+            hit = max((common_prefix(prompt, seen) for seen in self._prompts), default=0)
+            self._prompts = [prompt] + self._prompts[:63]
+        hit -= hit % CACHE_BLOCK_CHARS
+        return total, min(total, rough_tokens(prompt[:hit]) if hit else 0)
+
+    def clear_cache(self):
+        with self._prompts_lock:
+            self._prompts = []
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockSSEServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 OpenAI 兼容流式接口")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    parser.add_argument("--chunk-size", type=int, default=1)
+    parser.add_argument("--first-byte-delay", type=float, default=0.2)
+    parser.add_argument("--error-code", type=int, default=0)
+    parser.add_argument("--malformed-every", type=int, default=0)
+    parser.add_argument("--split-events", action="store_true")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--prefix-cache", action="store_true")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        tokens=args.tokens,
+        token_rate=args.token_rate,
+        chunk_size=args.chunk_size,
+        first_byte_delay=args.first_byte_delay,
+        error_code=args.error_code,
+        malformed_every=args.malformed_every,
+        split_events=args.split_events,
+        prefill_ms_per_token=args.prefill_ms_per_token,
+        prefix_cache=args.prefix_cache,
+    )
+    server = MockSSEServer(settings, port=args.port).start()
+    print(f"模拟接口已启动：{server.base_url}/v1/chat/completions  (Ctrl+C 退出)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
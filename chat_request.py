@@ -0,0 +1,43 @@
+"""
+LLM 请求组装模块
+桌面端的流式请求和批量模式（batch_explain.py）共用：
+把组装好的 messages（见 prompt_builder）包装成 OpenAI 兼容的 chat/completions 请求，
+并从服务端返回的 usage 中读取 token 用量
+"""
+
+
+def build_request(
+    api_base_url: str,
+    api_key: str,
+    model_name: str,
+    messages: list[dict],
+    stream: bool = True,
+) -> tuple[str, dict, dict]:
+    """返回 (url, headers, payload)"""
+    url = f"{api_base_url.rstrip('/')}/v1/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": model_name,
+        "messages": messages,
+        "stream": stream,
+    }
+    if stream:
+        # 让服务端在最后一个事件里带上真实的 token 用量（含前缀缓存命中数）
+        payload["stream_options"] = {"include_usage": True}
+    return url, headers, payload
+
+
+def cached_tokens(usage: dict | None) -> int:
+    """
+    usage 中命中服务端前缀缓存的 Prompt token 数，服务端不报告时为 0。
+    OpenAI 格式：prompt_tokens_details.cached_tokens；DeepSeek：prompt_cache_hit_tokens
+    """
+    if not usage:
+        return 0
+    details = usage.get("prompt_tokens_details")
+    if isinstance(details, dict) and details.get("cached_tokens"):
+        return int(details["cached_tokens"])
+    return int(usage.get("prompt_cache_hit_tokens") or 0)
@@ -0,0 +1,210 @@
+"""
+剪贴板事件等待模块
+模拟 Ctrl+C 后不再死等固定时间，而是等剪贴板真正变化后立刻返回
+
+后端：
+  - Win32ClipboardBackend：通过 GetClipboardSequenceNumber 感知剪贴板变化
+  - FakeClipboardBackend：纯内存实现，Linux / 测试环境下也能跑
+"""
+
+import ctypes
+import sys
+import threading
+import time
+from collections import deque
+
+
+class ClipboardBackend:
+    """剪贴板后端接口"""
+
+    def get_text(self) -> str:
+        raise NotImplementedError
+
+    def set_text(self, text: str) -> None:
+        raise NotImplementedError
+
+    def sequence_number(self) -> int:
+        """剪贴板内容每变化一次，序号至少加一"""
+        raise NotImplementedError
+
+
+class Win32ClipboardBackend(ClipboardBackend):
+    """基于 user32 剪贴板 API 的 Windows 后端"""
+
+    CF_UNICODETEXT = 13
+    GMEM_MOVEABLE = 0x0002
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+
+    def get_text(self) -> str:
+        user32 = self._user32
+        kernel32 = self._kernel32
+        if not user32.OpenClipboard(0):
+            return ""
+        try:
+            handle = user32.GetClipboardData(self.CF_UNICODETEXT)
+            if not handle:
+                return ""
+            ptr = kernel32.GlobalLock(handle)
+            if not ptr:
+                return ""
+            try:
+                return ctypes.wstring_at(ptr)
+            finally:
+                kernel32.GlobalUnlock(handle)
+        finally:
+            user32.CloseClipboard()
+
+    def set_text(self, text: str) -> None:
+        user32 = self._user32
+        kernel32 = self._kernel32
+        if not user32.OpenClipboard(0):
+            return
+        try:
+            user32.EmptyClipboard()
+            if text:
+                byte_count = (len(text) + 1) * ctypes.sizeof(ctypes.c_wchar)
+                handle = kernel32.GlobalAlloc(self.GMEM_MOVEABLE, byte_count)
+                if not handle:
+                    return
+                ptr = kernel32.GlobalLock(handle)
+                if not ptr:
+                    return
+                ctypes.memmove(ptr, text, byte_count)
+                kernel32.GlobalUnlock(handle)
+                user32.SetClipboardData(self.CF_UNICODETEXT, handle)
+        finally:
+            user32.CloseClipboard()
+
+    def sequence_number(self) -> int:
+        return self._user32.GetClipboardSequenceNumber()
+
+
+class FakeClipboardBackend(ClipboardBackend):
+    """
+    内存剪贴板，用于测试和非 Windows 环境。
+
+    simulate_copy() 可以模拟"目标程序延迟 N 毫秒才把内容写进剪贴板"。
+    """
+
+    def __init__(self, text: str = ""):
+        self._lock = threading.Lock()
+        self._text = text
+        self._sequence = 0
+
+    def get_text(self) -> str:
+        with self._lock:
+            return self._text
+
+    def set_text(self, text: str) -> None:
+        with self._lock:
+            self._text = text
+            self._sequence += 1
+
+    def sequence_number(self) -> int:
+        with self._lock:
+            return self._sequence
+
+    def simulate_copy(self, text: str, delay: float = 0.0) -> None:
+        if delay <= 0:
+            self.set_text(text)
+            return
+        timer = threading.Timer(delay, self.set_text, args=(text,))
+        timer.daemon = True
+        timer.start()
+
+
+def create_default_backend() -> ClipboardBackend:
+    if sys.platform == "win32":
+        return Win32ClipboardBackend()
+    return FakeClipboardBackend()
+
+
+class ClipboardWaiter:
+    """
+    剪贴板变化等待器。
+
+    标准解释：
+    先记下剪贴板序号，再发送复制快捷键；随后以毫秒级间隔轮询序号，
+    一旦变化且能读到文本就立即返回，超过 timeout 才放弃。
+    每种获取策略（选中文本 / 全选）的实际等待耗时都会被记录下来。
+
+    小学生解释：
+    以前按完"复制"要傻等半秒才去看剪贴板，怕东西还没放进去。
+    现在小特工盯着剪贴板的"门铃"，门铃一响马上去取，一秒都不多等。
+    """
+
+    POLL_INTERVAL = 0.005
+    # 每种策略保留最近多少次耗时
+    HISTORY_SIZE = 100
+
+    def __init__(self, backend: ClipboardBackend | None = None):
+        self.backend = backend or create_default_backend()
+        self._stats_lock = threading.Lock()
+        self._latencies: dict[str, deque] = {}
+        self._timeouts: dict[str, int] = {}
+
+    # ==================== 基本操作 ====================
+
+    def get_text(self) -> str:
+        return self.backend.get_text()
+
+    def set_text(self, text: str) -> None:
+        self.backend.set_text(text)
+
+    def clear(self) -> int:
+        """清空剪贴板，返回清空后的序号（作为等待起点）"""
+        self.backend.set_text("")
+        return self.backend.sequence_number()
+
+    # ==================== 等待 ====================
+
+    def wait_for_text(self, since_sequence: int, timeout: float, strategy: str) -> str:
+        """
+        等待剪贴板序号相对 since_sequence 发生变化并出现非空文本。
+        超时返回当前剪贴板文本（可能为空）。
+        """
+        start = time.perf_counter()
+        deadline = start + timeout
+        text = ""
+        while True:
+            if self.backend.sequence_number() != since_sequence:
+                text = self.backend.get_text()
+                # 有的程序先 EmptyClipboard 再写入数据，序号变了但内容还没到
+                if text:
+                    self._record(strategy, time.perf_counter() - start, timed_out=False)
+                    return text
+            if time.perf_counter() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+
+        self._record(strategy, time.perf_counter() - start, timed_out=True)
+        return text or self.backend.get_text()
+
+    # ==================== 统计 ====================
+
+    def _record(self, strategy: str, elapsed: float, timed_out: bool):
+        with self._stats_lock:
+            history = self._latencies.setdefault(
+                strategy, deque(maxlen=self.HISTORY_SIZE)
+            )
+            history.append(elapsed)
+            if timed_out:
+                self._timeouts[strategy] = self._timeouts.get(strategy, 0) + 1
+
+    def latency_stats(self) -> dict:
+        """各策略的剪贴板等待耗时（毫秒）"""
+        result = {}
+        with self._stats_lock:
+            for strategy, history in self._latencies.items():
+                samples = sorted(history)
+                result[strategy] = {
+                    "count": len(samples),
+                    "avg_ms": sum(samples) / len(samples) * 1000,
+                    "p95_ms": samples[int(0.95 * (len(samples) - 1))] * 1000,
+                    "max_ms": samples[-1] * 1000,
+                    "timeouts": self._timeouts.get(strategy, 0),
+                }
+        return result
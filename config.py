@@ -1,35 +1,156 @@
 """
 配置管理模块
 负责读取和保存用户配置（API Key、模型地址、Prompt 等）
+
+配置在内存中保留一份解析好的快照，只有文件的 mtime / 大小变化或调用 save_config 时
+才重新读取；配置变化时通知订阅者（热键监听、HTTP 连接池等）重新配置。
 """
 
+import copy
 import json
+import logging
 import os
+import tempfile
+import threading
 from pathlib import Path
 
-from default_config import DEFAULT_CONFIG
+from default_config import get_default_config
 
 # 配置文件路径：用户目录下的 .floating_word_explainer/config.json
 CONFIG_DIR = Path.home() / ".floating_word_explainer"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
+logger = logging.getLogger(__name__)
 
-def load_config() -> dict:
-    """加载配置文件，不存在则返回默认配置"""
-    if CONFIG_FILE.exists():
+
+class ConfigService:
+    """
+    配置服务（带内存快照的配置读写）。
+
+    标准解释：
+    get() 先 stat 配置文件，mtime 和大小都没变就直接返回内存快照的副本，
+    省掉打开、解析 JSON 和合并默认值的开销。save() 先写临时文件再原子替换，
+    并发读取永远不会读到写了一半的文件。快照内容变化时依次回调订阅者。
+
+    小学生解释：
+    以前每按一次 Shift 都要把设置本子从抽屉里拿出来从头读一遍。
+    现在把本子内容记在脑子里，只有本子被改过（看修改时间）才重新读。
+    """
+
+    def __init__(self, path: Path = CONFIG_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._snapshot: dict | None = None
+        self._signature = None
+        self._subscribers = []
+
+    # ==================== 读取 ====================
+
+    def get(self) -> dict:
+        """返回当前配置的副本（调用方可随意修改）"""
+        signature = self._stat_signature()
+        with self._lock:
+            if self._snapshot is not None and signature == self._signature:
+                return copy.deepcopy(self._snapshot)
+            old = self._snapshot
+            new = self._read()
+            self._snapshot = new
+            self._signature = signature
+        if old is not None and old != new:
+            self._notify(old, new)
+        return copy.deepcopy(new)
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> dict:
+        """读取配置文件，不存在或损坏则返回默认配置"""
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                # 合并默认值（防止新增配置项缺失）
+                return {**get_default_config(), **saved}
+            except (json.JSONDecodeError, IOError):
+                return get_default_config().copy()
+        return get_default_config().copy()
+
+    # ==================== 保存 ====================
+
+    def save(self, config: dict) -> None:
+        """原子保存：写临时文件 → fsync → rename 覆盖"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=".config-", suffix=".tmp"
+        )
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                saved = json.load(f)
-            # 合并默认值（防止新增配置项缺失）
-            merged = {**DEFAULT_CONFIG, **saved}
-            return merged
-        except (json.JSONDecodeError, IOError):
-            return DEFAULT_CONFIG.copy()
-    return DEFAULT_CONFIG.copy()
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        new = {**get_default_config(), **copy.deepcopy(config)}
+        with self._lock:
+            old = self._snapshot
+            self._snapshot = new
+            self._signature = self._stat_signature()
+        if old is None or old != new:
+            self._notify(old or get_default_config().copy(), new)
+
+    # ==================== 订阅 ====================
+
+    def subscribe(self, callback):
+        """
+        订阅配置变化：callback(old_config, new_config)。
+        回调在触发变化的线程（调用 get / save 的线程，可能是任意后台线程）中执行，
+        需要在 GUI 线程里重新配置的订阅者应自行转发（如 Qt 信号的排队连接）。
+        回调抛出的异常会记录日志，不影响其它订阅者。返回取消订阅函数。
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, old: dict, new: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(copy.deepcopy(old), copy.deepcopy(new))
+            except Exception:
+                logger.exception("配置变化回调执行失败：%r", callback)
+
+
+# 进程内唯一的配置服务
+config_service = ConfigService()
+
+
+def load_config() -> dict:
+    """加载配置（内存快照，文件变化时自动重新读取）"""
+    return config_service.get()
 
 
 def save_config(config: dict) -> None:
-    """保存配置到文件"""
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    """保存配置到文件并通知订阅者"""
+    config_service.save(config)
+
+
+def subscribe(callback):
+    """订阅配置变化，见 ConfigService.subscribe"""
+    return config_service.subscribe(callback)
@@ -0,0 +1,115 @@
+"""
+页面上下文缓存模块
+按前台窗口（HWND + 标题）缓存整页上下文，同一篇文章里反复划词时跳过上下文获取
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from context_selector import locate_selection
+
+
+class _Entry:
+    def __init__(self, context: str, fingerprint: str, created_at: float):
+        self.context = context
+        self.fingerprint = fingerprint
+        self.created_at = created_at
+        self.size = sys.getsizeof(context)
+
+
+class ContextCache:
+    """
+    页面上下文缓存。
+
+    标准解释：
+    键为 (窗口句柄, 窗口标题)，值为原始整页文本及采集时的文档指纹。
+    命中需要同时满足：未过 TTL、指纹未变（UIA 控件运行时 ID + 文档开头的校验和）、
+    选中内容能在缓存文本里找到。按 LRU 淘汰，条数和内存占用都有上限。
+
+    小学生解释：
+    你在同一篇文章里查了十个词，小特工以前要"全选复制"十次，屏幕闪个不停。
+    现在他第一次就把文章抄下来，只要还是同一个窗口、文章没变，后面直接看抄本。
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 120.0,
+        max_entries: int = 16,
+        max_bytes: int = 8 * 1024 * 1024,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[int, str], _Entry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, hwnd: int, title: str, fingerprint: str, selected_text: str) -> str | None:
+        key = (hwnd, title)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if (
+                now - entry.created_at > self.ttl_seconds
+                or entry.fingerprint != fingerprint
+                or locate_selection(entry.context, selected_text) < 0
+            ):
+                # 过期、文档变了，或者选中内容不在缓存文本里：视为失效
+                self._remove(key)
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.context
+
+    def put(self, hwnd: int, title: str, fingerprint: str, context: str) -> None:
+        if not hwnd or not context:
+            return
+        entry = _Entry(context, fingerprint, time.monotonic())
+        if entry.size > self.max_bytes:
+            return
+        key = (hwnd, title)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, hwnd: int | None = None) -> None:
+        """清除指定窗口（或全部）的缓存"""
+        with self._lock:
+            for key in [k for k in self._entries if hwnd is None or k[0] == hwnd]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
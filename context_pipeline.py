@@ -0,0 +1,183 @@
+"""
+并行上下文获取模块
+无副作用的上下文策略（UIA、窗口标题、缓存等）在小线程池里同时执行，谁先拿到合格结果用谁；
+只有都不合格时才启用有副作用的 Ctrl+A 剪贴板策略
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from tracing import NULL_TRACE
+
+
+class ContextStrategy:
+    """
+    一种上下文获取策略。
+
+    func(selected_text) -> str
+    deadline   - 单个策略的等待上限（秒），超时结果作废
+    fallback   - 结果天生很短（如窗口标题），只在其它策略都失败时兜底使用
+    intrusive  - 有副作用（模拟按键 / 改剪贴板），不参与并行，只在最后串行执行
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func,
+        deadline: float = 0.3,
+        fallback: bool = False,
+        intrusive: bool = False,
+    ):
+        self.name = name
+        self.func = func
+        self.deadline = deadline
+        self.fallback = fallback
+        self.intrusive = intrusive
+
+
+class _StrategyStats:
+    def __init__(self):
+        self.runs = 0
+        self.successes = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.total_time = 0.0
+
+
+class ContextPipeline:
+    """
+    上下文获取流水线。
+
+    标准解释：
+    acquire() 把所有非侵入式策略同时提交到常驻线程池，按各自的 deadline 等待，
+    第一个长度达到 min_length 的结果立即胜出，其余结果丢弃。
+    都不合格时才串行执行侵入式策略（Ctrl+A 剪贴板）；仍不合格则用兜底结果
+    （窗口标题）。每个策略的耗时、成功率、超时次数都会被统计。
+
+    小学生解释：
+    以前是一个一个地问："透视眼你看到了吗？没有？那我再试全选大法……"
+    现在同时派出好几个小侦察兵，谁先带回有用的情报就听谁的；
+    只有大家都空手而归，才动用动静比较大的"全选大法"。
+    """
+
+    def __init__(
+        self,
+        strategies: list[ContextStrategy],
+        min_length: int,
+        max_workers: int = 6,
+    ):
+        self.strategies = [s for s in strategies if not s.intrusive]
+        self.intrusive = [s for s in strategies if s.intrusive]
+        self.min_length = min_length
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="context"
+        )
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, _StrategyStats] = {
+            s.name: _StrategyStats() for s in strategies
+        }
+
+    def acquire(self, selected_text: str, trace=NULL_TRACE) -> tuple[str, str]:
+        """返回 (上下文, 胜出的策略名)；全部失败时返回 ("", "")"""
+        fallbacks: dict[str, str] = {}
+        start = time.perf_counter()
+        futures = {
+            self._executor.submit(self._run, strategy, selected_text, trace): strategy
+            for strategy in self.strategies
+        }
+        deadlines = {f: start + s.deadline for f, s in futures.items()}
+        pending = set(futures)
+
+        try:
+            while pending:
+                now = time.perf_counter()
+                # 过了各自 deadline 的策略直接作废
+                for future in [f for f in pending if deadlines[f] <= now]:
+                    pending.discard(future)
+                    self._record(futures[future].name, now - start, timed_out=True)
+                if not pending:
+                    break
+                timeout = min(deadlines[f] for f in pending) - now
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    strategy = futures[future]
+                    text = future.result()
+                    if not strategy.fallback and len(text) >= self.min_length:
+                        return text, strategy.name
+                    if text:
+                        fallbacks[strategy.name] = text
+        finally:
+            for future in pending:
+                future.cancel()
+
+        # 无副作用的策略都不合格：启用侵入式策略（串行执行）
+        for strategy in self.intrusive:
+            text = self._run(strategy, selected_text, trace)
+            if len(text) >= self.min_length:
+                return text, strategy.name
+            if text:
+                fallbacks[strategy.name] = text
+
+        for strategy in self.strategies + self.intrusive:
+            if strategy.fallback and fallbacks.get(strategy.name):
+                return fallbacks[strategy.name], strategy.name
+        if fallbacks:
+            name = max(fallbacks, key=lambda k: len(fallbacks[k]))
+            return fallbacks[name], name
+        return "", ""
+
+    def _run(self, strategy: ContextStrategy, selected_text: str, trace=NULL_TRACE) -> str:
+        start = time.monotonic_ns()
+        try:
+            text = strategy.func(selected_text) or ""
+        except Exception:
+            end = time.monotonic_ns()
+            trace.add_span(f"context.{strategy.name}", start, end)
+            self._record(strategy.name, (end - start) / 1e9, error=True)
+            return ""
+        text = text.strip()
+        end = time.monotonic_ns()
+        trace.add_span(f"context.{strategy.name}", start, end)
+        self._record(
+            strategy.name,
+            (end - start) / 1e9,
+            success=not strategy.fallback and len(text) >= self.min_length,
+        )
+        return text
+
+    def _record(
+        self,
+        name: str,
+        elapsed: float,
+        success: bool = False,
+        timed_out: bool = False,
+        error: bool = False,
+    ):
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, _StrategyStats())
+            if timed_out:
+                # 超时的策略已经在 _run 里计过一次耗时（或仍在运行），这里只计数
+                stats.timeouts += 1
+                return
+            stats.runs += 1
+            stats.total_time += elapsed
+            stats.successes += int(success)
+            stats.errors += int(error)
+
+    def stats(self) -> dict:
+        """各策略的运行次数、成功率、平均耗时（毫秒）、超时与出错次数"""
+        with self._stats_lock:
+            return {
+                name: {
+                    "runs": s.runs,
+                    "success_rate": s.successes / s.runs if s.runs else 0.0,
+                    "avg_ms": s.total_time / s.runs * 1000 if s.runs else 0.0,
+                    "timeouts": s.timeouts,
+                    "errors": s.errors,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,324 @@
+"""
+上下文选择模块
+在整页文本中定位选中内容，按 token 预算截取以它为中心的完整段落 / 句子，
+可选再按与选中内容的词项重叠度补充相关段落，取代"只取前 5000 个字符"的截断
+"""
+
+import re
+
+# 中日韩统一表意文字、假名、全角标点：按 1 字 ≈ 1 token 估算
+_CJK_RE = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]"
+)
+_WORD_RE = re.compile(r"[A-Za-z0-9_]{2,}")
+_SENTENCE_END_RE = re.compile(r"(?<=[。！？!?；;])|(?<=[.](?=\s))")
+
+GAP_MARKER = "\n...\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：CJK 字符每个约 1 token，其余约 4 个字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _terms(text: str) -> set[str]:
+    """提取用于相关度打分的词项：英文单词 + 中文二元组"""
+    lowered = text.lower()
+    terms = set(_WORD_RE.findall(lowered))
+    cjk = "".join(_CJK_RE.findall(lowered))
+    terms.update(cjk[i : i + 2] for i in range(len(cjk) - 1))
+    if len(cjk) == 1:
+        terms.add(cjk)
+    return terms
+
+
+def term_containment(a: str, b: str) -> float:
+    """a 的词项有多大比例出现在 b 中；a 没有词项时视为完全包含"""
+    terms_a = _terms(a)
+    if not terms_a:
+        return 1.0
+    return len(terms_a & _terms(b)) / len(terms_a)
+
+
+def split_units(text: str) -> list[tuple[int, int]]:
+    """按行切分段落，返回每段在原文中的 (start, end)，跳过空行"""
+    units = []
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        end = pos + len(line)
+        if line.strip():
+            units.append((pos, end))
+        pos = end
+    return units
+
+
+def split_sentences(text: str, start: int, end: int) -> list[tuple[int, int]]:
+    """把 text[start:end] 切成句子，返回各句的绝对 (start, end)"""
+    spans = []
+    cursor = start
+    for match in _SENTENCE_END_RE.finditer(text, start, end):
+        if match.start() > cursor:
+            spans.append((cursor, match.start()))
+            cursor = match.start()
+    if cursor < end:
+        spans.append((cursor, end))
+    return spans
+
+
+def locate_selection(text: str, selection: str) -> int:
+    """在整页文本中查找选中内容，依次尝试：精确、忽略大小写、忽略空白差异"""
+    selection = selection.strip()
+    if not selection:
+        return -1
+    index = text.find(selection)
+    if index >= 0:
+        return index
+    lowered = text.lower()
+    index = lowered.find(selection.lower())
+    if index >= 0:
+        return index
+    words = selection.split()[:30]
+    if len(words) > 1:
+        pattern = r"\s+".join(re.escape(w) for w in words)
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            return match.start()
+    return -1
+
+
+def _grow_window(
+    spans: list[tuple[int, int]], center: int, costs: list[int], budget: int
+) -> tuple[int, int, int]:
+    """从 center 单元向两侧交替扩展，返回 (首单元, 尾单元, 已用 token)"""
+    first = last = center
+    used = costs[center]
+    while True:
+        grown = False
+        if last + 1 < len(spans) and used + costs[last + 1] <= budget:
+            last += 1
+            used += costs[last]
+            grown = True
+        if first - 1 >= 0 and used + costs[first - 1] <= budget:
+            first -= 1
+            used += costs[first]
+            grown = True
+        if not grown:
+            return first, last, used
+
+
+def select_context(
+    full_text: str,
+    selection: str,
+    token_budget: int = 1500,
+    relevance: bool = True,
+    relevance_share: float = 0.25,
+    count_tokens=estimate_tokens,
+    stable: bool = False,
+) -> str:
+    """
+    按 token 预算从整页文本中挑选上下文。
+    count_tokens 为计数函数，默认用估算；发请求前按模型预算精确裁剪时传入分词器的 count。
+    stable=True 时改为从固定切分的窗口中选择（见 _select_stable_window），
+    同一页上邻近的划词得到逐字节相同的上下文，便于命中服务端的前缀缓存。
+
+    标准解释：
+    1. 整页在预算内则原样返回
+    2. 定位选中内容所在段落，以它为中心向两侧扩展完整段落；
+       单段就超预算时退化为句子级扩展
+    3. （可选）剩余预算按与选中内容的词项重叠度挑选其它段落
+    4. 找不到选中内容且没有相关段落时，退回按预算从开头截取
+    各片段按原文顺序拼接，不相邻的片段之间用省略号隔开。
+
+    小学生解释：
+    以前只看文章的前几页，可你划的词可能在最后一页。
+    现在先翻到你划词的那一页，把附近几段读给 AI 听，
+    再挑几段提到同一个词的段落，合起来刚好塞满"能说的话"的额度。
+    """
+    full_text = full_text.strip()
+    if not full_text or count_tokens(full_text) <= token_budget:
+        return full_text
+
+    spans = split_units(full_text)
+    if not spans:
+        return ""
+    costs = [count_tokens(full_text[s:e]) for s, e in spans]
+    if stable:
+        return _select_stable_window(full_text, selection, spans, costs, token_budget, count_tokens)
+
+    chosen: list[tuple[int, int]] = []
+    used = 0
+    window_budget = token_budget
+    if relevance:
+        # 预留一部分预算给相关段落
+        window_budget = int(token_budget * (1 - relevance_share))
+
+    index = locate_selection(full_text, selection)
+    if index >= 0:
+        center = next(
+            (i for i, (s, e) in enumerate(spans) if s <= index < e),
+            min(range(len(spans)), key=lambda i: abs(spans[i][0] - index)),
+        )
+        if costs[center] > window_budget:
+            # 单段就超预算：在这一段里按句子扩展
+            sentences = split_sentences(full_text, *spans[center])
+            sentence_costs = [count_tokens(full_text[s:e]) for s, e in sentences]
+            pivot = next(
+                (i for i, (s, e) in enumerate(sentences) if s <= index < e), 0
+            )
+            if sentence_costs[pivot] > window_budget:
+                # 所在的句子 / 行本身也超预算：在选中位置附近截一个窗口
+                start, end = _window_around(
+                    full_text, *sentences[pivot], index, window_budget, count_tokens
+                )
+                chosen.append((start, end))
+                used = count_tokens(full_text[start:end])
+            else:
+                first, last, used = _grow_window(
+                    sentences, pivot, sentence_costs, window_budget
+                )
+                chosen.append((sentences[first][0], sentences[last][1]))
+        else:
+            first, last, used = _grow_window(spans, center, costs, window_budget)
+            chosen.extend(spans[first : last + 1])
+
+    if relevance:
+        selection_terms = _terms(selection)
+        taken = set(chosen)
+        scored = []
+        for span, cost in zip(spans, costs):
+            if span in taken or cost > token_budget - used:
+                continue
+            overlap = len(selection_terms & _terms(full_text[span[0] : span[1]]))
+            if overlap:
+                scored.append((overlap / (1 + cost) ** 0.5, span, cost))
+        for _, span, cost in sorted(scored, reverse=True):
+            if used + cost <= token_budget:
+                chosen.append(span)
+                used += cost
+
+    if not chosen:
+        # 兜底：从开头按预算截取完整段落
+        for span, cost in zip(spans, costs):
+            if used + cost > token_budget:
+                break
+            chosen.append(span)
+            used += cost
+        if not chosen:
+            return _truncate_to_budget(full_text, token_budget, count_tokens)
+
+    return _join_spans(full_text, sorted(chosen))
+
+
+def _select_stable_window(
+    full_text: str,
+    selection: str,
+    spans: list[tuple[int, int]],
+    costs: list[int],
+    token_budget: int,
+    count_tokens=estimate_tokens,
+) -> str:
+    """
+    从只取决于整页文本和预算的固定窗口中，挑出包含选中内容的那一个。
+
+    标准解释：
+    把整页按原文顺序切成若干"半块"（每块不超过半个预算，超长段落按句子切），
+    相邻两个半块组成一个窗口，窗口之间重叠半块。选中内容落在某个半块的前半部分时
+    取它和前一块组成的窗口，落在后半部分时取它和后一块，两侧至少各留约 1/4 预算。
+    窗口边界与选中内容无关，所以同一区域里划不同的词，发出去的上下文完全相同。
+    不做相关段落补充（那一步取决于选中内容）。
+
+    小学生解释：
+    以前每划一个词都重新"以它为中心"剪一段文章，剪出来每次都不一样，
+    AI 服务器记不住。现在先把文章按固定的位置剪成几份，划到哪份就给哪份，
+    同一份里再划别的词，AI 服务器一看："这段我刚读过"，马上就能开始回答。
+    """
+    half = max(1, token_budget // 2)
+    units: list[tuple[int, int]] = []
+    unit_costs: list[int] = []
+    for span, cost in zip(spans, costs):
+        if cost > half:
+            for sentence in split_sentences(full_text, *span):
+                units.append(sentence)
+                unit_costs.append(count_tokens(full_text[sentence[0] : sentence[1]]))
+        else:
+            units.append(span)
+            unit_costs.append(cost)
+
+    # 按原文顺序贪心装箱成半块
+    blocks: list[list[tuple[int, int]]] = [[]]
+    used = 0
+    for unit, cost in zip(units, unit_costs):
+        if blocks[-1] and used + cost > half:
+            blocks.append([])
+            used = 0
+        blocks[-1].append(unit)
+        used += cost
+
+    index = locate_selection(full_text, selection)
+    block = 0
+    if index >= 0:
+        block = next(
+            (i for i, b in enumerate(blocks) if index < b[-1][1]), len(blocks) - 1
+        )
+    if len(blocks) == 1:
+        first = 0
+    else:
+        middle = (blocks[block][0][0] + blocks[block][-1][1]) // 2
+        first = block - 1 if index < middle else block
+        first = max(0, min(first, len(blocks) - 2))
+
+    window = [unit for b in blocks[first : first + 2] for unit in b]
+    text = _join_spans(full_text, window)
+    if count_tokens(text) > token_budget:
+        # 单句就超过半个预算：截断是确定性的，结果依然稳定
+        text = _truncate_to_budget(text, token_budget, count_tokens)
+    return text
+
+
+def _join_spans(text: str, spans: list[tuple[int, int]]) -> str:
+    """按原文顺序拼接片段，相邻片段之间只隔空白时直接连接"""
+    parts = []
+    prev_end = None
+    for start, end in spans:
+        if prev_end is not None and start < prev_end:
+            start = prev_end
+            if start >= end:
+                continue
+        chunk = text[start:end].strip()
+        if not chunk:
+            continue
+        if prev_end is not None:
+            gap = text[prev_end:start]
+            parts.append("\n" if not gap.strip() else GAP_MARKER)
+        parts.append(chunk)
+        prev_end = end
+    return "".join(parts)
+
+
+def _window_around(
+    text: str, start: int, end: int, index: int, token_budget: int, count_tokens=estimate_tokens
+) -> tuple[int, int]:
+    """在 text[start:end] 中截取包含 index 的窗口：前面最多用一半预算，其余给后面"""
+    low, high = start, index
+    while low < high:
+        mid = (low + high) // 2
+        if count_tokens(text[mid:index]) <= token_budget // 2:
+            high = mid
+        else:
+            low = mid + 1
+    return low, low + len(_truncate_to_budget(text[low:end], token_budget, count_tokens))
+
+
+def _truncate_to_budget(text: str, token_budget: int, count_tokens=estimate_tokens) -> str:
+    """按 token 预算截断字符串（单段超长且无法定位时使用）"""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= token_budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
@@ -4,28 +4,133 @@
 
 敏感信息（API Key 等）从 .env 文件加载
 系统提示词从 system_prompt.txt 加载
+
+两者都推迟到第一次读取配置时才加载（get_default_config），
+import 本模块不做任何文件读取；没有 .env 文件时连 dotenv 都不导入
 """
 
 import os
+import threading
 from pathlib import Path
-from dotenv import load_dotenv
-
-# 加载 .env 文件
-load_dotenv(Path(__file__).parent / ".env")
-
-# 加载系统提示词
-_prompt_file = Path(__file__).parent / "system_prompt.txt"
-if _prompt_file.exists():
-    _default_prompt = _prompt_file.read_text(encoding="utf-8").strip()
-else:
-    _default_prompt = "请简明扼要地解释以下内容：\n\n{text}"
-
-# 默认配置
-DEFAULT_CONFIG = {
-    "api_key": os.getenv("API_KEY", ""),
-    "api_base_url": os.getenv("API_BASE_URL", "https://api.deepseek.com"),
-    "model_name": os.getenv("MODEL_NAME", "deepseek-chat"),
-    "default_prompt": _default_prompt,
-    "hotkey": "shift",
-    "theme": "auto",  # auto / dark / light
-}
+
+_BASE_DIR = Path(__file__).parent
+_FALLBACK_PROMPT = "请简明扼要地解释以下内容：\n\n{text}"
+
+_lock = threading.Lock()
+_default_config: dict | None = None
+
+
+def _load_env() -> None:
+    """加载 .env 文件（不存在时跳过，省掉导入 dotenv 的时间）"""
+    env_file = _BASE_DIR / ".env"
+    if env_file.exists():
+        from dotenv import load_dotenv
+
+        load_dotenv(env_file)
+
+
+def _load_prompt() -> str:
+    """加载系统提示词"""
+    prompt_file = _BASE_DIR / "system_prompt.txt"
+    if prompt_file.exists():
+        return prompt_file.read_text(encoding="utf-8").strip()
+    return _FALLBACK_PROMPT
+
+
+def get_default_config() -> dict:
+    """返回默认配置（首次调用时加载 .env 和提示词，之后直接复用）"""
+    global _default_config
+    with _lock:
+        if _default_config is None:
+            _load_env()
+            _default_config = _build_default_config()
+        return _default_config
+
+
+def __getattr__(name: str):
+    # 兼容旧写法 from default_config import DEFAULT_CONFIG
+    if name == "DEFAULT_CONFIG":
+        return get_default_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _build_default_config() -> dict:
+    return {
+        "api_key": os.getenv("API_KEY", ""),
+        "api_base_url": os.getenv("API_BASE_URL", "https://api.deepseek.com"),
+        "model_name": os.getenv("MODEL_NAME", "deepseek-chat"),
+        "default_prompt": _load_prompt(),
+        "hotkey": "shift",
+        "theme": "auto",  # auto / dark / light
+        # HTTP 连接池（keep-alive 复用，省掉每次划词的握手时间）
+        "http_max_connections": 10,
+        "http_max_keepalive_connections": 5,
+        "http_keepalive_expiry": 90.0,  # 空闲连接保留秒数
+        "http2": False,  # 需要安装 h2：pip install httpx[http2]
+        # LLM 请求后端：thread（常驻线程 + 同步 httpx）/ asyncio（事件循环 + AsyncClient，
+        # 多个流并发、取消立即中止读取）/ local（本进程内的 GGUF 模型，见下方 local_llm_*）
+        "llm_backend": "thread",
+        # 常驻请求线程数（对冲 + 推测请求最多同时占用 4 个）
+        "request_workers": 4,
+        # 流式输出合并推送间隔（毫秒），约一帧；0 表示逐 delta 推送
+        "stream_flush_interval_ms": 16,
+        # 额外的 LLM 端点（与上面的默认端点组成端点池），例如本地 Ollama：
+        # {"name": "ollama", "api_base_url": "http://127.0.0.1:11434",
+        #  "api_key": "", "model_name": "qwen2.5:7b", "weight": 1.0, "rpm": 0}
+        "endpoints": [],
+        "default_endpoint_weight": 1.0,
+        # 每分钟请求数上限（0 = 不限），批量模式 batch_explain.py 按端点限速
+        "default_endpoint_rpm": 0,
+        # 对冲请求：主端点在其首 token p95 内没出字，就向另一个端点再发一次，先到先用
+        "hedge_enabled": True,
+        "hedge_min_delay_ms": 300,
+        "hedge_max_delay_ms": 5000,
+        "hedge_default_delay_ms": 1500,  # 样本不足时的等待时间
+        # 推测请求：选中文本一到手、上下文还在获取时就提前动手
+        # off / connect（只提前建连）/ request（提前发出只带窗口标题的请求）
+        "speculative_prefetch": "connect",
+        # 最终上下文里选中内容附近的词项，已出现在推测时上下文（窗口标题）里的比例低于该值时，
+        # 取消推测请求并带上下文重新请求
+        "speculative_similarity_threshold": 0.5,
+        # 回答缓存（重复划词直接出结果，不再请求 LLM）
+        "answer_cache_enabled": True,
+        "answer_cache_ttl_hours": 168,
+        "answer_cache_max_entries": 2000,
+        "answer_cache_max_mb": 20,
+        # 查词历史（托盘"历史记录"可全文搜索、重新打开）：超出保留天数 / 条数 / 体积时删除最旧的
+        "history_enabled": True,
+        "history_retention_days": 180,
+        "history_max_entries": 5000,
+        "history_max_mb": 50,
+        # 上下文选择：以选中内容为中心截取，单位为估算 token
+        "context_token_budget": 1500,
+        "context_relevance_scoring": True,  # 额外补充与选中内容相关的段落
+        # 发请求前按模型的 token 预算（模板 + 选中文本 + 上下文）精确裁剪上下文
+        # tokenizer：auto（装了 tiktoken 用 BPE 计数，否则估算）/ approx（总是估算）
+        "tokenizer": "auto",
+        "prompt_token_budget": 4000,
+        # 按模型单独设置预算，例如 {"deepseek-chat": 8000, "qwen2.5:7b": 2000}
+        "model_token_budgets": {},
+        # 前缀缓存友好的消息布局：固定指令放 system 消息，其后是上下文，选中文本放最后；
+        # 上下文按固定窗口截取，同一页上的重复查词命中服务端的 KV 缓存（首 token 更快、更便宜）
+        # 关闭后恢复为整个模板填充成一条 user 消息、上下文以选中内容为中心截取
+        "prompt_cache_layout": True,
+        # 页面上下文缓存：同一窗口反复划词时跳过 Ctrl+A 全选复制
+        "context_cache_ttl": 120,  # 秒
+        "context_cache_max_mb": 8,
+        # 本地模型（llm_backend 设为 local 时使用，需要 pip install llama-cpp-python）：
+        # 启动后在后台加载 GGUF 模型并常驻内存，完全离线
+        "local_llm_model_path": "",  # 例如 D:/models/qwen2.5-3b-instruct-q4_k_m.gguf
+        "local_llm_threads": 0,  # 0 = 由 llama.cpp 按物理核数决定
+        "local_llm_n_ctx": 4096,  # 上下文长度（Prompt + 回答），越大占用内存越多
+        "local_llm_max_tokens": 768,
+        "local_llm_temperature": 0.3,
+        "local_llm_cache_mb": 256,  # 保留最近几页的 KV 状态，来回切换页面也能复用；0 = 只复用上一次
+        # 本地词典（先用 python dictionary_builder.py ecdict.csv 生成索引）：
+        # off - 不使用；before_llm - 先显示词典释义，AI 解释接在下面；instead - 查到就不再请求 AI
+        "local_dict_mode": "off",
+        "local_dict_path": "",  # 留空使用 ~/.floating_word_explainer/dictionary.fwd
+        # 延迟追踪：写入 ~/.floating_word_explainer/traces.jsonl，托盘菜单查看 p50 / p95
+        "trace_enabled": True,
+        "trace_history": 200,  # 统计最近多少次查词
+    }
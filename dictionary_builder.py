@@ -0,0 +1,219 @@
+"""
+本地词典索引生成工具
+把离线词典导入成 local_dictionary 使用的内存映射索引：
+
+- ECDICT 风格的 CSV（word, phonetic, definition, translation, ..., tag, ..., exchange）
+- StarDict（.ifo / .idx / .dict 或 .dict.dz）
+- 每行 "词<Tab>释义" 的 TSV
+
+ECDICT 的 exchange 字段（如 p:went/d:gone/i:going/3:goes）会写入变形表，
+查 went 直接命中 go。
+
+用法：
+    python dictionary_builder.py ecdict.csv
+    python dictionary_builder.py stardict-langdao-ec-gb.ifo -o ~/my_dict.fwd
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from local_dictionary import (
+    DICTIONARY_FILE,
+    FIELD_SEP,
+    HEADER,
+    MAGIC,
+    VERSION,
+    normalize,
+)
+
+# exchange 字段里代表"变形"的类型：过去式、过去分词、现在分词、第三人称单数、比较级、最高级、复数
+_FORM_TYPES = set("pdi3rts")
+
+
+def _clean(value: str) -> str:
+    # ECDICT 的多行释义在 CSV 里写成字面的 \n
+    return value.replace("\\n", "\n").replace(FIELD_SEP, " ").strip()
+
+
+def read_ecdict(path: Path):
+    """逐行产出 (word, phonetic, translation, definition, tag, forms)"""
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            word = (row.get("word") or "").strip()
+            if not word:
+                continue
+            forms = []
+            for part in (row.get("exchange") or "").split("/"):
+                kind, _, form = part.partition(":")
+                if kind in _FORM_TYPES and form:
+                    forms.append(form)
+            yield (
+                word,
+                _clean(row.get("phonetic") or ""),
+                _clean(row.get("translation") or ""),
+                _clean(row.get("definition") or ""),
+                _clean(row.get("tag") or ""),
+                forms,
+            )
+
+
+def read_stardict(ifo: Path):
+    """StarDict：.idx 里是 (词\\0, 偏移 u32, 长度 u32)，释义在 .dict（或 gzip 压缩的 .dict.dz）"""
+    base = str(ifo.with_suffix(""))
+    info = dict(
+        line.split("=", 1)
+        for line in ifo.read_text(encoding="utf-8").splitlines()
+        if "=" in line
+    )
+    offset_bits = int(info.get("idxoffsetbits", 32))
+    entry = struct.Struct(">QI" if offset_bits == 64 else ">II")
+    idx_path = Path(base + ".idx")
+    if idx_path.exists():
+        idx = idx_path.read_bytes()
+    else:
+        idx = gzip.decompress(Path(base + ".idx.gz").read_bytes())
+    dict_path = Path(base + ".dict")
+    if dict_path.exists():
+        data = dict_path.read_bytes()
+    else:
+        # .dict.dz 是带随机访问索引的 gzip，整体解压即可
+        data = gzip.decompress(Path(base + ".dict.dz").read_bytes())
+
+    pos = 0
+    while pos < len(idx):
+        end = idx.index(b"\0", pos)
+        word = idx[pos:end].decode("utf-8", errors="replace").strip()
+        offset, size = entry.unpack_from(idx, end + 1)
+        pos = end + 1 + entry.size
+        if word:
+            text = data[offset : offset + size].decode("utf-8", errors="replace")
+            yield word, "", _clean(text), "", "", []
+
+
+def read_tsv(path: Path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            word, _, text = line.rstrip("\n").partition("\t")
+            if word.strip():
+                yield word.strip(), "", _clean(text), "", "", []
+
+
+def read_source(path: Path):
+    if path.suffix == ".ifo":
+        return read_stardict(path)
+    if path.suffix == ".csv":
+        return read_ecdict(path)
+    return read_tsv(path)
+
+
+def _pad(out: io.BufferedWriter):
+    """区段按 8 字节对齐"""
+    remainder = out.tell() % 8
+    if remainder:
+        out.write(b"\0" * (8 - remainder))
+
+
+def _write_blob(out, items: list[bytes]) -> tuple[int, int]:
+    """写入偏移表（len+1 个 u64）和拼接的数据，返回两者的起始位置"""
+    offsets = array("Q", [0])
+    total = 0
+    for item in items:
+        total += len(item)
+        offsets.append(total)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    _pad(out)
+    offsets_pos = out.tell()
+    out.write(offsets.tobytes())
+    blob_pos = out.tell()
+    for item in items:
+        out.write(item)
+    return offsets_pos, blob_pos
+
+
+def build_index(entries, output: Path) -> dict:
+    """
+    把 (word, phonetic, translation, definition, tag, forms) 序列写成索引文件。
+    词条按规范化键的字节序排序；变形只在不与某个词条同名时才写入变形表。
+    先写临时文件再替换，中途失败不会留下损坏的索引
+    （Windows 上正在使用该索引的程序会占用文件，需先退出悬浮词典）。
+    """
+    rows = []
+    for word, phonetic, translation, definition, tag, forms in entries:
+        key = normalize(word).encode("utf-8")
+        if key:
+            record = FIELD_SEP.join((word, phonetic, translation, definition, tag))
+            rows.append((key, record.encode("utf-8"), forms))
+    rows.sort(key=lambda row: row[0])
+
+    keys = {row[0] for row in rows}
+    form_targets: dict[bytes, int] = {}
+    for index, (_key, _record, forms) in enumerate(rows):
+        for form in forms:
+            form_key = normalize(form).encode("utf-8")
+            if form_key and form_key not in keys:
+                form_targets.setdefault(form_key, index)
+    form_keys = sorted(form_targets)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temp = output.with_name(output.name + ".tmp")
+    with open(temp, "wb") as out:
+        out.write(b"\0" * HEADER.size)
+        key_offsets, key_blob = _write_blob(out, [row[0] for row in rows])
+        record_offsets, record_blob = _write_blob(out, [row[1] for row in rows])
+        form_offsets, form_blob = _write_blob(out, form_keys)
+        targets = array("I", (form_targets[key] for key in form_keys))
+        if sys.byteorder != "little":
+            targets.byteswap()
+        _pad(out)
+        targets_pos = out.tell()
+        out.write(targets.tobytes())
+        out.seek(0)
+        out.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                len(rows),
+                len(form_keys),
+                key_offsets,
+                key_blob,
+                record_offsets,
+                record_blob,
+                form_offsets,
+                form_blob,
+                targets_pos,
+            )
+        )
+    temp.replace(output)
+    return {
+        "entries": len(rows),
+        "forms": len(form_keys),
+        "size_mb": round(output.stat().st_size / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", type=Path, help="ECDICT .csv / StarDict .ifo / TSV 文件")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=DICTIONARY_FILE, help="索引输出路径"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = build_index(read_source(args.source), args.output)
+    print(
+        f"已生成 {args.output}：{stats['entries']} 个词条，{stats['forms']} 个变形，"
+        f"{stats['size_mb']} MB，用时 {time.perf_counter() - start:.1f} 秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+LLM 端点池模块
+管理多个 OpenAI 兼容端点（接口地址、密钥、模型、权重），
+为每个端点维护首 token 延迟直方图，据此给出对冲请求的等待时间
+"""
+
+import bisect
+import random
+import threading
+import time
+
+# 直方图桶边界（毫秒）：10ms ~ 约 70s，按 1.25 倍递增
+_BUCKET_EDGES = [10.0 * 1.25**i for i in range(40)]
+
+
+class LatencyHistogram:
+    """
+    固定桶的延迟直方图，内存占用恒定。
+
+    样本数超过 max_samples 时所有计数减半，旧样本的影响逐渐衰减，
+    分位数能跟上端点最近的表现。
+    """
+
+    def __init__(self, max_samples: int = 500):
+        self.max_samples = max_samples
+        self._counts = [0.0] * (len(_BUCKET_EDGES) + 1)
+        self._total = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self._total)
+
+    def add(self, value_ms: float):
+        index = bisect.bisect_left(_BUCKET_EDGES, value_ms)
+        self._counts[index] += 1
+        self._total += 1
+        if self._total > self.max_samples:
+            self._counts = [c / 2 for c in self._counts]
+            self._total /= 2
+
+    def percentile(self, pct: float) -> float:
+        """返回分位数所在桶的上边界（毫秒）；没有样本时返回 0"""
+        if self._total <= 0:
+            return 0.0
+        target = self._total * pct / 100
+        cumulative = 0.0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return _BUCKET_EDGES[min(index, len(_BUCKET_EDGES) - 1)]
+        return _BUCKET_EDGES[-1]
+
+
+class Endpoint:
+    """一个 OpenAI 兼容端点"""
+
+    def __init__(
+        self,
+        name: str,
+        api_base_url: str,
+        api_key: str,
+        model_name: str,
+        weight: float = 1.0,
+        rpm: float = 0.0,
+    ):
+        self.name = name
+        self.api_base_url = api_base_url.rstrip("/")
+        self.api_key = api_key
+        self.model_name = model_name
+        self.weight = max(0.0, weight)
+        # 每分钟请求数上限，0 表示不限（批量模式按它限速）
+        self.rpm = max(0.0, rpm)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.api_base_url, self.model_name)
+
+
+class _EndpointState:
+    def __init__(self):
+        self.first_token = LatencyHistogram()
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+
+class EndpointPool:
+    """
+    端点池。
+
+    标准解释：
+    主端点按权重随机选择（连续失败的端点会暂时降级）；对冲端点选择
+    首 token p95 最低的其余端点。对冲等待时间取主端点首 token 延迟的 p95，
+    并限制在 [hedge_min_delay_ms, hedge_max_delay_ms] 之间；
+    样本不足时使用 hedge_default_delay_ms。
+
+    小学生解释：
+    我们有好几个 AI 老师可以问。平时按"谁更常用"挑一个先问；
+    如果这个老师比平常最慢的时候还慢都没开口，就再去问另一个老师，
+    谁先开口就听谁的。每个老师平时多快开口，我们都记在小本本上。
+    """
+
+    FAILURE_COOLDOWN = 60.0  # 连续失败后降级的秒数
+    FAILURE_THRESHOLD = 3
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: list[Endpoint] = []
+        self._states: dict[tuple[str, str], _EndpointState] = {}
+        self.hedge_enabled = True
+        self.hedge_min_delay_ms = 300.0
+        self.hedge_max_delay_ms = 5000.0
+        self.hedge_default_delay_ms = 1500.0
+        self.hedge_min_samples = 5
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        # 首 token 前出错后换端点重试：不是延迟对冲，单独计数，不影响对冲延迟的调优
+        self.retries_fired = 0
+        self.retries_won = 0
+
+    def configure(self, config: dict):
+        """
+        从配置重建端点列表：顶层的 api_base_url / api_key / model_name 是默认端点，
+        endpoints 里是额外端点。同一 (地址, 模型) 的延迟统计会保留。
+        """
+        endpoints = []
+        if config.get("api_key", "").strip():
+            endpoints.append(
+                Endpoint(
+                    "default",
+                    config.get("api_base_url", "https://api.deepseek.com"),
+                    config.get("api_key", "").strip(),
+                    config.get("model_name", "deepseek-chat"),
+                    float(config.get("default_endpoint_weight", 1.0)),
+                    float(config.get("default_endpoint_rpm", 0)),
+                )
+            )
+        for index, item in enumerate(config.get("endpoints", [])):
+            if not item.get("api_base_url"):
+                continue
+            endpoints.append(
+                Endpoint(
+                    item.get("name") or f"endpoint{index + 1}",
+                    item["api_base_url"],
+                    item.get("api_key", "").strip(),
+                    item.get("model_name") or config.get("model_name", "deepseek-chat"),
+                    float(item.get("weight", 1.0)),
+                    float(item.get("rpm", 0)),
+                )
+            )
+
+        with self._lock:
+            self.endpoints = endpoints
+            for endpoint in endpoints:
+                self._states.setdefault(endpoint.key, _EndpointState())
+            self.hedge_enabled = bool(config.get("hedge_enabled", True))
+            self.hedge_min_delay_ms = float(config.get("hedge_min_delay_ms", 300))
+            self.hedge_max_delay_ms = float(config.get("hedge_max_delay_ms", 5000))
+            self.hedge_default_delay_ms = float(config.get("hedge_default_delay_ms", 1500))
+
+    # ==================== 选择端点 ====================
+
+    def choose(self) -> Endpoint | None:
+        """按权重选择主端点，优先不在降级期的端点"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [
+                e
+                for e in self.endpoints
+                if e.weight > 0 and self._states[e.key].cooldown_until <= now
+            ]
+            candidates = healthy or [e for e in self.endpoints if e.weight > 0]
+            if not candidates:
+                return self.endpoints[0] if self.endpoints else None
+            return random.choices(candidates, weights=[e.weight for e in candidates])[0]
+
+    def hedge_candidate(self, exclude: list[Endpoint]) -> Endpoint | None:
+        """对冲端点：其余端点中首 token p95 最低的（没有样本的按权重排在后面）"""
+        excluded = {e.key for e in exclude}
+        now = time.monotonic()
+        with self._lock:
+            others = [e for e in self.endpoints if e.key not in excluded]
+            if not others:
+                return None
+
+            def rank(endpoint: Endpoint):
+                state = self._states[endpoint.key]
+                cooling = state.cooldown_until > now
+                p95 = state.first_token.percentile(95) or float("inf")
+                return (cooling, p95, -endpoint.weight)
+
+            return min(others, key=rank)
+
+    def hedge_delay_ms(self, endpoint: Endpoint) -> float:
+        """主端点迟迟不出首 token 时，等多久再发对冲请求"""
+        with self._lock:
+            histogram = self._states[endpoint.key].first_token
+            if histogram.count < self.hedge_min_samples:
+                delay = self.hedge_default_delay_ms
+            else:
+                delay = histogram.percentile(95)
+            return max(self.hedge_min_delay_ms, min(delay, self.hedge_max_delay_ms))
+
+    # ==================== 记录 ====================
+
+    def record_start(self, endpoint: Endpoint, hedge: bool = False, retry: bool = False):
+        with self._lock:
+            self._states[endpoint.key].requests += 1
+            if hedge:
+                self.hedges_fired += 1
+            elif retry:
+                self.retries_fired += 1
+
+    def record_first_token(
+        self,
+        endpoint: Endpoint,
+        latency_ms: float,
+        won: bool = True,
+        hedge: bool = False,
+        retry: bool = False,
+    ):
+        """
+        记录首 token 延迟。被放弃的端点也会记录一次（已等待的时间是它延迟的下限），
+        这样卡住的端点 p95 会变大，之后更早触发对冲。
+        """
+        with self._lock:
+            state = self._states[endpoint.key]
+            state.first_token.add(latency_ms)
+            if won:
+                state.wins += 1
+                state.consecutive_failures = 0
+                if hedge:
+                    self.hedges_won += 1
+                elif retry:
+                    self.retries_won += 1
+
+    def record_failure(self, endpoint: Endpoint):
+        with self._lock:
+            state = self._states[endpoint.key]
+            state.failures += 1
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= self.FAILURE_THRESHOLD:
+                state.cooldown_until = time.monotonic() + self.FAILURE_COOLDOWN
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hedges_fired": self.hedges_fired,
+                "hedges_won": self.hedges_won,
+                "retries_fired": self.retries_fired,
+                "retries_won": self.retries_won,
+                "endpoints": {
+                    e.name: {
+                        "requests": self._states[e.key].requests,
+                        "wins": self._states[e.key].wins,
+                        "failures": self._states[e.key].failures,
+                        "samples": self._states[e.key].first_token.count,
+                        "p50_ms": self._states[e.key].first_token.percentile(50),
+                        "p95_ms": self._states[e.key].first_token.percentile(95),
+                    }
+                    for e in self.endpoints
+                },
+            }
@@ -3,7 +3,6 @@
 毛玻璃效果、Markdown 渲染、跟随鼠标、可拖动、关闭按钮、自动隐藏
 """
 
-import markdown
 from PyQt6.QtWidgets import (
     QWidget,
     QVBoxLayout,
@@ -24,6 +23,9 @@ from PyQt6.QtGui import (
     QCursor,
 )
 
+import tracing
+from markdown_renderer import IncrementalMarkdownRenderer
+
 
 class FloatingWindow(QWidget):
     """
@@ -32,6 +34,8 @@ class FloatingWindow(QWidget):
     标准解释：
     无边框置顶窗口，带圆角半透明背景、Markdown渲染、可拖动、关闭按钮，
     通过定时器检测焦点丢失实现自动关闭。
+    流式输出时滚动和高度调整合并到单次定时器里批量执行，高度按台阶增长，
+    到达最大高度后不再改变窗口几何，避免每个 token 都触发整窗重排和重绘。
 
     小学生解释：
     一个半透明的魔法小窗口：
@@ -48,12 +52,15 @@ class FloatingWindow(QWidget):
     WINDOW_MAX_HEIGHT = 450
     CORNER_RADIUS = 16
     MARGIN = 12
+    # 文档高度每跨过一个台阶才改一次窗口高度
+    HEIGHT_STEP = 24
+    # 滚动 / 调整高度的合并间隔（毫秒），约两帧
+    GEOMETRY_INTERVAL_MS = 33
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._setup_window_flags()
         self._setup_ui()
-        self._accumulated_text = ""
         self._loading = False
 
         # 拖动相关
@@ -70,6 +77,17 @@ class FloatingWindow(QWidget):
         self._focus_timer = QTimer(self)
         self._focus_timer.timeout.connect(self._check_focus)
 
+        # 滚动 + 高度调整的合并定时器
+        self._geometry_timer = QTimer(self)
+        self._geometry_timer.setSingleShot(True)
+        self._geometry_timer.timeout.connect(self._update_geometry)
+        self._at_max_height = False
+
+        # 每次回答的重绘 / 重排次数（重绘数的是回答区 viewport 的绘制，流式文本只重绘它）
+        self._repaints = 0
+        self._relayouts = 0
+        self._awaiting_first_paint = False
+
     def _setup_window_flags(self):
         self.setWindowFlags(
             Qt.WindowType.FramelessWindowHint
@@ -155,8 +173,22 @@ class FloatingWindow(QWidget):
         self._text_browser.hide()
         main_layout.addWidget(self._text_browser)
 
+        # 增量渲染器：样式表只设置一次，已完成的块不再重复解析
+        self._renderer = IncrementalMarkdownRenderer(self._text_browser.document())
+        # 回答区真正画到屏幕上的时刻：在 viewport 的绘制事件里统计
+        self._text_browser.viewport().installEventFilter(self)
+
     # ==================== 绘制 ====================
 
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and obj is self._text_browser.viewport():
+            self._repaints += 1
+            # 回答区在第一个 token（或错误信息）到达前是隐藏的，show_at 之后它的第一次绘制就是首次上屏
+            if self._awaiting_first_paint:
+                self._awaiting_first_paint = False
+                tracing.current().mark("ui.first_paint")
+        return super().eventFilter(obj, event)
+
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -177,6 +209,14 @@ class FloatingWindow(QWidget):
         painter.drawPath(path)
         painter.end()
 
+    def resizeEvent(self, event):
+        self._relayouts += 1
+        super().resizeEvent(event)
+
+    def render_stats(self) -> dict:
+        """本次回答的回答区重绘次数和窗口尺寸变化（触发重排）次数"""
+        return {"repaints": self._repaints, "relayouts": self._relayouts}
+
     # ==================== 拖动 ====================
 
     def mousePressEvent(self, event):
@@ -199,12 +239,16 @@ class FloatingWindow(QWidget):
     # ==================== 显示与内容 ====================
 
     def show_at(self, x: int, y: int):
-        self._accumulated_text = ""
-        self._text_browser.clear()
+        self._geometry_timer.stop()
+        self._renderer.clear()
         self._text_browser.hide()
         self._loading_label.show()
         self._loading = True
+        self._at_max_height = False
         self.setFixedHeight(self.WINDOW_MIN_HEIGHT)
+        self._repaints = 0
+        self._relayouts = 0
+        self._awaiting_first_paint = True
 
         screen = QGuiApplication.primaryScreen()
         if screen:
@@ -234,13 +278,13 @@ class FloatingWindow(QWidget):
             self._text_browser.show()
             self._stop_breathing()
 
-        self._accumulated_text += token
-        html = self._render_markdown(self._accumulated_text)
-        self._text_browser.setHtml(html)
+        trace = tracing.current()
+        with trace.measure("ui.render"):
+            self._renderer.append(token)
 
-        scrollbar = self._text_browser.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-        self._adjust_height()
+        # 滚动和调整高度留给合并定时器，连续到达的 token 只触发一次
+        if not self._geometry_timer.isActive():
+            self._geometry_timer.start(self.GEOMETRY_INTERVAL_MS)
 
     def show_error(self, error_msg: str):
         self._loading = False
@@ -251,65 +295,46 @@ class FloatingWindow(QWidget):
             f'<div style="color: #ff6b6b; font-size: 13px; '
             f'line-height: 1.6;">{error_msg}</div>'
         )
-        self._adjust_height()
+        # 文档已被错误信息替换：之后的 append_token 从头渲染，不沿用旧的定稿位置
+        self._renderer.reset()
+        self._geometry_timer.stop()
+        self._at_max_height = False
+        self._adjust_height(exact=True)
 
     def finish_stream(self):
         self._stop_breathing()
-
-    # ==================== Markdown ====================
-
-    def _render_markdown(self, text: str) -> str:
-        html = markdown.markdown(text, extensions=["fenced_code", "tables", "nl2br"])
-        return f"""
-        <style>
-            body {{
-                font-family: 'Microsoft YaHei UI', sans-serif;
-                font-size: 13px;
-                line-height: 1.7;
-                color: #e6e6f5;
-            }}
-            code {{
-                background: #2e2650;
-                padding: 2px 6px;
-                border-radius: 4px;
-                font-family: 'Cascadia Code', 'Consolas', monospace;
-                font-size: 12px;
-                color: #c8b6ff;
-            }}
-            pre {{
-                background: #0f0c1e;
-                padding: 12px;
-                border-radius: 8px;
-                overflow-x: auto;
-            }}
-            pre code {{ background: transparent; padding: 0; }}
-            strong {{ color: #b8a9ff; }}
-            h1, h2, h3 {{ color: #d4c8ff; margin: 8px 0 4px 0; }}
-            a {{ color: #8b7bff; }}
-            blockquote {{
-                border-left: 3px solid #6450c8;
-                padding-left: 12px;
-                color: #c8c8dc;
-                margin: 8px 0;
-            }}
-            table {{ border-collapse: collapse; width: 100%; }}
-            th, td {{
-                border: 1px solid #3c3264;
-                padding: 6px 10px;
-                text-align: left;
-            }}
-            th {{ background: #2e2450; }}
-        </style>
-        {html}
-        """
+        # 流结束：立即执行还没到点的合并更新，并把高度收紧到正好容纳内容
+        self._geometry_timer.stop()
+        self._update_geometry(exact=True)
+        tracing.current().set("ui", self.render_stats())
 
     # ==================== 工具方法 ====================
 
-    def _adjust_height(self):
-        doc_height = self._text_browser.document().size().height()
-        desired = int(doc_height) + 60
+    def _update_geometry(self, exact: bool = False):
+        trace = tracing.current()
+        with trace.measure("ui.adjust_height"):
+            self._adjust_height(exact)
+        with trace.measure("ui.scroll"):
+            scrollbar = self._text_browser.verticalScrollBar()
+            if scrollbar.value() != scrollbar.maximum():
+                scrollbar.setValue(scrollbar.maximum())
+
+    def _adjust_height(self, exact: bool = False):
+        """
+        按文档高度调整窗口高度。流式输出中向上取整到 HEIGHT_STEP 的台阶，
+        只有跨过台阶才真正 setFixedHeight；到达最大高度后不再改动。
+        exact=True 时（流结束 / 出错）精确贴合内容。
+        """
+        if self._at_max_height:
+            return
+        desired = int(self._text_browser.document().size().height()) + 60
+        if not exact:
+            desired = -(-desired // self.HEIGHT_STEP) * self.HEIGHT_STEP
         desired = max(self.WINDOW_MIN_HEIGHT, min(desired, self.WINDOW_MAX_HEIGHT))
-        self.setFixedHeight(desired)
+        if desired == self.WINDOW_MAX_HEIGHT:
+            self._at_max_height = True
+        if desired != self.height():
+            self.setFixedHeight(desired)
 
     def _start_breathing(self):
         self._breathing_timer.start(50)
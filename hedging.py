@@ -0,0 +1,172 @@
+"""
+对冲请求模块
+主端点在 p95 时间内还没出首 token，就向第二个端点发出同样的请求，
+谁先出首 token 就用谁的流，另一路取消
+"""
+
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from endpoint_pool import Endpoint, EndpointPool
+from tracing import NULL_TRACE
+
+
+class _Attempt:
+    def __init__(self, endpoint: Endpoint, worker, hedge: bool, retry: bool = False):
+        self.endpoint = endpoint
+        self.worker = worker
+        # hedge：主端点太慢发出的对冲请求；retry：之前的请求出错后换端点重试
+        self.hedge = hedge
+        self.retry = retry
+        self.started_at = time.monotonic()
+        self.failed = False
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.started_at) * 1000
+
+
+class HedgedStream(QObject):
+    """
+    一次（可能被对冲的）LLM 流式请求。
+
+    标准解释：
+    start() 先向端点池选出的主端点发请求，同时按主端点的首 token p95 启动计时器；
+    计时器到点仍没有首 token，就向对冲端点发出同样的请求。第一个出 token 的
+    请求胜出，其余请求被取消；首 token 之前就出错的请求会立即换下一个端点重试。
+    对外信号与 LLMStreamWorker 相同，也提供 start / cancel / isRunning。
+
+    小学生解释：
+    先问一个 AI 老师，如果他比平时最慢的时候还慢都没开口，
+    就再问另一个老师。谁先开口就听谁的，另一个就说"不用啦，谢谢"。
+    """
+
+    token_received = pyqtSignal(str)
+    stream_finished = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, pool: EndpointPool, make_worker, trace=NULL_TRACE, parent=None):
+        """make_worker(endpoint, trace) -> 未启动的 LLMStreamWorker"""
+        super().__init__(parent)
+        self._pool = pool
+        self._make_worker = make_worker
+        self._trace = trace
+        self._attempts: list[_Attempt] = []
+        self._winner: _Attempt | None = None
+        self._cancelled = False
+        self._hedge_timer = QTimer(self)
+        self._hedge_timer.setSingleShot(True)
+        self._hedge_timer.timeout.connect(self._hedge)
+
+    @property
+    def answer_text(self) -> str:
+        return self._winner.worker.answer_text if self._winner else ""
+
+    @property
+    def model_name(self) -> str:
+        """胜出端点使用的模型名（还没有胜出者时为空）"""
+        return self._winner.endpoint.model_name if self._winner else ""
+
+    def stats(self) -> dict:
+        return self._winner.worker.stats() if self._winner else {}
+
+    @property
+    def sent_prompt_tokens(self) -> int:
+        """所有已发出的请求（含对冲、重试）的 Prompt token 数之和：取消时这些也已计费"""
+        return sum(a.worker.prompt_tokens for a in self._attempts)
+
+    def start(self):
+        primary = self._pool.choose()
+        if primary is None:
+            self.error_occurred.emit("没有可用的 AI 接口，请在设置中检查 API Key 🔑")
+            return
+        self._launch(primary, hedge=False)
+        if self._pool.hedge_enabled and self._pool.hedge_candidate([primary]):
+            self._hedge_timer.start(int(self._pool.hedge_delay_ms(primary)))
+
+    def cancel(self):
+        self._cancelled = True
+        self._hedge_timer.stop()
+        for attempt in self._attempts:
+            attempt.worker.cancel()
+
+    def isRunning(self) -> bool:
+        return any(a.worker.isRunning() for a in self._attempts)
+
+    # ==================== 内部 ====================
+
+    def _launch(self, endpoint: Endpoint, hedge: bool, retry: bool = False):
+        worker = self._make_worker(endpoint, self._trace)
+        attempt = _Attempt(endpoint, worker, hedge, retry)
+        worker.token_received.connect(lambda token: self._on_token(attempt, token))
+        worker.stream_finished.connect(lambda: self._on_finished(attempt))
+        worker.error_occurred.connect(lambda message: self._on_error(attempt, message))
+        self._attempts.append(attempt)
+        self._pool.record_start(endpoint, hedge=hedge, retry=retry)
+        worker.start()
+
+    def _hedge(self):
+        if self._winner is not None or self._cancelled:
+            return
+        candidate = self._pool.hedge_candidate([a.endpoint for a in self._attempts])
+        if candidate is None:
+            return
+        self._trace.mark("llm.hedge")
+        self._launch(candidate, hedge=True)
+
+    def _declare_winner(self, attempt: _Attempt):
+        self._winner = attempt
+        self._hedge_timer.stop()
+        self._pool.record_first_token(
+            attempt.endpoint,
+            attempt.elapsed_ms(),
+            won=True,
+            hedge=attempt.hedge,
+            retry=attempt.retry,
+        )
+        self._trace.set("endpoint", attempt.endpoint.name)
+        self._trace.set("hedged", any(a.hedge for a in self._attempts))
+        self._trace.set("retried", any(a.retry for a in self._attempts))
+        for other in self._attempts:
+            if other is attempt or other.failed:
+                continue
+            # 落败一方已等待的时间是它首 token 延迟的下限，也计入直方图
+            self._pool.record_first_token(other.endpoint, other.elapsed_ms(), won=False)
+            other.worker.cancel()
+
+    def _on_token(self, attempt: _Attempt, token: str):
+        if self._cancelled:
+            return
+        if self._winner is None:
+            self._declare_winner(attempt)
+        if attempt is self._winner:
+            self.token_received.emit(token)
+
+    def _on_finished(self, attempt: _Attempt):
+        if self._cancelled:
+            return
+        if self._winner is None:
+            # 没有任何 token 就正常结束（空回答）：也算它先完成
+            self._declare_winner(attempt)
+        if attempt is self._winner:
+            self.stream_finished.emit()
+
+    def _on_error(self, attempt: _Attempt, message: str):
+        attempt.failed = True
+        self._pool.record_failure(attempt.endpoint)
+        if self._cancelled:
+            return
+        if attempt is self._winner:
+            self.error_occurred.emit(message)
+            return
+        if self._winner is not None:
+            return
+
+        # 首 token 之前就失败：不等对冲计时，立即换下一个端点
+        candidate = self._pool.hedge_candidate([a.endpoint for a in self._attempts])
+        if candidate is not None:
+            self._hedge_timer.stop()
+            self._trace.mark("llm.retry")
+            self._launch(candidate, hedge=False, retry=True)
+        elif all(a.failed for a in self._attempts):
+            self.error_occurred.emit(message)
@@ -0,0 +1,192 @@
+"""
+历史记录面板模块
+搜索过去的查词记录，预览回答，并可在悬浮窗中重新打开（不发网络请求）
+"""
+
+import time
+
+from PyQt6.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QTextBrowser,
+    QPushButton,
+    QSplitter,
+)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont
+
+from history_store import HistoryStore
+from markdown_renderer import shared_context
+
+
+class HistoryDialog(QDialog):
+    """
+    历史记录面板。
+
+    就像翻看自己的"生词本"：
+    - 上面的搜索框输入关键词，列表马上只剩相关的记录
+    - 点一条记录，右边显示当时 AI 的回答
+    - 双击或点"在悬浮窗中打开"，就像刚查完一样弹出来，不用再问 AI
+    """
+
+    # 请求在悬浮窗中重新打开某条记录（参数为记录 id）
+    open_requested = pyqtSignal(int)
+
+    # 输入停顿多久后再搜索（毫秒）
+    SEARCH_DELAY_MS = 150
+    RESULT_LIMIT = 200
+
+    def __init__(self, store: HistoryStore, parent=None):
+        super().__init__(parent)
+        self._store = store
+        self.setWindowTitle("🕘 历史记录 - 悬浮词典")
+        self.resize(760, 520)
+        self.setWindowFlags(self.windowFlags() | Qt.WindowType.WindowStaysOnTopHint)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.timeout.connect(self._search)
+
+        self._setup_ui()
+        self._search()
+
+    def _setup_ui(self):
+        """构建历史记录界面"""
+        main_layout = QVBoxLayout(self)
+        main_layout.setSpacing(12)
+        main_layout.setContentsMargins(20, 16, 20, 16)
+
+        self._search_input = QLineEdit()
+        self._search_input.setPlaceholderText("🔍 搜索选中文本或回答内容，多个关键词用空格分隔")
+        self._search_input.textChanged.connect(
+            lambda: self._search_timer.start(self.SEARCH_DELAY_MS)
+        )
+        main_layout.addWidget(self._search_input)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self._result_list = QListWidget()
+        self._result_list.setFont(QFont("Microsoft YaHei UI", 9))
+        self._result_list.currentItemChanged.connect(self._show_preview)
+        self._result_list.itemDoubleClicked.connect(lambda _: self._open_current())
+        splitter.addWidget(self._result_list)
+
+        self._preview = QTextBrowser()
+        self._preview.setOpenExternalLinks(True)
+        self._preview.setFont(QFont("Microsoft YaHei UI", 10))
+        # 与悬浮窗共用同一个解析器和样式表
+        shared_context.apply(self._preview.document())
+        splitter.addWidget(self._preview)
+        splitter.setSizes([280, 480])
+        main_layout.addWidget(splitter, 1)
+
+        # ===== 底部栏 =====
+        bottom_layout = QHBoxLayout()
+        self._status_label = QLabel()
+        bottom_layout.addWidget(self._status_label)
+        bottom_layout.addStretch()
+
+        self._open_btn = QPushButton("🪟 在悬浮窗中打开")
+        self._open_btn.setFixedHeight(36)
+        self._open_btn.setEnabled(False)
+        self._open_btn.clicked.connect(self._open_current)
+        bottom_layout.addWidget(self._open_btn)
+
+        close_btn = QPushButton("关闭")
+        close_btn.setFixedSize(90, 36)
+        close_btn.clicked.connect(self.reject)
+        bottom_layout.addWidget(close_btn)
+        main_layout.addLayout(bottom_layout)
+
+        # ===== 整体样式（与设置面板一致）=====
+        self.setStyleSheet(
+            """
+            QDialog {
+                background-color: #1e1e2e;
+                color: #cdd6f4;
+            }
+            QLineEdit, QListWidget, QTextBrowser {
+                background-color: #2a2a3e;
+                border: 1px solid rgba(120, 100, 255, 40);
+                border-radius: 6px;
+                padding: 8px;
+                color: #cdd6f4;
+                font-size: 13px;
+            }
+            QLineEdit:focus {
+                border-color: #6c5ce7;
+            }
+            QListWidget::item {
+                padding: 6px 4px;
+            }
+            QListWidget::item:selected {
+                background-color: #45475a;
+            }
+            QLabel {
+                color: #bac2de;
+                font-size: 12px;
+            }
+            QPushButton {
+                background-color: #313244;
+                color: #cdd6f4;
+                border: 1px solid rgba(120, 100, 255, 40);
+                border-radius: 6px;
+                padding: 8px 16px;
+            }
+            QPushButton:hover {
+                background-color: #45475a;
+            }
+            QPushButton:disabled {
+                color: #6c7086;
+            }
+        """
+        )
+
+    def _search(self):
+        query = self._search_input.text().strip()
+        start = time.perf_counter()
+        results = self._store.search(query, limit=self.RESULT_LIMIT)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self._result_list.clear()
+        self._preview.clear()
+        self._open_btn.setEnabled(False)
+        for entry in results:
+            when = time.strftime("%m-%d %H:%M", time.localtime(entry["created_at"]))
+            selection = " ".join(entry["selection"].split())
+            if len(selection) > 40:
+                selection = selection[:40] + "…"
+            item = QListWidgetItem(f"{selection}\n{when} · {entry['model']}")
+            item.setData(Qt.ItemDataRole.UserRole, entry["id"])
+            item.setToolTip(entry["preview"])
+            self._result_list.addItem(item)
+
+        total = self._store.stats()["entries"]
+        if query:
+            self._status_label.setText(
+                f"找到 {len(results)} 条（共 {total} 条，用时 {elapsed_ms:.1f} ms）"
+            )
+        else:
+            self._status_label.setText(f"共 {total} 条记录")
+
+    def _current_id(self) -> int | None:
+        item = self._result_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item is not None else None
+
+    def _show_preview(self, current, _previous=None):
+        entry_id = self._current_id()
+        entry = self._store.get(entry_id) if entry_id is not None else None
+        self._open_btn.setEnabled(entry is not None)
+        if entry is None:
+            self._preview.clear()
+            return
+        self._preview.setHtml(shared_context.to_html(entry["answer"]))
+
+    def _open_current(self):
+        entry_id = self._current_id()
+        if entry_id is not None:
+            self.open_requested.emit(entry_id)
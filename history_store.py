@@ -0,0 +1,350 @@
+"""
+查词历史模块
+把每次查词的选中文本、上下文哈希、模型、Prompt 版本、回答、耗时和 token 数
+保存到 ~/.floating_word_explainer/history.sqlite3，托盘"历史记录"面板可全文搜索、重新打开
+
+写入在后台线程批量进行（一个事务写一批），UI 线程只负责把记录放进队列；
+全文索引使用 FTS5（trigram 分词，中文也能按子串搜索），不可用时退回 LIKE 查询
+"""
+
+import hashlib
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from config import CONFIG_DIR
+
+HISTORY_FILE = CONFIG_DIR / "history.sqlite3"
+
+# trigram 分词器至少需要 3 个字符才能命中索引，更短的关键词走 LIKE
+_FTS_MIN_TERM = 3
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_version(prompt: str) -> str:
+    """Prompt 模板的短哈希：模板改过之后的记录可以区分开"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def _context_hash(context: str) -> str:
+    return hashlib.sha256(context.strip().encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """
+    查词历史（SQLite + FTS5）。
+
+    标准解释：
+    record() 只把记录放进内存队列，立即返回；写入线程第一次 record() 时启动，
+    攒够 batch_size 条或等满 flush_interval 秒后在一个事务里批量写入，
+    写完按保留天数、条数和体积上限删除最旧的记录。
+    search() / get() 在调用方线程用单独的只读连接查询（WAL 模式，读写互不阻塞）。
+
+    小学生解释：
+    每查一个词，小书童就把问题和答案抄进日记本。他不是查一个抄一个，
+    而是攒几条一起抄，抄的时候你照样可以继续查词。
+    日记本太厚了就撕掉最早的几页；想找以前查过的词，翻目录一下就找到。
+    """
+
+    def __init__(
+        self,
+        path=HISTORY_FILE,
+        max_entries: int = 5000,
+        retention_days: float = 180,
+        max_bytes: int = 50 * 1024 * 1024,
+        batch_size: int = 32,
+        flush_interval: float = 0.5,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._writer: threading.Thread | None = None
+        self._reader: sqlite3.Connection | None = None
+        self._fts = False
+        self.written = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "HistoryStore":
+        return cls(
+            max_entries=int(config.get("history_max_entries", 5000)),
+            retention_days=float(config.get("history_retention_days", 180)),
+            max_bytes=int(float(config.get("history_max_mb", 50)) * 1024 * 1024),
+        )
+
+    # ==================== 连接与表结构 ====================
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lookups (
+                id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL,
+                selection TEXT NOT NULL,
+                context_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                ttft_ms REAL,
+                total_ms REAL,
+                prompt_tokens INTEGER,
+                completion_tokens INTEGER,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_lookups_created ON lookups(created_at)"
+        )
+        try:
+            conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS lookups_fts USING fts5(
+                    selection, answer,
+                    content='lookups', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS lookups_ai AFTER INSERT ON lookups BEGIN
+                    INSERT INTO lookups_fts(rowid, selection, answer)
+                    VALUES (new.id, new.selection, new.answer);
+                END;
+                CREATE TRIGGER IF NOT EXISTS lookups_ad AFTER DELETE ON lookups BEGIN
+                    INSERT INTO lookups_fts(lookups_fts, rowid, selection, answer)
+                    VALUES ('delete', old.id, old.selection, old.answer);
+                END;
+                """
+            )
+            self._fts = True
+        except sqlite3.OperationalError:
+            # SQLite 没编译 FTS5 或版本太旧（trigram 需要 3.34+）：退回 LIKE
+            self._fts = False
+        conn.commit()
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        if self._reader is None:
+            self._reader = self._open()
+        return self._reader
+
+    # ==================== 写入 ====================
+
+    def record(
+        self,
+        selection: str,
+        context: str,
+        model: str,
+        prompt: str,
+        answer: str,
+        ttft_ms: float | None = None,
+        total_ms: float | None = None,
+        prompt_tokens: int | None = None,
+        completion_tokens: int | None = None,
+    ) -> None:
+        """（任意线程）记录一次查词，立即返回；实际写入由后台线程批量完成"""
+        if not answer.strip():
+            return
+        size = len(answer.encode("utf-8")) + len(selection.encode("utf-8"))
+        if size > self.max_bytes:
+            self.dropped += 1
+            return
+        self._ensure_writer()
+        self._queue.put(
+            (
+                time.time(),
+                selection,
+                _context_hash(context),
+                model,
+                prompt_version(prompt),
+                answer,
+                ttft_ms,
+                total_ms,
+                prompt_tokens,
+                completion_tokens,
+                size,
+            )
+        )
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待队列里已有的记录全部写入"""
+        if self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="history-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self):
+        try:
+            conn = self._open()
+        except (sqlite3.Error, OSError):
+            # 数据库被锁 / 损坏：写入线程照常清空队列（记录计为丢弃），flush() 不会卡住
+            logger.exception("无法打开查词历史数据库 %s", self.path)
+            conn = None
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # 攒一批：到达上限、超时或遇到 flush / 停止信号就写
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if isinstance(item, tuple)]
+            if rows and conn is None:
+                self.dropped += len(rows)
+            elif rows:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO lookups (created_at, selection, context_hash, "
+                            "model, prompt_version, answer, ttft_ms, total_ms, "
+                            "prompt_tokens, completion_tokens, size) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            rows,
+                        )
+                        self._enforce_limits(conn)
+                    self.written += len(rows)
+                except sqlite3.Error:
+                    self.dropped += len(rows)
+
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    item.set()
+        if conn is not None:
+            conn.close()
+
+    def _enforce_limits(self, conn: sqlite3.Connection):
+        conn.execute(
+            "DELETE FROM lookups WHERE created_at < ?",
+            (time.time() - self.retention_days * 86400,),
+        )
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM lookups"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # 从最旧的开始删，直到条数和体积都回到上限以内
+        cutoff = None
+        for row_id, size in conn.execute("SELECT id, size FROM lookups ORDER BY id ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            cutoff = row_id
+            count -= 1
+            total -= size
+        if cutoff is not None:
+            conn.execute("DELETE FROM lookups WHERE id <= ?", (cutoff,))
+
+    # ==================== 查询 ====================
+
+    def search(self, query: str = "", limit: int = 100) -> list[dict]:
+        """
+        按关键词搜索历史（空格分隔的多个关键词需同时命中），按时间倒序；
+        query 为空时返回最近的记录。结果不含完整回答，用 get() 取。
+        """
+        terms = query.split()
+        columns = "l.id, l.created_at, l.selection, l.model, substr(l.answer, 1, 120) AS preview"
+        try:
+            with self._lock:
+                conn = self._read_conn()
+                if not terms:
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM lookups l ORDER BY l.id DESC LIMIT ?",
+                        (limit,),
+                    ).fetchall()
+                elif self._fts and all(len(t) >= _FTS_MIN_TERM for t in terms):
+                    match = " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM lookups_fts f "
+                        "JOIN lookups l ON l.id = f.rowid "
+                        "WHERE lookups_fts MATCH ? ORDER BY l.id DESC LIMIT ?",
+                        (match, limit),
+                    ).fetchall()
+                else:
+                    where = " AND ".join(
+                        "(l.selection LIKE ? ESCAPE '\\' OR l.answer LIKE ? ESCAPE '\\')"
+                        for _ in terms
+                    )
+                    params = []
+                    for term in terms:
+                        pattern = "%" + self._escape_like(term) + "%"
+                        params += [pattern, pattern]
+                    rows = conn.execute(
+                        f"SELECT {columns} FROM lookups l WHERE {where} "
+                        "ORDER BY l.id DESC LIMIT ?",
+                        (*params, limit),
+                    ).fetchall()
+        except sqlite3.Error:
+            return []
+        return [dict(row) for row in rows]
+
+    def get(self, entry_id: int) -> dict | None:
+        """取一条完整记录（含回答），不存在时返回 None"""
+        try:
+            with self._lock:
+                row = self._read_conn().execute(
+                    "SELECT * FROM lookups WHERE id = ?", (entry_id,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return dict(row) if row is not None else None
+
+    @staticmethod
+    def _escape_like(term: str) -> str:
+        return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    # ==================== 其他 ====================
+
+    def close(self) -> None:
+        """写完队列里剩余的记录后停止写入线程，关闭连接"""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+        if writer is not None:
+            self._queue.put(_STOP)
+            writer.join(timeout=5)
+
+    def stats(self) -> dict:
+        try:
+            with self._lock:
+                count, total = self._read_conn().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM lookups"
+                ).fetchone()
+        except sqlite3.Error:
+            count, total = 0, 0
+        return {
+            "entries": count,
+            "bytes": total,
+            "written": self.written,
+            "dropped": self.dropped,
+            "fts": self._fts,
+        }
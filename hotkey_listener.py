@@ -2,20 +2,27 @@
 全局热键监听 + 文本提取 + 上下文获取模块
 监听 Shift 键释放事件，提取选中文本，并获取当前页面的上下文
 
-上下文获取策略（多层回退）：
-  1. Windows UI Automation (TextPattern / ValuePattern)
-  2. Ctrl+A → Ctrl+C 剪贴板回退（适用于浏览器等 UIA 不生效的场景）
+上下文获取策略：
+  1. 并行执行：Windows UI Automation (TextPattern / ValuePattern / 父控件) + 窗口标题
+  2. 都不合格时：Ctrl+A → Ctrl+C 剪贴板回退（适用于浏览器等 UIA 不生效的场景）
   3. 窗口标题兜底
 """
 
 import time
+import zlib
 import threading
 import ctypes
 import ctypes.wintypes
 import keyboard
-import pyautogui
 from PyQt6.QtCore import QObject, pyqtSignal
 
+import tracing
+
+from clipboard_waiter import ClipboardWaiter
+from context_cache import ContextCache
+from context_pipeline import ContextPipeline, ContextStrategy
+from context_selector import select_context
+
 # uiautomation 是可选依赖，导入失败时走剪贴板回退
 try:
     import uiautomation as auto
@@ -43,21 +50,41 @@ class HotkeyListener(QObject):
       这样就能拿到整篇文章了！然后再悄悄恢复原样。
 
     信号：
+      selection_captured(str, str)       - (选中文本, 窗口标题上下文)，拿到选中文本后
+                                           立即发射，早于上下文获取，用于推测请求
       text_extracted(str, str, int, int) - (选中文本, 上下文, 鼠标X, 鼠标Y)
       no_text_selected()                 - 未选中文字时发射
     """
 
+    selection_captured = pyqtSignal(str, str)
     text_extracted = pyqtSignal(str, str, int, int)
     no_text_selected = pyqtSignal()
 
     # 上下文最短有效长度（低于此值视为获取失败，触发回退）
     MIN_CONTEXT_LENGTH = 30
-    # 上下文最大长度（截断，避免 token 爆炸）
-    MAX_CONTEXT_LENGTH = 5000
-
-    def __init__(self, hotkey: str = "shift", parent=None):
+    # 原始页面文本读取上限（字符）；真正送给 LLM 的部分由 token 预算决定
+    MAX_RAW_CONTEXT_LENGTH = 200_000
+    # 文档指纹只取开头这么多字符
+    FINGERPRINT_SAMPLE_CHARS = 2048
+    # 等待剪贴板变化的上限（秒）：复制一落地就返回，超时才放弃
+    SELECTION_COPY_TIMEOUT = 0.4
+    SELECT_ALL_COPY_TIMEOUT = 0.8
+    # 并行上下文策略各自的等待上限（秒）
+    UIA_DEADLINE = 0.35
+    WINDOW_TITLE_DEADLINE = 0.1
+
+    def __init__(self, hotkey: str = "shift", clipboard_backend=None, parent=None):
         super().__init__(parent)
         self.hotkey = hotkey
+        self._clipboard = ClipboardWaiter(clipboard_backend)
+        # 上下文 token 预算与相关段落补充开关，由 configure() 从配置更新
+        self.context_token_budget = 1500
+        self.context_relevance = True
+        # 前缀缓存友好布局：按固定窗口截取，同一页上的上下文逐字节相同
+        self.context_stable = True
+        self._context_pipeline = self._build_context_pipeline()
+        # 同一窗口 / 同一文档里反复划词时复用整页上下文
+        self._context_cache = ContextCache()
         self._running = False
         self._last_trigger = 0
         self._cooldown = 0.6
@@ -70,6 +97,16 @@ class HotkeyListener(QObject):
         self._running = False
         keyboard.unhook_all()
 
+    def configure(self, config: dict):
+        """从配置读取上下文选择参数"""
+        self.context_token_budget = int(config.get("context_token_budget", 1500))
+        self.context_relevance = bool(config.get("context_relevance_scoring", True))
+        self.context_stable = bool(config.get("prompt_cache_layout", True))
+        self._context_cache.ttl_seconds = float(config.get("context_cache_ttl", 120))
+        self._context_cache.max_bytes = int(
+            float(config.get("context_cache_max_mb", 8)) * 1024 * 1024
+        )
+
     def update_hotkey(self, new_hotkey: str):
         self.stop()
         self.hotkey = new_hotkey
@@ -82,196 +119,232 @@ class HotkeyListener(QObject):
         if now - self._last_trigger < self._cooldown:
             return
         self._last_trigger = now
-        thread = threading.Thread(target=self._extract_text, daemon=True)
+        # 每次查词一个 trace：从按键释放开始计时
+        trace = tracing.start_trace()
+        trace.mark("hotkey_released")
+        thread = threading.Thread(target=self._extract_text, args=(trace,), daemon=True)
         thread.start()
 
-    def _extract_text(self):
+    def _extract_text(self, trace=tracing.NULL_TRACE):
         """主提取流程：选中文本 + 上下文"""
+        # pyautogui 导入较慢，推迟到第一次查词（通常已被启动后的后台预热导入）
+        import pyautogui
+
         mouse_x, mouse_y = pyautogui.position()
 
         # ===== 第一步：获取选中文本 =====
-        old_clipboard = self._get_clipboard_text()
-        self._set_clipboard_text("")
-        time.sleep(0.05)
-        keyboard.send("ctrl+c")
-        time.sleep(0.2)
-        selected_text = self._get_clipboard_text()
+        with trace.span("copy_selection"):
+            old_clipboard = self._clipboard.get_text()
+            sequence = self._clipboard.clear()
+            keyboard.send("ctrl+c")
+            selected_text = self._clipboard.wait_for_text(
+                sequence, self.SELECTION_COPY_TIMEOUT, "selection"
+            )
         selected_text = selected_text.strip() if selected_text else ""
 
         if not selected_text:
             # 恢复剪贴板
             if old_clipboard:
-                self._set_clipboard_text(old_clipboard)
+                self._clipboard.set_text(old_clipboard)
+            tracing.finish(trace, "no_text")
             self.no_text_selected.emit()
             return
 
-        # ===== 第二步：获取上下文 =====
-        context = ""
+        # 选中文本一到手就通知控制器，网络请求可以和上下文获取并行
+        hwnd, title = self._get_foreground_window()
+        self.selection_captured.emit(selected_text, self._format_window_title(title))
 
-        # 策略1：尝试 UI Automation
-        if HAS_UIA:
-            context = self._get_context_via_uia()
-
-        # 策略2：如果 UIA 拿到的上下文太短，用 Ctrl+A 剪贴板回退
-        if len(context) < self.MIN_CONTEXT_LENGTH:
-            context = self._get_context_via_clipboard()
-
-        # 策略3：兜底，至少返回窗口标题
-        if len(context) < self.MIN_CONTEXT_LENGTH:
-            context = self._get_window_title_context()
-
-        # 截断
-        if len(context) > self.MAX_CONTEXT_LENGTH:
-            context = context[: self.MAX_CONTEXT_LENGTH] + "\n...(上下文已截断)"
+        # ===== 第二步：获取上下文 =====
+        # 先查页面缓存：同一窗口、文档未变时直接复用，完全跳过上下文获取
+        with trace.span("context_cache"):
+            fingerprint = self._get_document_fingerprint()
+            context = self._context_cache.get(hwnd, title, fingerprint, selected_text)
+        source = "context_cache"
+        if context is None:
+            # UIA / 窗口标题并行执行，都不合格才用 Ctrl+A 剪贴板回退，最后窗口标题兜底
+            with trace.span("context_pipeline"):
+                context, source = self._context_pipeline.acquire(selected_text, trace)
+            if source and source != "window_title":
+                self._context_cache.put(hwnd, title, fingerprint, context)
+        trace.set("context_source", source)
+
+        # 按 token 预算截取上下文（以选中内容为中心，或缓存友好的固定窗口）
+        with trace.span("select_context"):
+            context = select_context(
+                context,
+                selected_text,
+                token_budget=self.context_token_budget,
+                relevance=self.context_relevance,
+                stable=self.context_stable,
+            )
 
         # 恢复剪贴板
         if old_clipboard:
-            self._set_clipboard_text(old_clipboard)
+            self._clipboard.set_text(old_clipboard)
 
+        trace.add_span("extract_text", trace.start_ns, time.monotonic_ns())
         self.text_extracted.emit(selected_text, context.strip(), mouse_x, mouse_y)
 
     # ==================== 上下文获取策略 ====================
 
-    def _get_context_via_uia(self) -> str:
-        """策略1：通过 Windows UI Automation 获取上下文"""
-        try:
+    def _build_context_pipeline(self) -> ContextPipeline:
+        """组装上下文获取流水线：UIA 与窗口标题并行，Ctrl+A 最后串行兜底"""
+        strategies = []
+        if HAS_UIA:
+            strategies += [
+                ContextStrategy(
+                    "uia_text_pattern", self._get_context_via_uia_text, self.UIA_DEADLINE
+                ),
+                ContextStrategy(
+                    "uia_value_pattern", self._get_context_via_uia_value, self.UIA_DEADLINE
+                ),
+                ContextStrategy(
+                    "uia_parent_text", self._get_context_via_uia_parent, self.UIA_DEADLINE
+                ),
+            ]
+        strategies += [
+            ContextStrategy(
+                "window_title",
+                self._get_window_title_context,
+                self.WINDOW_TITLE_DEADLINE,
+                fallback=True,
+            ),
+            ContextStrategy(
+                "clipboard_select_all", self._get_context_via_clipboard, intrusive=True
+            ),
+        ]
+        return ContextPipeline(strategies, min_length=self.MIN_CONTEXT_LENGTH)
+
+    def context_strategy_stats(self) -> dict:
+        """各上下文策略的耗时与成功率"""
+        return self._context_pipeline.stats()
+
+    def _get_context_via_uia_text(self, selected_text: str = "") -> str:
+        """策略1a：焦点控件的 UI Automation TextPattern"""
+        with auto.UIAutomationInitializerInThread():
             focused = auto.GetFocusedControl()
             if not focused:
                 return ""
+            tp = focused.GetTextPattern()
+            if tp:
+                return tp.DocumentRange.GetText(self.MAX_RAW_CONTEXT_LENGTH) or ""
+        return ""
 
-            # 尝试 TextPattern
-            try:
-                tp = focused.GetTextPattern()
-                if tp:
-                    text = tp.DocumentRange.GetText(self.MAX_CONTEXT_LENGTH)
-                    if text and len(text) >= self.MIN_CONTEXT_LENGTH:
-                        return text
-            except Exception:
-                pass
-
-            # 尝试 ValuePattern
-            try:
-                vp = focused.GetValuePattern()
-                if vp and vp.Value:
-                    return vp.Value
-            except Exception:
-                pass
-
-            # 尝试父控件
-            try:
-                parent = focused.GetParentControl()
-                if parent:
-                    tp = parent.GetTextPattern()
-                    if tp:
-                        text = tp.DocumentRange.GetText(self.MAX_CONTEXT_LENGTH)
-                        if text and len(text) >= self.MIN_CONTEXT_LENGTH:
-                            return text
-            except Exception:
-                pass
-
-        except Exception:
-            pass
+    def _get_context_via_uia_value(self, selected_text: str = "") -> str:
+        """策略1b：焦点控件的 UI Automation ValuePattern（输入框等）"""
+        with auto.UIAutomationInitializerInThread():
+            focused = auto.GetFocusedControl()
+            if not focused:
+                return ""
+            vp = focused.GetValuePattern()
+            if vp and vp.Value:
+                return vp.Value
+        return ""
 
+    def _get_context_via_uia_parent(self, selected_text: str = "") -> str:
+        """策略1c：焦点控件父控件的 TextPattern"""
+        with auto.UIAutomationInitializerInThread():
+            focused = auto.GetFocusedControl()
+            parent = focused.GetParentControl() if focused else None
+            if not parent:
+                return ""
+            tp = parent.GetTextPattern()
+            if tp:
+                return tp.DocumentRange.GetText(self.MAX_RAW_CONTEXT_LENGTH) or ""
         return ""
 
-    def _get_context_via_clipboard(self) -> str:
+    def _get_context_via_clipboard(self, selected_text: str = "") -> str:
         """
         策略2：通过 Ctrl+A → Ctrl+C 获取全页文本（剪贴板回退）。
 
         标准解释：
-        保存当前剪贴板 → 模拟 Ctrl+A 全选 → Ctrl+C 复制 → 读取剪贴板
-        → 按右方向键取消选择 → 恢复原始状态。
+        清空剪贴板并记下序号 → 模拟 Ctrl+A 全选 → Ctrl+C 复制 → 等剪贴板序号变化
+        → 按右方向键取消选择。不再使用固定 sleep，复制一落地立即返回。
 
         小学生解释：
         小特工的"全选大法"：
-        1. 先把剪贴板里的东西藏好
+        1. 先把剪贴板清空，记住它现在的"门牌号"
         2. 偷偷按 Ctrl+A 把整页文字都选上（全变蓝了）
         3. 再按 Ctrl+C 复制到剪贴板
-        4. 把复制到的文字偷偷记下来
+        4. 门牌号一变，马上把复制到的文字取出来
         5. 按一下右箭头键取消选择（页面恢复正常）
         6. 整个过程快到你根本看不见！
         """
         try:
-            # 清空剪贴板
-            self._set_clipboard_text("")
-            time.sleep(0.05)
-
-            # Ctrl+A 全选
+            sequence = self._clipboard.clear()
             keyboard.send("ctrl+a")
-            time.sleep(0.1)
-
-            # Ctrl+C 复制
             keyboard.send("ctrl+c")
-            time.sleep(0.25)
-
-            # 读取全页文本
-            full_text = self._get_clipboard_text()
+            full_text = self._clipboard.wait_for_text(
+                sequence, self.SELECT_ALL_COPY_TIMEOUT, "select_all"
+            )
+
+            # 有的程序全选是异步生效的，复制到的仍是原选区：再复制一次
+            if full_text and full_text.strip() == selected_text:
+                sequence = self._clipboard.clear()
+                keyboard.send("ctrl+c")
+                full_text = self._clipboard.wait_for_text(
+                    sequence, self.SELECT_ALL_COPY_TIMEOUT, "select_all_retry"
+                )
 
             # 取消选择（按右箭头键，不会造成副作用）
             keyboard.send("right")
-            time.sleep(0.05)
 
             return full_text.strip() if full_text else ""
 
         except Exception:
             return ""
 
-    def _get_window_title_context(self) -> str:
+    def clipboard_latency_stats(self) -> dict:
+        """各剪贴板获取策略的实测等待耗时"""
+        return self._clipboard.latency_stats()
+
+    def context_cache_stats(self) -> dict:
+        """页面上下文缓存的命中率与内存占用"""
+        return self._context_cache.stats()
+
+    def _get_window_title_context(self, selected_text: str = "") -> str:
         """策略3：获取当前窗口标题"""
+        _, title = self._get_foreground_window()
+        return self._format_window_title(title)
+
+    @staticmethod
+    def _format_window_title(title: str) -> str:
+        return f"[当前窗口: {title}]" if title else ""
+
+    # ==================== 窗口信息 ====================
+
+    @staticmethod
+    def _get_foreground_window() -> tuple[int, str]:
+        """返回 (前台窗口句柄, 窗口标题)，获取失败时返回 (0, "")"""
         try:
             hwnd = ctypes.windll.user32.GetForegroundWindow()
             length = ctypes.windll.user32.GetWindowTextLengthW(hwnd)
             if length > 0:
                 buf = ctypes.create_unicode_buffer(length + 1)
                 ctypes.windll.user32.GetWindowTextW(hwnd, buf, length + 1)
-                return f"[当前窗口: {buf.value}]"
+                return hwnd or 0, buf.value
+            return hwnd or 0, ""
         except Exception:
-            pass
-        return ""
-
-    # ==================== 剪贴板操作 ====================
+            return 0, ""
 
-    @staticmethod
-    def _get_clipboard_text() -> str:
-        CF_UNICODETEXT = 13
-        user32 = ctypes.windll.user32
-        kernel32 = ctypes.windll.kernel32
-        if not user32.OpenClipboard(0):
+    def _get_document_fingerprint(self) -> str:
+        """
+        廉价的文档指纹：焦点控件的 UIA 运行时 ID + 文档开头一小段文本的校验和。
+        只读 FINGERPRINT_SAMPLE_CHARS 个字符，不读整篇文档；浏览器导航后文档控件会重建，
+        运行时 ID 随之变化，同长度的编辑 / 换页也能从开头的文本看出来。
+        拿不到时返回空串，此时只依赖窗口标题 + 选中内容校验判断缓存是否有效。
+        """
+        if not HAS_UIA:
             return ""
         try:
-            handle = user32.GetClipboardData(CF_UNICODETEXT)
-            if not handle:
-                return ""
-            ptr = kernel32.GlobalLock(handle)
-            if not ptr:
-                return ""
-            try:
-                return ctypes.wstring_at(ptr)
-            finally:
-                kernel32.GlobalUnlock(handle)
-        finally:
-            user32.CloseClipboard()
-
-    @staticmethod
-    def _set_clipboard_text(text: str):
-        CF_UNICODETEXT = 13
-        GMEM_MOVEABLE = 0x0002
-        user32 = ctypes.windll.user32
-        kernel32 = ctypes.windll.kernel32
-        if not user32.OpenClipboard(0):
-            return
-        try:
-            user32.EmptyClipboard()
-            if text:
-                byte_count = (len(text) + 1) * ctypes.sizeof(ctypes.c_wchar)
-                handle = kernel32.GlobalAlloc(GMEM_MOVEABLE, byte_count)
-                if not handle:
-                    return
-                ptr = kernel32.GlobalLock(handle)
-                if not ptr:
-                    return
-                ctypes.memmove(ptr, text, byte_count)
-                kernel32.GlobalUnlock(handle)
-                user32.SetClipboardData(CF_UNICODETEXT, handle)
-        finally:
-            user32.CloseClipboard()
+            with auto.UIAutomationInitializerInThread():
+                focused = auto.GetFocusedControl()
+                if not focused:
+                    return ""
+                runtime_id = ".".join(str(part) for part in focused.GetRuntimeId() or ())
+                tp = focused.GetTextPattern()
+                sample = tp.DocumentRange.GetText(self.FINGERPRINT_SAMPLE_CHARS) if tp else ""
+                return f"{runtime_id}:{zlib.crc32((sample or '').encode('utf-8')):08x}"
+        except Exception:
+            pass
+        return ""
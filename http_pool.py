@@ -0,0 +1,335 @@
+"""
+HTTP 连接池管理模块
+进程内共享 httpx.Client，复用 keep-alive 连接，避免每次划词都重新做 DNS / TCP / TLS 握手
+"""
+
+import hashlib
+import socket
+import threading
+import time
+
+import httpx
+
+# HTTP/2 需要可选依赖 h2，未安装时自动退回 HTTP/1.1
+try:
+    import h2  # noqa: F401
+
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+
+class _ConnectionTracker:
+    """
+    单次请求的连接追踪器（挂在 httpx 的 trace 扩展上）。
+
+    只要这次请求触发了 TCP 建连，就算一次"新连接"，否则就是"连接池命中"。
+    同时记下这次请求所用连接的底层网络流，取消时 abort() 可以在响应头到达前打断阻塞的读取。
+    listener 可选，会收到每个 httpcore 事件名（用于延迟追踪）。
+    """
+
+    def __init__(self, listener=None, client: httpx.Client | None = None):
+        self.new_connection = False
+        self.network_stream = None
+        self.http2 = False
+        self.aborted = False
+        self._listener = listener
+        self._client = client
+
+    def __call__(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.started":
+            self.new_connection = True
+        elif event_name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self.network_stream = info.get("return_value") or self.network_stream
+        elif event_name == "http11.send_request_headers.started":
+            if self.network_stream is None:
+                # 复用的 keep-alive 连接不会触发建连事件：到连接池里找
+                self.network_stream = _network_stream_of(self._client, info.get("request"))
+        elif event_name.startswith("http2."):
+            self.http2 = True
+        if self.aborted and self.network_stream is not None:
+            # 取消时还在 TCP 建连：连接一建好就关闭
+            self.abort()
+        if self._listener is not None:
+            self._listener(event_name)
+
+    def abort(self) -> bool:
+        """
+        （任意线程）关闭这次请求所用的连接，阻塞中的建连后握手 / 等响应头 / 读取立即出错返回。
+        先 shutdown 再 close：只 close 不会唤醒另一个线程里阻塞的 recv。
+        HTTP/2 连接上还有别的请求，不关闭；没拿到网络流时返回 False。
+        """
+        self.aborted = True
+        stream = self.network_stream
+        if stream is None or self.http2:
+            return False
+        try:
+            sock = stream.get_extra_info("socket")
+            if sock is not None:
+                sock.shutdown(socket.SHUT_RDWR)
+        except (OSError, AttributeError):
+            pass
+        try:
+            stream.close()
+        except Exception:
+            pass
+        return True
+
+
+def _network_stream_of(client: httpx.Client | None, request):
+    """
+    正在处理 request（httpcore.Request）的 HTTP/1.1 连接的底层网络流。
+    依赖 httpcore 1.x 连接池的内部结构，结构变化或找不到时返回 None（取消退回到响应头到达后才生效）。
+    """
+    if client is None or request is None:
+        return None
+    try:
+        pool = client._transport._pool
+        for pool_request in list(pool._requests):
+            if pool_request.request is request:
+                return pool_request.connection._connection._network_stream
+    except AttributeError:
+        pass
+    return None
+
+
+def is_idle(client) -> bool:
+    """
+    客户端（同步或异步）上是否已经没有进行中的请求（响应流关闭后请求才会离开连接池的队列）。
+    同样依赖 httpcore 1.x 的内部结构，看不出来时按"还在用"处理，留到 close_all 再关闭。
+    """
+    try:
+        return not client._transport._pool._requests
+    except AttributeError:
+        return False
+
+
+class HttpClientPool:
+    """
+    进程级、线程安全的 HTTP 客户端池。
+
+    标准解释：
+    按 (api_base_url, 凭据指纹) 缓存 httpx.Client，所有 LLM 请求共享同一组
+    keep-alive 连接。只有接口地址或 API Key 变化时才会重建客户端；
+    连接池上限、keep-alive 过期时间和 HTTP/2 开关都从配置读取。
+
+    小学生解释：
+    以前每次查词都要重新"打电话拨号"（握手），接通后说一句话就挂断。
+    现在我们把电话一直保持接通，下次直接开口说话，省掉了拨号的时间。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[str, str], httpx.Client] = {}
+        # 已被替换、但可能还有请求在读取响应的旧客户端：空闲后再关闭
+        self._retired: list[httpx.Client] = []
+        self._last_used: dict[tuple[str, str], float] = {}
+        self._timeout = 60.0
+        self._max_connections = 10
+        self._max_keepalive_connections = 5
+        self._keepalive_expiry = 90.0
+        self._http2 = False
+        self._pool_hits = 0
+        self._new_connections = 0
+
+    # ==================== 配置 ====================
+
+    def configure(self, config: dict):
+        """按配置更新连接池参数，参数变化时换下旧客户端（进行中的请求结束后再关闭），下次使用时重建"""
+        settings = (
+            int(config.get("http_max_connections", self._max_connections)),
+            int(
+                config.get(
+                    "http_max_keepalive_connections", self._max_keepalive_connections
+                )
+            ),
+            float(config.get("http_keepalive_expiry", self._keepalive_expiry)),
+            bool(config.get("http2", self._http2)) and HAS_HTTP2,
+        )
+        with self._lock:
+            current = (
+                self._max_connections,
+                self._max_keepalive_connections,
+                self._keepalive_expiry,
+                self._http2,
+            )
+            if settings == current:
+                return
+            (
+                self._max_connections,
+                self._max_keepalive_connections,
+                self._keepalive_expiry,
+                self._http2,
+            ) = settings
+            self._retired.extend(self._clients.values())
+            self._clients.clear()
+            self._last_used.clear()
+            idle = self._take_idle_retired()
+        for client in idle:
+            client.close()
+
+    def get_client(self, api_base_url: str, api_key: str) -> httpx.Client:
+        """获取（必要时创建）指定接口地址 + 凭据对应的共享客户端"""
+        key = (api_base_url.rstrip("/"), fingerprint(api_key))
+        with self._lock:
+            self._last_used[key] = time.monotonic()
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                # 同一接口地址换了 API Key：换下旧客户端，空闲后关闭，避免泄漏连接
+                stale = [k for k in self._clients if k[0] == key[0]]
+                self._retired.extend(self._clients.pop(k) for k in stale)
+                client = httpx.Client(**self._client_options())
+                self._clients[key] = client
+            # 顺带关闭已经用完的旧客户端
+            idle = self._take_idle_retired() if self._retired else []
+
+        for old in idle:
+            old.close()
+        return client
+
+    def _take_idle_retired(self) -> list[httpx.Client]:
+        """（持有 _lock 时调用）取出已经没有进行中请求的旧客户端，由调用方在锁外关闭"""
+        idle = [client for client in self._retired if is_idle(client)]
+        self._retired = [client for client in self._retired if client not in idle]
+        return idle
+
+    def client_options(self) -> dict:
+        """当前配置下创建 httpx 客户端的参数（异步客户端也用同一套）"""
+        with self._lock:
+            return self._client_options()
+
+    def _client_options(self) -> dict:
+        return {
+            "timeout": self._timeout,
+            "limits": httpx.Limits(
+                max_connections=self._max_connections,
+                max_keepalive_connections=self._max_keepalive_connections,
+                keepalive_expiry=self._keepalive_expiry,
+            ),
+            "http2": self._http2,
+        }
+
+    def close_all(self):
+        with self._lock:
+            clients = list(self._clients.values()) + self._retired
+            self._clients.clear()
+            self._retired = []
+            self._last_used.clear()
+        for client in clients:
+            client.close()
+
+    # ==================== 预热 ====================
+
+    def warm_up(self, api_base_url: str, api_key: str):
+        """
+        后台预热连接：提前完成 DNS / TCP / TLS 握手并放回连接池，
+        让启动后的第一次划词也不用等握手。
+        """
+        if not api_base_url or not api_key:
+            return
+
+        def _run():
+            try:
+                client = self.get_client(api_base_url, api_key)
+                tracker, extensions = self.track_request()
+                client.head(api_base_url.rstrip("/"), extensions=extensions)
+                self.record(tracker)
+            except Exception:
+                pass
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    def ensure_warm(self, api_base_url: str, api_key: str):
+        """
+        只在连接可能已经过期时才预热（最近用过的连接仍在池里，无需再发 HEAD），
+        用于划词时提前建连。
+        """
+        if not api_base_url or not api_key:
+            return
+        key = (api_base_url.rstrip("/"), fingerprint(api_key))
+        with self._lock:
+            last_used = self._last_used.get(key)
+            if last_used is not None and (
+                time.monotonic() - last_used < self._keepalive_expiry / 2
+            ):
+                return
+        self.warm_up(api_base_url, api_key)
+
+    # ==================== 统计 ====================
+
+    @staticmethod
+    def track_request(
+        listener=None, client: httpx.Client | None = None
+    ) -> tuple[_ConnectionTracker, dict]:
+        """
+        返回 (追踪器, 请求扩展参数)，把扩展参数传给 client.stream / client.request；
+        传入 client 时复用的连接也能被 tracker.abort() 关闭
+        """
+        tracker = _ConnectionTracker(listener, client)
+        return tracker, {"trace": tracker}
+
+    def record(self, tracker: _ConnectionTracker):
+        with self._lock:
+            if tracker.new_connection:
+                self._new_connections += 1
+            else:
+                self._pool_hits += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_hits": self._pool_hits,
+                "new_connections": self._new_connections,
+                "clients": len(self._clients),
+                "http2": self._http2,
+            }
+
+
+def fingerprint(api_key: str) -> str:
+    """凭据指纹：连接池只保存它，不在内存字典的 key 里留明文密钥"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+# 进程内唯一的连接池
+_pool = HttpClientPool()
+
+
+def configure(config: dict) -> None:
+    _pool.configure(config)
+
+
+def get_client(api_base_url: str, api_key: str) -> httpx.Client:
+    return _pool.get_client(api_base_url, api_key)
+
+
+def client_options() -> dict:
+    return _pool.client_options()
+
+
+def warm_up(api_base_url: str, api_key: str) -> None:
+    _pool.warm_up(api_base_url, api_key)
+
+
+def ensure_warm(api_base_url: str, api_key: str) -> None:
+    _pool.ensure_warm(api_base_url, api_key)
+
+
+def track_request(
+    listener=None, client: httpx.Client | None = None
+) -> tuple[_ConnectionTracker, dict]:
+    return _pool.track_request(listener, client)
+
+
+def record(tracker: _ConnectionTracker) -> None:
+    _pool.record(tracker)
+
+
+def stats() -> dict:
+    return _pool.stats()
+
+
+def close_all() -> None:
+    _pool.close_all()
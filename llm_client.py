@@ -3,17 +3,27 @@ LLM 流式调用客户端
 使用 httpx 发送 OpenAI 兼容格式的流式请求，支持传入上下文
 """
 
-import json
+import time
 import httpx
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QObject, pyqtSignal
 
+import http_pool
+import prompt_builder
+import request_executor
+from chat_request import build_request, cached_tokens
+from sse_parser import DONE, SSEDecoder, extract_content, extract_usage
+from token_coalescer import TokenCoalescer
+from tracing import NULL_TRACE
 
-class LLMStreamWorker(QThread):
+
+class BaseStreamWorker(QObject):
     """
-    在后台线程中调用 LLM API，逐 token 发送给 UI。
+    LLM 流式请求的公共部分：信号、token 合并、SSE 事件处理、请求组装、错误文案。
+    同步（LLMStreamWorker）与异步（AsyncLLMStreamWorker）两种实现共用，
+    对外的信号约定完全一致。
 
     信号：
-      token_received(str)  - 每收到一段新文本时发射
+      token_received(str)  - 收到新文本时发射（按显示帧合并，首个 token 立即发射）
       stream_finished()    - 流式输出完成
       error_occurred(str)  - 出错时发射错误信息
     """
@@ -30,6 +40,8 @@ class LLMStreamWorker(QThread):
         prompt: str,
         user_text: str,
         context: str = "",
+        flush_interval_ms: int = 16,
+        trace=NULL_TRACE,
         parent=None,
     ):
         super().__init__(parent)
@@ -40,74 +52,222 @@ class LLMStreamWorker(QThread):
         self.user_text = user_text
         self.context = context
         self._cancelled = False
+        self._answer_parts: list[str] = []
+        self._malformed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self._usage = None
+        self._trace = trace
+        self._connect_start_ns = 0
+        self._connect_end_ns = 0
+        self._headers_start_ns = 0
+        # 按显示帧合并 delta，避免每个小 delta 都触发一次跨线程信号 + 整窗重排
+        self._coalescer = TokenCoalescer(
+            self.token_received.emit, flush_interval_ms, parent=self
+        )
 
     def cancel(self):
         self._cancelled = True
+        self._coalescer.cancel()
 
-    def run(self):
-        # 组装 Prompt：替换占位符
-        full_prompt = self.prompt.replace("{text}", self.user_text)
-        full_prompt = full_prompt.replace("{context}", self.context)
+    def stats(self) -> dict:
+        """本次请求的 delta 数、实际 UI 更新次数、损坏事件数与 token 数"""
+        return {
+            **self._coalescer.stats(),
+            "malformed_events": self._malformed,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+        }
 
-        messages = [{"role": "user", "content": full_prompt}]
+    @property
+    def answer_text(self) -> str:
+        """目前为止收到的完整回答"""
+        return "".join(self._answer_parts)
 
-        url = f"{self.api_base_url}/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "model": self.model_name,
-            "messages": messages,
-            "stream": True,
-        }
+    def _build_request(self) -> tuple[str, dict, dict]:
+        """返回 (url, headers, payload)；上下文按该模型的 token 预算裁剪"""
+        built = prompt_builder.build(
+            self.prompt, self.user_text, self.context, self.model_name
+        )
+        self.prompt_tokens = built.prompt_tokens
+        self._trace.set("prompt", built.to_dict())
+        return build_request(self.api_base_url, self.api_key, self.model_name, built.messages)
 
-        try:
-            with httpx.Client(timeout=60.0) as client:
-                with client.stream(
-                    "POST", url, headers=headers, json=payload
-                ) as response:
-                    if response.status_code != 200:
-                        error_body = response.read().decode("utf-8", errors="replace")
-                        if response.status_code == 401:
-                            self.error_occurred.emit(
-                                "API 密钥好像填错了哦，请去右下角设置里检查一下 🔑"
-                            )
-                        elif response.status_code == 404:
-                            self.error_occurred.emit(
-                                f"模型 '{self.model_name}' 不存在，请在设置中检查模型名称 🤔"
-                            )
-                        else:
-                            self.error_occurred.emit(
-                                f"请求失败 (HTTP {response.status_code})：{error_body[:200]}"
-                            )
-                        return
+    def _on_http_event(self, event_name: str):
+        """httpcore 事件 → 连接 / 等待响应头两个阶段的耗时"""
+        now = time.monotonic_ns()
+        if event_name == "connection.connect_tcp.started":
+            self._connect_start_ns = now
+        elif event_name in (
+            "connection.connect_tcp.complete",
+            "connection.start_tls.complete",
+        ):
+            self._connect_end_ns = now
+        elif event_name.endswith("send_request_headers.started"):
+            self._headers_start_ns = now
+            if self._connect_start_ns:
+                self._trace.add_span(
+                    "llm.connect", self._connect_start_ns, self._connect_end_ns or now
+                )
+        elif event_name.endswith("receive_response_headers.complete"):
+            self._trace.add_span("llm.headers", self._headers_start_ns or now, now)
 
-                    for line in response.iter_lines():
-                        if self._cancelled:
-                            return
-                        if not line or not line.startswith("data: "):
-                            continue
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        try:
-                            chunk = json.loads(data_str)
-                            delta = chunk.get("choices", [{}])[0].get("delta", {})
-                            content = delta.get("content", "")
-                            if content:
-                                self.token_received.emit(content)
-                        except json.JSONDecodeError:
-                            continue
+    def _handle_events(self, events: list[bytes]):
+        for data in events:
+            if data == DONE:
+                return
+            try:
+                content = extract_content(data)
+                if not content:
+                    # 最后一个事件（choices 为空）携带 usage
+                    self._usage = extract_usage(data) or self._usage
+            except ValueError:
+                # 分帧正确时仍解析失败，说明服务端发来的就是坏数据：计数后跳过
+                self._malformed += 1
+                continue
+            if content:
+                self._push(content)
 
-            if not self._cancelled:
-                self.stream_finished.emit()
+    def _push(self, content: str):
+        """收到一段新文本：记录首 / 末 delta 时间并交给合并器"""
+        trace = self._trace
+        trace.mark("llm.first_delta")
+        trace.mark("llm.last_delta", once=False)
+        self._answer_parts.append(content)
+        self._coalescer.push(content)
 
-        except httpx.ConnectError:
+    def _emit_status_error(self, status_code: int, error_body: str):
+        if status_code == 401:
+            self.error_occurred.emit("API 密钥好像填错了哦，请去右下角设置里检查一下 🔑")
+        elif status_code == 404:
             self.error_occurred.emit(
-                "无法连接到 AI 服务器，请检查网络或 API 地址是否正确 🌐"
+                f"模型 '{self.model_name}' 不存在，请在设置中检查模型名称 🤔"
             )
-        except httpx.TimeoutException:
-            self.error_occurred.emit("请求超时，AI 服务器响应太慢了 ⏱️")
+        else:
+            self.error_occurred.emit(f"请求失败 (HTTP {status_code})：{error_body[:200]}")
+
+    def _finish(self, decoder: SSEDecoder | None = None):
+        if self._cancelled:
+            return
+        self._coalescer.flush()
+        usage = self._usage
+        if usage:
+            # 服务端报告的用量比发送前的本地计数准
+            self.prompt_tokens = int(usage.get("prompt_tokens") or self.prompt_tokens)
+            self.completion_tokens = int(usage.get("completion_tokens") or 0)
+            self.cached_tokens = cached_tokens(usage)
+        if not self.completion_tokens:
+            self.completion_tokens = prompt_builder.count_tokens(
+                self.answer_text, self.model_name
+            )
+        self._trace.set("stream", self._coalescer.stats())
+        if decoder is not None:
+            self._trace.set("sse", {"events": decoder.events, "malformed": self._malformed})
+        self._trace.set(
+            "tokens",
+            {
+                "prompt": self.prompt_tokens,
+                "completion": self.completion_tokens,
+                "cached": self.cached_tokens,
+                "source": "usage" if usage else "local",
+            },
+        )
+        self.stream_finished.emit()
+
+    @staticmethod
+    def _describe_error(error: Exception) -> str:
+        if isinstance(error, httpx.ConnectError):
+            return "无法连接到 AI 服务器，请检查网络或 API 地址是否正确 🌐"
+        if isinstance(error, httpx.TimeoutException):
+            return "请求超时，AI 服务器响应太慢了 ⏱️"
+        return f"发生未知错误：{str(error)}"
+
+
+class LLMStreamWorker(BaseStreamWorker):
+    """
+    在常驻请求线程中用同步 httpx 调用 LLM API，逐 token 发送给 UI。
+
+    start() 把请求作为任务投递给 request_executor，不新建线程；
+    cancel() 关闭这次请求所用的连接和响应流：建连后的 TLS 握手、等响应头、读取响应体
+    都会立即中断，调用方无需等待。还在 TCP 建连时则在建连完成后的下一个阶段放弃；
+    HTTP/2 连接是共享的不能关闭，要等到响应头到达后才中断。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._job = None
+        self._response = None
+        self._tracker = None
+
+    def start(self):
+        self._job = request_executor.submit(self.run)
+
+    def isRunning(self) -> bool:
+        return self._job is not None and not self._job.done()
+
+    def wait(self, msecs: int = 2000) -> bool:
+        """（仅供脚本 / 基准测试使用）等待任务结束"""
+        return self._job is None or self._job.wait(msecs / 1000)
+
+    def cancel(self):
+        """立即取消：丢弃未推送的文本，关闭连接和响应流打断正在阻塞的握手 / 读取"""
+        super().cancel()
+        tracker = self._tracker
+        if tracker is not None:
+            tracker.abort()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def run(self):
+        if self._cancelled:
+            # 还在队列里就被取消了
+            return
+        trace = self._trace
+        trace.mark("llm.request_start")
+        url, headers, payload = self._build_request()
+
+        try:
+            # 从共享连接池借用客户端，复用 keep-alive 连接
+            client = http_pool.get_client(self.api_base_url, self.api_key)
+            tracker, extensions = http_pool.track_request(self._on_http_event, client)
+            self._tracker = tracker
+            with client.stream(
+                "POST", url, headers=headers, json=payload, extensions=extensions
+            ) as response:
+                self._response = response
+                if self._cancelled:
+                    return
+                http_pool.record(tracker)
+                trace.set("new_connection", tracker.new_connection)
+                if response.status_code != 200:
+                    error_body = response.read().decode("utf-8", errors="replace")
+                    self._emit_status_error(response.status_code, error_body)
+                    return
+
+                # 直接在字节块上分帧：事件跨多次读取也能正确拼接，不再按行解码
+                decoder = SSEDecoder()
+                for chunk in response.iter_bytes():
+                    if self._cancelled:
+                        return
+                    trace.mark("llm.first_byte")
+                    self._handle_events(decoder.feed(chunk))
+                    if decoder.done:
+                        break
+                else:
+                    self._handle_events(decoder.flush())
+
+            self._finish(decoder)
+
         except Exception as e:
-            self.error_occurred.emit(f"发生未知错误：{str(e)}")
+            # 取消时主动关闭了响应流，读取被打断属于正常现象，不报错
+            if not self._cancelled:
+                self.error_occurred.emit(self._describe_error(e))
+        finally:
+            self._response = None
+            self._tracker = None
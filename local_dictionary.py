@@ -0,0 +1,301 @@
+"""
+本地词典模块
+单词和常见术语先查离线词典：内存映射的紧凑索引，二分查找，毫秒内出结果；
+命中后立即显示在悬浮窗里，AI 解释接在下面流式输出（或按配置直接跳过）
+
+索引文件由 dictionary_builder.py 从 ECDICT CSV / StarDict / TSV 生成，
+默认位置 ~/.floating_word_explainer/dictionary.fwd
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+
+from config import CONFIG_DIR
+
+DICTIONARY_FILE = CONFIG_DIR / "dictionary.fwd"
+
+# ===== 索引文件格式（小端序）=====
+# 头部：魔数、版本、词条数、变形数，以及各区段在文件中的起始位置
+# 词条区：键偏移表（n+1 个 u64）+ 键数据（规范化后的 UTF-8，按字节序排序）
+#         记录偏移表（n+1 个 u64）+ 记录数据（各字段以 \x1f 分隔）
+# 变形区：变形键偏移表（m+1 个 u64）+ 变形键数据 + 目标词条序号（m 个 u32）
+MAGIC = b"FWEDICT\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIII4x7Q")
+_U64 = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+
+FIELD_SEP = "\x1f"
+# 记录里依次保存的字段
+FIELDS = ("word", "phonetic", "translation", "definition", "tag")
+
+# 选中内容超过这个长度 / 词数就不是"查单词"了，直接交给 AI
+MAX_TERM_CHARS = 48
+MAX_TERM_WORDS = 4
+
+_SPACE_RE = re.compile(r"\s+")
+# 选中时常带上的标点和引号
+_STRIP_CHARS = " \t\r\n\"'“”‘’「」『』()（）[]【】<>《》,，.。;；:：!！?？、…"
+_ASCII_WORD_RE = re.compile(r"^[a-z]+(?:[-'][a-z]+)*$")
+_VOWELS = set("aeiou")
+
+
+def normalize(term: str) -> str:
+    """词典键：去掉首尾标点、全角转半角、折叠空白、忽略大小写"""
+    term = unicodedata.normalize("NFKC", term).strip(_STRIP_CHARS)
+    return _SPACE_RE.sub(" ", term).casefold()
+
+
+def is_lookup_candidate(text: str) -> bool:
+    """选中内容是否像一个单词 / 短术语（长句、段落不查词典）"""
+    text = text.strip()
+    if not text or len(text) > MAX_TERM_CHARS or "\n" in text:
+        return False
+    return len(text.split()) <= MAX_TERM_WORDS
+
+
+def lemma_candidates(key: str) -> list[str]:
+    """
+    英文屈折变化的规则还原（变形表里没有时兜底）：
+    复数 / 第三人称、过去式、进行时、比较级，含 y→ies、辅音双写、去掉的 e
+    """
+    if not _ASCII_WORD_RE.match(key) or len(key) < 4:
+        return []
+    candidates = []
+
+    def add(stem: str):
+        if len(stem) >= 2 and stem not in candidates:
+            candidates.append(stem)
+
+    if key.endswith("'s") or key.endswith("s'"):
+        add(key[:-2])
+    for suffix in ("ies", "ied", "ier", "iest"):
+        if key.endswith(suffix):
+            add(key[: -len(suffix)] + "y")
+    for suffix in ("ing", "ed", "est", "er", "es", "s"):
+        if not key.endswith(suffix) or key.endswith("ss"):
+            continue
+        stem = key[: -len(suffix)]
+        add(stem)
+        if suffix in ("ing", "ed", "est", "er"):
+            add(stem + "e")
+            # stopped → stop，bigger → big
+            if len(stem) >= 3 and stem[-1] == stem[-2] and stem[-1] not in _VOWELS:
+                add(stem[:-1])
+    return candidates
+
+
+class DictEntry:
+    """一个词条（matched 为命中方式：exact / form / lemma）"""
+
+    def __init__(self, fields: list[str], matched: str = "exact", query: str = ""):
+        fields = fields + [""] * (len(FIELDS) - len(fields))
+        self.word, self.phonetic, self.translation, self.definition, self.tag = fields[
+            : len(FIELDS)
+        ]
+        self.matched = matched
+        self.query = query
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in FIELDS + ("matched",)}
+
+    def to_markdown(self, max_lines: int = 8) -> str:
+        """渲染成悬浮窗里显示的 Markdown（AI 解释接在后面）"""
+        title = f"### 📘 {self.word}"
+        if self.phonetic:
+            title += f"  `/{self.phonetic}/`"
+        lines = [title]
+        if self.matched != "exact" and self.query and self.query != normalize(self.word):
+            lines.append(f"*{self.query} → {self.word}*")
+        body = [line.strip() for line in self.translation.splitlines() if line.strip()]
+        if not body:
+            body = [line.strip() for line in self.definition.splitlines() if line.strip()]
+        lines.extend(f"- {line}" for line in body[:max_lines])
+        if self.tag:
+            lines.append(f"<small>{self.tag}</small>")
+        return "\n".join(lines) + "\n\n"
+
+
+class LocalDictionary:
+    """
+    内存映射的只读词典。
+
+    标准解释：
+    打开时只读头部并 mmap 整个文件，不把词条加载进内存；
+    查词在排好序的键上二分查找（100 万词条约 20 次比较），
+    每次比较直接切 mmap 的字节，操作系统按需把用到的页读进来。
+    查找顺序：精确匹配 → 变形表（ECDICT 的 exchange 字段，如 went → go）
+    → 规则还原（stopped → stop）。prefix() 按前缀列出词条。
+
+    小学生解释：
+    一本按字母排好序的大字典放在书架上，不用整本背下来。
+    查词时先翻到中间，看要找的词在前半本还是后半本，再翻一半……
+    翻二十来次就找到了；找不到 "went" 就去看"变形表"，原来它是 "go"。
+    """
+
+    def __init__(self, path=DICTIONARY_FILE):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"词典文件为空：{path}")
+        (
+            magic,
+            version,
+            self.entries,
+            self.forms,
+            self._key_offsets,
+            self._keys,
+            self._record_offsets,
+            self._records,
+            self._form_offsets,
+            self._form_keys,
+            self._form_targets,
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"不是本程序生成的词典索引：{path}")
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    # ==================== 底层读取 ====================
+
+    def _offset(self, table: int, index: int) -> int:
+        return _U64.unpack_from(self._mm, table + index * 8)[0]
+
+    def _key(self, index: int) -> bytes:
+        start = self._offset(self._key_offsets, index)
+        end = self._offset(self._key_offsets, index + 1)
+        return self._mm[self._keys + start : self._keys + end]
+
+    def _form_key(self, index: int) -> bytes:
+        start = self._offset(self._form_offsets, index)
+        end = self._offset(self._form_offsets, index + 1)
+        return self._mm[self._form_keys + start : self._form_keys + end]
+
+    def _fields(self, index: int) -> list[str]:
+        start = self._offset(self._record_offsets, index)
+        end = self._offset(self._record_offsets, index + 1)
+        data = self._mm[self._records + start : self._records + end]
+        return data.decode("utf-8").split(FIELD_SEP)
+
+    @staticmethod
+    def _lower_bound(key_at, count: int, key: bytes) -> int:
+        low, high = 0, count
+        while low < high:
+            mid = (low + high) // 2
+            if key_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _find(self, key: bytes, original: str) -> int:
+        """精确查找；同一个键有多个词条（US / us）时优先大小写一致的那个"""
+        index = self._lower_bound(self._key, self.entries, key)
+        best = -1
+        while index < self.entries and self._key(index) == key:
+            if best < 0:
+                best = index
+            if self._fields(index)[0] == original:
+                return index
+            index += 1
+        return best
+
+    def _find_form(self, key: bytes) -> int:
+        index = self._lower_bound(self._form_key, self.forms, key)
+        if index < self.forms and self._form_key(index) == key:
+            return _U32.unpack_from(self._mm, self._form_targets + index * 4)[0]
+        return -1
+
+    # ==================== 查询 ====================
+
+    def lookup(self, term: str) -> DictEntry | None:
+        original = term.strip(_STRIP_CHARS)
+        key = normalize(term)
+        if not key:
+            return None
+        index = self._find(key.encode("utf-8"), original)
+        if index >= 0:
+            return DictEntry(self._fields(index), "exact", key)
+        index = self._find_form(key.encode("utf-8"))
+        if index >= 0:
+            return DictEntry(self._fields(index), "form", key)
+        for stem in lemma_candidates(key):
+            index = self._find(stem.encode("utf-8"), stem)
+            if index >= 0:
+                return DictEntry(self._fields(index), "lemma", key)
+        return None
+
+    def prefix(self, term: str, limit: int = 10) -> list[str]:
+        """以 term 开头的词条（按字典序），用于联想 / 补全"""
+        key = normalize(term).encode("utf-8")
+        if not key:
+            return []
+        index = self._lower_bound(self._key, self.entries, key)
+        words = []
+        while index < self.entries and len(words) < limit:
+            if not self._key(index).startswith(key):
+                break
+            words.append(self._fields(index)[0])
+            index += 1
+        return words
+
+    def stats(self) -> dict:
+        return {
+            "entries": self.entries,
+            "forms": self.forms,
+            "size_mb": round(os.path.getsize(self.path) / 1024 / 1024, 1),
+        }
+
+
+# 进程内共享的词典（按路径和修改时间缓存，重新生成索引后自动重新打开）
+_lock = threading.Lock()
+_opened: tuple | None = None
+
+
+def get_dictionary(path=None) -> LocalDictionary | None:
+    """打开（或复用）词典；文件不存在或格式不对时返回 None"""
+    global _opened
+    path = str(path or DICTIONARY_FILE)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _lock:
+        if _opened is not None and _opened[:2] == (path, mtime):
+            return _opened[2]
+        try:
+            dictionary = LocalDictionary(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if _opened is not None:
+            _opened[2].close()
+        _opened = (path, mtime, dictionary)
+        return dictionary
+
+
+def lookup(text: str, path=None) -> DictEntry | None:
+    """查选中内容；不像单词 / 短术语或没有词典时返回 None"""
+    if not is_lookup_candidate(text):
+        return None
+    dictionary = get_dictionary(path)
+    if dictionary is None:
+        return None
+    return dictionary.lookup(text)
+
+
+def close():
+    global _opened
+    with _lock:
+        if _opened is not None:
+            _opened[2].close()
+            _opened = None
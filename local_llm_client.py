@@ -0,0 +1,70 @@
+"""
+本地模型流式客户端
+在本地模型运行时（local_model）的推理线程里生成回答，逐 token 发送给 UI；
+信号、构造参数、start / cancel / isRunning / wait 与 LLMStreamWorker 完全一致
+"""
+
+import local_model
+import prompt_builder
+from llm_client import BaseStreamWorker
+
+
+class LocalLLMStreamWorker(BaseStreamWorker):
+    """
+    用常驻内存的本地 GGUF 模型生成回答。
+
+    api_key / api_base_url 不使用（保留是为了和其它后端的构造参数一致）；
+    Prompt 预算取配置预算与"上下文长度 − 回答长度"中的较小值。
+    cancel() 只设置标志：预填充中途由 llama.cpp 的中止回调打断，生成中在下一个 token 处停止，
+    随即让出推理线程。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._job = None
+
+    def start(self):
+        self._job = local_model.runtime.submit(self.run)
+
+    def isRunning(self) -> bool:
+        return self._job is not None and not self._job.done()
+
+    def wait(self, msecs: int = 2000) -> bool:
+        """（仅供脚本 / 基准测试使用）等待任务结束"""
+        return self._job is None or self._job.wait(msecs / 1000)
+
+    def run(self):
+        if self._cancelled:
+            # 还在队列里（比如模型还在加载）就被取消了
+            return
+        trace = self._trace
+        trace.mark("llm.request_start")
+        runtime = local_model.runtime
+        built = prompt_builder.build(
+            self.prompt,
+            self.user_text,
+            self.context,
+            self.model_name,
+            budget=runtime.prompt_budget(),
+        )
+        self.prompt_tokens = built.prompt_tokens
+        trace.set("prompt", built.to_dict())
+
+        try:
+            stats = runtime.generate(built.messages, self._push, lambda: self._cancelled)
+        except local_model.LocalModelError as e:
+            self.error_occurred.emit(str(e))
+            return
+        except Exception as e:
+            if not self._cancelled:
+                self.error_occurred.emit(f"本地模型生成出错：{e}")
+            return
+
+        trace.set("local_llm", stats)
+        # 按服务端 usage 的格式填写，复用的 KV 前缀记为缓存命中
+        self._usage = {
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "prompt_tokens_details": {"cached_tokens": stats["reused_tokens"]},
+        }
+        self._finish()
@@ -0,0 +1,273 @@
+"""
+本地模型运行时
+断网 / 内网环境下用 llama.cpp（llama-cpp-python）在本进程内运行 GGUF 模型：
+启动后在后台加载一次并常驻内存，所有生成都在一个专用推理线程里排队执行
+
+llama-cpp-python 是可选依赖（pip install llama-cpp-python）。
+KV 缓存复用：llama.cpp 会跳过与上一次 Prompt 相同的前缀 token，配合缓存友好的消息布局
+（system → 上下文 → 选中文本），同一页上再次查词只需预填充末尾的选中文本；
+local_llm_cache_mb > 0 时再保留几页的 KV 状态，在几个页面之间来回切换也能复用。
+"""
+
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+from request_executor import RequestExecutor
+
+# llama-cpp-python 导入要几百毫秒，且只有本地后端才用得到：检查是否安装，真正加载时再导入
+HAS_LLAMA_CPP = importlib.util.find_spec("llama_cpp") is not None
+
+
+class LocalModelError(Exception):
+    """本地模型不可用（未配置、未安装、加载失败）或生成出错，消息可直接展示给用户"""
+
+
+def _settings(config: dict) -> tuple:
+    """影响模型加载的配置项：任何一项变化都需要重新加载"""
+    return (
+        config.get("local_llm_model_path", ""),
+        int(config.get("local_llm_threads", 0)),
+        int(config.get("local_llm_n_ctx", 4096)),
+        int(config.get("local_llm_cache_mb", 256)),
+    )
+
+
+def model_name(config: dict) -> str:
+    """本地模型在统计、历史记录里显示的名字（模型文件名）"""
+    path = config.get("local_llm_model_path", "")
+    return Path(path).stem if path else "local"
+
+
+def _common_prefix(a, b) -> int:
+    count = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        count += 1
+    return count
+
+
+class LocalModel:
+    """
+    常驻内存的本地模型。
+
+    标准解释：
+    configure() 只记录配置并把"加载"作为任务投递到专用推理线程（单线程），立即返回；
+    之后的生成任务在同一个队列里排在加载后面，所以启动后马上划词也不会出错，只是等加载完成。
+    模型参数（路径、线程数、上下文长度、KV 缓存大小）变化时才重新加载，先释放旧模型再加载新模型。
+    llama.cpp 的上下文不能并发使用，单线程排队正好保证同一时刻只有一个生成。
+
+    小学生解释：
+    本地模型就像请了一位住在家里的老师：开门营业时先把他请进来（加载要一会儿），
+    之后他一直在，不用每次都重新请。他一次只能回答一个问题，大家排队；
+    同一篇文章里接着问，他记得刚才读过的内容，不用从头再读一遍。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: RequestExecutor | None = None
+        self._settings: tuple | None = None
+        self._llama = None
+        # 当前生成的 should_stop：预填充期间由 llama.cpp 的中止回调轮询
+        self._should_stop = None
+        self._abort_callback = None
+        self.state = "idle"  # idle / loading / ready / failed
+        self.error = ""
+        self.load_ms = 0.0
+        self.n_ctx = 4096
+        self.max_tokens = 768
+        self.temperature = 0.3
+
+    def configure(self, config: dict):
+        """更新生成参数；模型参数变化时在推理线程里重新加载"""
+        self.max_tokens = int(config.get("local_llm_max_tokens", 768))
+        self.temperature = float(config.get("local_llm_temperature", 0.3))
+        settings = _settings(config)
+        with self._lock:
+            if settings == self._settings:
+                return
+            self._settings = settings
+            self.state = "loading" if settings[0] else "idle"
+            self.error = ""
+        self.submit(lambda: self._load(settings))
+
+    def submit(self, func):
+        """把任务投递到推理线程，返回 request_executor.Job"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = RequestExecutor(max_workers=1)
+            executor = self._executor
+        return executor.submit(func)
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """（仅供脚本 / 基准测试使用）等排在前面的加载完成"""
+        self.submit(lambda: None).wait(timeout)
+        return self.state == "ready"
+
+    def prompt_budget(self) -> int:
+        """上下文长度里留出回答的位置，剩下的才是 Prompt 的预算"""
+        return max(256, self.n_ctx - self.max_tokens)
+
+    def _load(self, settings: tuple):
+        with self._lock:
+            if settings != self._settings:
+                # 排队期间配置又变了：交给后面那次加载
+                return
+        path, threads, n_ctx, cache_mb = settings
+        # 先释放旧模型，避免新旧两份权重同时占内存
+        self._llama = None
+        if not path:
+            return
+        if not HAS_LLAMA_CPP:
+            self._fail("没有安装本地推理引擎，请先运行：pip install llama-cpp-python")
+            return
+        if not Path(path).is_file():
+            self._fail(f"找不到本地模型文件：{path}")
+            return
+
+        start = time.perf_counter()
+        try:
+            from llama_cpp import Llama, LlamaRAMCache
+
+            llama = Llama(
+                model_path=path,
+                n_ctx=n_ctx,
+                # 0 = 由 llama.cpp 决定（物理核数）
+                n_threads=threads or None,
+                n_threads_batch=threads or None,
+                verbose=False,
+            )
+            if cache_mb > 0:
+                llama.set_cache(LlamaRAMCache(capacity_bytes=cache_mb * 1024 * 1024))
+        except Exception as e:
+            self._fail(f"本地模型加载失败：{e}")
+            return
+        self._install_abort_callback(llama)
+        self._llama = llama
+        self.n_ctx = n_ctx
+        self.load_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if settings == self._settings:
+                self.state = "ready"
+
+    def _install_abort_callback(self, llama):
+        """
+        让取消在预填充途中也能生效：llama.cpp 计算每个批次时轮询中止回调，
+        返回 True 时 llama_decode 立即返回，长页面的预填充不会继续占住推理线程。
+        旧版 llama-cpp-python 没有这个接口时只在 token 之间检查取消。
+        """
+        try:
+            import llama_cpp
+
+            def should_abort(_data) -> bool:
+                should_stop = self._should_stop
+                try:
+                    return bool(should_stop is not None and should_stop())
+                except Exception:
+                    return False
+
+            callback = llama_cpp.ggml_abort_callback(should_abort)
+            llama_cpp.llama_set_abort_callback(llama._ctx.ctx, callback, None)
+        except Exception:
+            return
+        # ctypes 回调必须一直被引用，否则会被回收
+        self._abort_callback = callback
+
+    def _fail(self, message: str):
+        with self._lock:
+            self.state = "failed"
+            self.error = message
+
+    def generate(self, messages: list[dict], on_text, should_stop=lambda: False) -> dict:
+        """
+        在推理线程里调用：流式生成，每段新文本回调 on_text(text)，
+        should_stop() 返回 True 时停止——预填充中途（见 _install_abort_callback）或下一个 token 处。
+        返回本次的耗时与 token 统计；completion_tokens 是用模型分词器对回答重新分词得到的。
+        """
+        llama = self._llama
+        if llama is None:
+            if self.state == "failed":
+                raise LocalModelError(self.error)
+            raise LocalModelError("还没有配置本地模型，请在 config.json 中设置 local_llm_model_path 🤖")
+
+        previous = list(llama.input_ids[: llama.n_tokens])
+        parts = []
+        first = None
+        start = time.perf_counter()
+        self._should_stop = should_stop
+        stream = llama.create_chat_completion(
+            messages=messages,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if should_stop():
+                    break
+                choices = chunk.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    if first is None:
+                        first = time.perf_counter()
+                    parts.append(text)
+                    on_text(text)
+        except Exception:
+            # 被中止回调打断的 llama_decode 会抛错：取消时不算生成出错
+            if not should_stop():
+                raise
+        finally:
+            self._should_stop = None
+            stream.close()
+        end = time.perf_counter()
+
+        answer = "".join(parts)
+        completion = (
+            len(llama.tokenize(answer.encode("utf-8"), add_bos=False, special=True))
+            if answer
+            else 0
+        )
+        evaluated = list(llama.input_ids[: llama.n_tokens])
+        prompt_tokens = max(0, len(evaluated) - max(completion - 1, 0))
+        decode_s = end - first if first is not None else 0.0
+        return {
+            "prompt_tokens": prompt_tokens,
+            # 与上一次生成共享、无需重新预填充的前缀 token 数
+            "reused_tokens": min(_common_prefix(previous, evaluated), prompt_tokens),
+            "completion_tokens": completion,
+            "ttft_ms": ((first or end) - start) * 1000,
+            "total_ms": (end - start) * 1000,
+            "decode_tokens_per_s": (completion - 1) / decode_s if decode_s > 0 else 0.0,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "load_ms": round(self.load_ms, 1),
+            "n_ctx": self.n_ctx,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown()
+
+
+# 进程内唯一的本地模型
+runtime = LocalModel()
+
+
+def configure(config: dict) -> None:
+    runtime.configure(config)
+
+
+def stats() -> dict:
+    return runtime.stats()
+
+
+def shutdown() -> None:
+    runtime.shutdown()
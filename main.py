@@ -5,22 +5,46 @@
 1. 创建 PyQt 应用
 2. 初始化系统托盘图标
 3. 启动全局热键监听
-4. 等待用户划词 + 按 Shift → 弹出悬浮窗 → 调用 LLM → 流式渲染
+4. 后台线程预先导入 markdown / httpx / 设置面板等重模块并预热连接，完成后建好悬浮窗
+5. 等待用户划词 + 按 Shift → 弹出悬浮窗 → 调用 LLM → 流式渲染
+
+启动时只导入托盘和热键监听需要的模块，其余模块在第一次使用或后台预热时才加载，
+启动耗时预算见 benchmarks/bench_startup.py
 """
 
+import importlib
 import sys
-import pyautogui
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QObject, pyqtSignal
+import threading
+import time
+from PyQt6.QtWidgets import QApplication, QMessageBox
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QCursor
 
-from config import load_config
+import local_dictionary
+import prompt_builder
+import tracing
+from answer_cache import AnswerCache, make_key
+from config import load_config, subscribe as subscribe_config
+from endpoint_pool import EndpointPool
+from hedging import HedgedStream
+from history_store import HistoryStore
 from hotkey_listener import HotkeyListener
-from llm_client import LLMStreamWorker
-from floating_window import FloatingWindow
-from settings_dialog import SettingsDialog
+from speculation import SpeculationStats, SpeculativeRequest, context_differs
 from tray_icon import TrayIcon, create_app_icon
 from toast import ToastNotification
 
+# 托盘出现后在后台线程预先导入的模块（按第一次划词用到的先后排列）
+PRELOAD_MODULES = (
+    "pyautogui",
+    "http_pool",
+    "request_executor",
+    "llm_client",
+    "markdown_renderer",
+    "floating_window",
+    "settings_dialog",
+    "history_dialog",
+)
+
 
 class AppController(QObject):
     """
@@ -36,16 +60,40 @@ class AppController(QObject):
     这样 AI 老爷爷就能结合文章给出更准确的解释了。
     """
 
+    # 后台预热完成（由预热线程发射，排队到主线程处理）
+    warm_up_finished = pyqtSignal()
+    # 配置变化（可能由任意线程里的 load_config / save_config 触发，排队到主线程处理）
+    config_changed = pyqtSignal(dict, dict)
+
     def __init__(self):
         super().__init__()
 
-        self._floating_window = FloatingWindow()
+        config = load_config()
+
+        # 悬浮窗依赖 markdown，推迟到后台预热完成（或第一次划词）时再创建
+        self._window = None
         self._toast = ToastNotification()
         self._tray = TrayIcon()
-        self._hotkey_listener = HotkeyListener()
+        self._hotkey_listener = HotkeyListener(hotkey=config.get("hotkey", "shift"))
+        self._hotkey_listener.configure(config)
         self._llm_worker = None
+        # 推测请求：选中文本一到手就先发出的请求，等最终上下文到了再决定去留
+        self._speculation: SpeculativeRequest | None = None
+        self._speculation_stats = SpeculationStats()
+        # 多端点 + 对冲请求：按权重选主端点，首 token 迟迟不来就向第二个端点再发一次
+        self._endpoints = EndpointPool()
+        self._endpoints.configure(config)
+        self._answer_cache = AnswerCache.from_config(config)
+        # 查词历史：后台线程批量写入，托盘"历史记录"面板搜索
+        self._history = HistoryStore.from_config(config)
+        self._history_dialog = None
+        self._trace = tracing.NULL_TRACE
+        tracing.tracer.configure(config)
+        prompt_builder.configure(config)
 
         self._connect_signals()
+        # 配置变化（设置面板保存或手动修改 config.json）时重新配置各模块
+        self._unsubscribe_config = subscribe_config(self.config_changed.emit)
 
         self._hotkey_listener.start()
         self._tray.show()
@@ -56,62 +104,505 @@ class AppController(QObject):
             3000,
         )
 
+        # 托盘已经出现：剩下的模块导入和 HTTP 连接预热放到后台，启动后第一次划词也无需等待
+        self._start_background_warm_up()
+
+    @property
+    def _floating_window(self):
+        return self._ensure_floating_window()
+
+    def _ensure_floating_window(self):
+        """创建悬浮窗（只创建一次；预热完成前就划词则在这里同步导入）"""
+        if self._window is None:
+            from floating_window import FloatingWindow
+
+            self._window = FloatingWindow()
+            self._window.closed.connect(self._cancel_current_request)
+        return self._window
+
+    def _start_background_warm_up(self):
+        """后台线程：导入重模块 → 配置连接池和请求线程 → 预热端点连接"""
+
+        def _run():
+            modules = PRELOAD_MODULES
+            backend = load_config().get("llm_backend", "thread")
+            if backend == "asyncio":
+                modules += ("async_llm_client",)
+            elif backend == "local":
+                modules += ("local_model", "local_llm_client")
+            for name in modules:
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    # 导入失败留到第一次真正使用时再报错
+                    pass
+
+            import http_pool
+            import request_executor
+
+            # 导入期间配置可能已被修改，以最新的为准
+            config = load_config()
+            http_pool.configure(config)
+            request_executor.configure(config)
+            if config.get("llm_backend") == "local":
+                # 本地模型在自己的推理线程里加载，加载完成前的查词会排队等待
+                import local_model
+
+                local_model.configure(config)
+                # 本地后端按离线环境处理：只用已缓存的编码表，不尝试下载
+                prompt_builder.preload_tokenizers([local_model.model_name(config)], offline=True)
+            else:
+                self._warm_up_endpoints(config)
+                prompt_builder.preload_tokenizers(e.model_name for e in self._endpoints.endpoints)
+            self.warm_up_finished.emit()
+
+        threading.Thread(target=_run, name="startup-warm-up", daemon=True).start()
+
     def _connect_signals(self):
+        self._hotkey_listener.selection_captured.connect(self._on_selection_captured)
         self._hotkey_listener.text_extracted.connect(self._on_text_extracted)
         self._hotkey_listener.no_text_selected.connect(self._on_no_text)
         self._tray.settings_requested.connect(self._show_settings)
+        self._tray.history_requested.connect(self._show_history)
+        self._tray.latency_stats_requested.connect(self._show_latency_stats)
         self._tray.quit_requested.connect(self._quit)
-        self._floating_window.closed.connect(self._cancel_current_request)
+        # 悬浮窗必须在主线程创建：预热线程只负责导入模块，完成后回到主线程建窗
+        self.warm_up_finished.connect(self._ensure_floating_window)
+        # 重新配置热键钩子、连接池、本地模型等只在主线程进行；排队连接也避免在 save() 内部重入
+        self.config_changed.connect(
+            self._on_config_changed, Qt.ConnectionType.QueuedConnection
+        )
+
+    def _on_config_changed(self, old: dict, new: dict):
+        """配置变化（主线程）：热键、HTTP 连接池、回答缓存上限"""
+        import http_pool
+        import request_executor
+
+        new_hotkey = new.get("hotkey", "shift")
+        if new_hotkey != old.get("hotkey", "shift"):
+            self._hotkey_listener.update_hotkey(new_hotkey)
+        self._hotkey_listener.configure(new)
+
+        http_pool.configure(new)
+        request_executor.configure(new)
+        prompt_builder.configure(new)
+        self._endpoints.configure(new)
+        if new.get("llm_backend") == "local":
+            import local_model
+
+            local_model.configure(new)
+            tokenizer_models, offline = [local_model.model_name(new)], True
+        else:
+            if "local_model" in sys.modules:
+                # 切换到在线接口：释放本地模型占用的内存
+                sys.modules["local_model"].configure({})
+            tokenizer_models, offline = [e.model_name for e in self._endpoints.endpoints], False
+        # GUI 线程上不等待：只在后台开始加载新模型的编码表
+        prompt_builder.preload_tokenizers(tokenizer_models, offline=offline, timeout=0)
+        endpoint_keys = ("api_base_url", "api_key", "endpoints", "llm_backend")
+        if any(old.get(k) != new.get(k) for k in endpoint_keys):
+            self._warm_up_endpoints(new)
+
+        tracing.tracer.configure(new)
+
+        limits = AnswerCache.from_config(new)
+        self._answer_cache.ttl_seconds = limits.ttl_seconds
+        self._answer_cache.max_entries = limits.max_entries
+        self._answer_cache.max_bytes = limits.max_bytes
+
+        history_limits = HistoryStore.from_config(new)
+        self._history.retention_days = history_limits.retention_days
+        self._history.max_entries = history_limits.max_entries
+        self._history.max_bytes = history_limits.max_bytes
+
+    def _warm_up_endpoints(self, config: dict, if_idle: bool = False):
+        """预热端点池里所有端点的连接（按当前后端选择同步或异步连接池）"""
+        import http_pool
+
+        use_async = config.get("llm_backend", "thread") == "asyncio"
+        for endpoint in self._endpoints.endpoints:
+            if use_async:
+                import async_llm_client
+
+                async_llm_client.runtime.warm_up(
+                    endpoint.api_base_url, endpoint.api_key, if_idle=if_idle
+                )
+            elif if_idle:
+                http_pool.ensure_warm(endpoint.api_base_url, endpoint.api_key)
+            else:
+                http_pool.warm_up(endpoint.api_base_url, endpoint.api_key)
+
+    def _create_stream(
+        self, config: dict, text: str, context: str, trace=tracing.NULL_TRACE
+    ) -> "HedgedStream | LocalLLMStreamWorker":
+        prompt = config.get("default_prompt", "请简明扼要地解释以下内容：\n\n{text}")
+        flush_interval_ms = config.get("stream_flush_interval_ms", 16)
+
+        # llm_backend：thread = 常驻线程 + 同步 httpx；asyncio = 事件循环 + AsyncClient；
+        # local = 本进程内的 GGUF 模型（只有一个，不做多端点对冲）
+        if config.get("llm_backend", "thread") == "local":
+            import local_model
+            from local_llm_client import LocalLLMStreamWorker
+
+            return LocalLLMStreamWorker(
+                api_key="",
+                api_base_url="",
+                model_name=local_model.model_name(config),
+                prompt=prompt,
+                user_text=text,
+                context=context,
+                flush_interval_ms=flush_interval_ms,
+                trace=trace,
+            )
+        if config.get("llm_backend", "thread") == "asyncio":
+            from async_llm_client import AsyncLLMStreamWorker as worker_class
+        else:
+            from llm_client import LLMStreamWorker as worker_class
+
+        def make_worker(endpoint, worker_trace):
+            return worker_class(
+                api_key=endpoint.api_key,
+                api_base_url=endpoint.api_base_url,
+                model_name=endpoint.model_name,
+                prompt=prompt,
+                user_text=text,
+                context=context,  # 传入上下文
+                flush_interval_ms=flush_interval_ms,
+                trace=worker_trace,
+            )
+
+        return HedgedStream(self._endpoints, make_worker, trace)
+
+    def _on_selection_captured(self, text: str, speculative_context: str):
+        """选中文本已拿到、上下文还在获取：按配置提前建连或提前发出请求"""
+        config = load_config()
+        policy = config.get("speculative_prefetch", "connect")
+        if policy == "off" or not self._endpoints.endpoints:
+            return
+        if config.get("llm_backend") == "local":
+            # 本地模型一次只能生成一个回答，推测请求会挡住真正的请求
+            return
+        if config.get("local_dict_mode", "off") == "instead" and local_dictionary.lookup(
+            text, config.get("local_dict_path") or None
+        ):
+            # 词典能直接回答，不会再请求 AI
+            return
+        if policy == "connect":
+            self._warm_up_endpoints(config, if_idle=True)
+            return
+
+        self._discard_speculation()
+        tracing.current().mark("speculation.start")
+        # 推测请求不挂 trace：被丢弃时它的首字节 / 首 token 时间不代表真实体验
+        stream = self._create_stream(config, text, speculative_context)
+        # 以请求为父对象：被采用后随请求一起存活，转发信号不会中断
+        self._speculation = SpeculativeRequest(
+            stream, text, speculative_context, parent=stream
+        )
+        self._speculation_stats.record_start()
+        stream.start()
+
+    def _discard_speculation(self):
+        if self._speculation is None:
+            return
+        speculation, self._speculation = self._speculation, None
+        self._speculation_stats.record_discard(speculation.cancel())
 
     def _on_text_extracted(self, text: str, context: str, mouse_x: int, mouse_y: int):
         """收到提取的文本和上下文后，弹出悬浮窗并请求 LLM"""
         self._cancel_current_request()
+        trace = tracing.current()
+        self._trace = trace
 
         config = load_config()
-        api_key = config.get("api_key", "").strip()
+        model_name = self._answer_model_name(config)
+        prompt = config.get("default_prompt", "请简明扼要地解释以下内容：\n\n{text}")
+
+        speculation, self._speculation = self._speculation, None
+        if speculation is not None and speculation.selection != text:
+            self._speculation_stats.record_discard(speculation.cancel())
+            speculation = None
+
+        # 本地词典：单词 / 短术语毫秒级出结果，AI 解释接在下面（或按配置跳过）
+        entry = self._lookup_dictionary(config, text, trace)
+        if entry is not None and config.get("local_dict_mode") == "instead":
+            if speculation is not None:
+                self._speculation_stats.record_discard(speculation.cancel())
+            self._show_window(mouse_x, mouse_y, entry)
+            self._floating_window.finish_stream()
+            tracing.finish(trace, "dict_hit")
+            return
+
+        # 先查回答缓存：命中则直接展示，不发网络请求
+        cache_enabled = config.get("answer_cache_enabled", True)
+        if cache_enabled:
+            cached = self._answer_cache.get(make_key(text, context, model_name, prompt))
+            if cached is not None:
+                if speculation is not None:
+                    self._speculation_stats.record_discard(speculation.cancel())
+                self._show_window(mouse_x, mouse_y, entry)
+                self._floating_window.append_token(cached)
+                self._floating_window.finish_stream()
+                tracing.finish(trace, "cache_hit")
+                return
 
-        if not api_key:
+        if not self._endpoints.endpoints and config.get("llm_backend") != "local":
+            if entry is not None:
+                # 没配置 API 也能查词典
+                self._show_window(mouse_x, mouse_y, entry)
+                self._floating_window.finish_stream()
+                tracing.finish(trace, "dict_hit")
+                return
             self._floating_window.show_at(mouse_x, mouse_y)
             self._floating_window.show_error(
                 "还没有配置 API Key 哦！<br>"
                 "请右键点击右下角托盘图标 → 设置 → 填写 API Key 🔑"
             )
+            tracing.finish(trace, "no_api_key")
             return
 
-        self._floating_window.show_at(mouse_x, mouse_y)
+        self._show_window(mouse_x, mouse_y, entry)
 
-        self._llm_worker = LLMStreamWorker(
-            api_key=api_key,
-            api_base_url=config.get("api_base_url", "https://api.deepseek.com"),
-            model_name=config.get("model_name", "deepseek-chat"),
-            prompt=config.get("default_prompt", "请简明扼要地解释以下内容：\n\n{text}"),
-            user_text=text,
-            context=context,  # 传入上下文
-        )
+        if speculation is not None:
+            threshold = float(config.get("speculative_similarity_threshold", 0.5))
+            if speculation.failed or context_differs(
+                speculation.context, context, threshold, text
+            ):
+                # 上下文有实质差别：放弃推测的回答，带上下文重新请求
+                self._speculation_stats.record_discard(speculation.cancel())
+                trace.set("speculation", "discarded")
+            else:
+                # 上下文没拿到或与推测时差不多：直接沿用已经在路上的回答
+                self._speculation_stats.record_win()
+                trace.set("speculation", "won")
+                trace.mark("speculation.adopted")
+                self._llm_worker = speculation.worker
+                # 回答是按推测时的上下文（窗口标题）生成的：按它缓存 / 记录，
+                # 不能写到最终上下文的键下，否则之后带整页上下文的查词会命中这个回答
+                self._attach_stream(
+                    speculation,
+                    speculation.worker,
+                    trace,
+                    text,
+                    speculation.context if cache_enabled else None,
+                    prompt,
+                )
+                self._record_history(
+                    speculation, speculation.worker, config, text, speculation.context
+                )
+                speculation.adopt()
+                return
 
-        self._llm_worker.token_received.connect(self._floating_window.append_token)
-        self._llm_worker.stream_finished.connect(self._floating_window.finish_stream)
-        self._llm_worker.error_occurred.connect(self._floating_window.show_error)
+        self._llm_worker = self._create_stream(config, text, context, trace)
+        self._attach_stream(
+            self._llm_worker,
+            self._llm_worker,
+            trace,
+            text,
+            context if cache_enabled else None,
+            prompt,
+        )
+        self._record_history(self._llm_worker, self._llm_worker, config, text, context)
         self._llm_worker.start()
 
+    def _lookup_dictionary(self, config: dict, text: str, trace):
+        """按配置查本地词典；关闭、没有词典文件或选中内容不像单词时返回 None"""
+        if config.get("local_dict_mode", "off") == "off":
+            return None
+        with trace.span("local_dict"):
+            entry = local_dictionary.lookup(text, config.get("local_dict_path") or None)
+        trace.set("local_dict", entry.matched if entry is not None else "miss")
+        return entry
+
+    def _show_window(self, mouse_x: int, mouse_y: int, entry=None):
+        """弹出悬浮窗；查到词典词条时先显示它，后面的回答接在分隔线下面"""
+        self._floating_window.show_at(mouse_x, mouse_y)
+        if entry is not None:
+            self._floating_window.append_token(entry.to_markdown() + "---\n\n")
+
+    @staticmethod
+    def _answer_model_name(config: dict) -> str:
+        """当前配置下默认由哪个模型回答（回答缓存按它查找）"""
+        if config.get("llm_backend") == "local":
+            import local_model
+
+            return local_model.model_name(config)
+        return config.get("model_name", "deepseek-chat")
+
+    def _attach_stream(
+        self,
+        stream,
+        hedged,
+        trace,
+        text: str,
+        cache_context: str | None,
+        prompt: str,
+    ):
+        """
+        把请求（或被采用的推测请求）接到悬浮窗、trace 和回答缓存上。
+        cache_context 为 None 时不写缓存；缓存键在结束时按实际回答的模型生成——
+        对冲 / 出错重试可能由另一个模型的端点胜出，不能记到默认模型名下。
+        """
+        stream.token_received.connect(self._floating_window.append_token)
+        stream.stream_finished.connect(self._floating_window.finish_stream)
+        stream.error_occurred.connect(self._floating_window.show_error)
+        stream.stream_finished.connect(lambda: tracing.finish(trace, "ok"))
+        stream.error_occurred.connect(lambda _: tracing.finish(trace, "error"))
+        if cache_context is not None:
+            # 只有正常结束的流才会发射 stream_finished，取消 / 出错都不会写缓存
+            def on_finished():
+                key = make_key(text, cache_context, hedged.model_name, prompt)
+                self._answer_cache.put(key, text, stream.answer_text)
+
+            stream.stream_finished.connect(on_finished)
+
+    def _record_history(
+        self, stream, hedged: HedgedStream, config: dict, text: str, context: str
+    ):
+        """流正常结束后把这次查词写入历史（写入在后台线程完成，这里只是入队）"""
+        if not config.get("history_enabled", True):
+            return
+        prompt = config.get("default_prompt", "请简明扼要地解释以下内容：\n\n{text}")
+        started = time.monotonic()
+        first_token = []
+
+        def on_token(_token: str):
+            if not first_token:
+                first_token.append(time.monotonic())
+
+        def on_finished():
+            answer = stream.answer_text
+            # 发送前已按该模型的分词器统计过 token，直接沿用
+            stats = hedged.stats()
+            self._history.record(
+                selection=text,
+                context=context,
+                model=hedged.model_name or config.get("model_name", ""),
+                prompt=prompt,
+                answer=answer,
+                ttft_ms=(first_token[0] - started) * 1000 if first_token else None,
+                total_ms=(time.monotonic() - started) * 1000,
+                prompt_tokens=stats.get("prompt_tokens", 0),
+                completion_tokens=stats.get("completion_tokens", 0),
+            )
+
+        stream.token_received.connect(on_token)
+        stream.stream_finished.connect(on_finished)
+
+    def _show_history(self):
+        """托盘菜单：历史记录面板（非模态，重复点击只是把已打开的面板提到最前）"""
+        if self._history_dialog is None:
+            from history_dialog import HistoryDialog
+
+            self._history_dialog = HistoryDialog(self._history)
+            self._history_dialog.open_requested.connect(self._open_history_entry)
+        self._history_dialog.show()
+        self._history_dialog.raise_()
+        self._history_dialog.activateWindow()
+
+    def _open_history_entry(self, entry_id: int):
+        """在悬浮窗中重新打开一条历史回答，不发网络请求"""
+        entry = self._history.get(entry_id)
+        if entry is None:
+            return
+        self._cancel_current_request()
+        pos = QCursor.pos()
+        self._floating_window.show_at(pos.x(), pos.y())
+        self._floating_window.append_token(entry["answer"])
+        self._floating_window.finish_stream()
+
     def _on_no_text(self):
+        import pyautogui
+
         mouse_x, mouse_y = pyautogui.position()
         self._toast.show_at(mouse_x, mouse_y)
 
     def _cancel_current_request(self):
-        if self._llm_worker and self._llm_worker.isRunning():
+        # 已结束的 trace 不会被重复记录
+        tracing.finish(self._trace, "cancelled")
+        self._trace = tracing.NULL_TRACE
+        # 取消会直接关闭响应流，不在 UI 线程等待请求线程
+        if self._llm_worker is not None:
             self._llm_worker.cancel()
-            self._llm_worker.quit()
-            self._llm_worker.wait(2000)
             self._llm_worker = None
 
+    def _show_latency_stats(self):
+        """托盘菜单：最近 N 次查词各阶段的 p50 / p95"""
+        summary = tracing.tracer.summary()
+        if not summary:
+            QMessageBox.information(None, "📊 延迟统计", "还没有查词记录哦，先划个词试试吧～")
+            return
+
+        lines = [f"{'阶段':<28}{'p50(ms)':>10}{'p95(ms)':>10}{'次数':>6}"]
+        for name, item in sorted(summary.items()):
+            lines.append(
+                f"{name:<28}{item['p50']:>10.1f}{item['p95']:>10.1f}{item['count']:>6}"
+            )
+        import http_pool
+
+        pool = http_pool.stats()
+        lines.append("")
+        lines.append(
+            f"连接池：复用 {pool['pool_hits']} 次 / 新建连接 {pool['new_connections']} 次"
+        )
+        no_text = tracing.tracer.unrecorded.get("no_text", 0)
+        if no_text:
+            lines.append(f"未选中文字的按键：{no_text} 次（不计入统计）")
+        local_model = sys.modules.get("local_model")
+        if local_model is not None:
+            local = local_model.stats()
+            lines.append(
+                f"本地模型：{local['state']}，加载用时 {local['load_ms'] / 1000:.1f}s，"
+                f"上下文长度 {local['n_ctx']}"
+            )
+        spec = self._speculation_stats.stats()
+        if spec["started"]:
+            lines.append(
+                f"推测请求：发起 {spec['started']} 次 / 沿用 {spec['wins']} 次 "
+                f"({spec['win_rate']:.0%}) / 浪费约 {spec['wasted_tokens']} tokens"
+            )
+        endpoints = self._endpoints.stats()
+        if len(endpoints["endpoints"]) > 1:
+            for name, item in endpoints["endpoints"].items():
+                lines.append(
+                    f"端点 {name}：首 token p50 {item['p50_ms']:.0f}ms / "
+                    f"p95 {item['p95_ms']:.0f}ms，胜出 {item['wins']} 次，"
+                    f"失败 {item['failures']} 次"
+                )
+            lines.append(
+                f"对冲请求：发出 {endpoints['hedges_fired']} 次 / "
+                f"胜出 {endpoints['hedges_won']} 次；出错换端点重试 "
+                f"{endpoints['retries_fired']} 次 / 成功 {endpoints['retries_won']} 次"
+            )
+        lines.append("@ 表示相对按键时刻的偏移，Σ 表示单次查词内的累计耗时")
+
+        box = QMessageBox()
+        box.setWindowTitle("📊 延迟统计")
+        box.setText("<pre>" + "\n".join(lines) + "</pre>")
+        box.exec()
+
     def _show_settings(self):
+        from settings_dialog import SettingsDialog
+
         dialog = SettingsDialog()
         dialog.exec()
 
     def _quit(self):
+        self._unsubscribe_config()
         self._hotkey_listener.stop()
+        self._discard_speculation()
         self._cancel_current_request()
+        # 只关闭已经加载过的模块，不为了退出而去导入它们
+        http_pool = sys.modules.get("http_pool")
+        if http_pool is not None:
+            http_pool.close_all()
+        for name in ("request_executor", "async_llm_client", "local_model"):
+            module = sys.modules.get(name)
+            if module is not None:
+                module.shutdown()
+        self._answer_cache.close()
+        self._history.close()
+        local_dictionary.close()
         self._tray.hide()
         QApplication.instance().quit()
 
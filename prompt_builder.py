@@ -0,0 +1,240 @@
+"""
+Prompt 组装模块
+发请求前把选中文本和上下文填进 Prompt 模板，并按模型的 token 预算裁剪上下文
+
+预算按模型配置（model_token_budgets），没有单独配置的模型用 prompt_token_budget；
+模板只解析一次，固定部分的 token 数按分词器缓存
+
+消息布局（prompt_cache_layout）：
+- 开启（默认）：system = 模板里的固定指令（占位符换成指向下文的说明），
+  user = 上下文在前、选中文本在最后。DeepSeek / OpenAI 等服务端会自动缓存请求的公共前缀，
+  同一页上再次查词时只有末尾的选中文本是新的，首 token 更快、缓存部分计费更低
+- 关闭：整个模板填充后作为一条 user 消息（上下文在模板中间，前缀每页都不同）
+"""
+
+import functools
+import threading
+
+from context_selector import select_context
+import tokenizer as _tokenizer
+from tokenizer import get_tokenizer
+
+
+# 缓存友好布局中 user 消息各部分的标题，以及 system 消息里替换占位符的说明
+CONTEXT_HEADING = "## 上下文（用户当前正在阅读的页面内容）"
+TEXT_HEADING = "## 用户选中的文本"
+_CONTEXT_REF = "（见用户消息中的「上下文」部分）"
+_TEXT_REF = "（见用户消息最后的「用户选中的文本」部分）"
+
+
+class PromptTemplate:
+    """
+    解析过的 Prompt 模板。
+
+    模板里除占位符以外的固定文字（系统提示词）每次查词都一样，
+    它的 token 数按分词器和布局只算一次。
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.has_context = "{context}" in template
+        # 缓存友好布局的 system 消息：与选中文本、页面都无关，所有查词逐字节相同
+        self.system = (
+            template.replace("{context}", _CONTEXT_REF).replace("{text}", _TEXT_REF).strip()
+        )
+        self._static_texts = {
+            False: template.replace("{text}", "").replace("{context}", ""),
+            True: "\n".join((self.system, CONTEXT_HEADING, TEXT_HEADING)),
+        }
+        self._static_tokens: dict[tuple[str, bool], int] = {}
+        self._lock = threading.Lock()
+
+    def static_tokens(self, tokenizer, cache_layout: bool = False) -> int:
+        key = (tokenizer.name, cache_layout)
+        with self._lock:
+            count = self._static_tokens.get(key)
+            if count is None:
+                count = tokenizer.count(self._static_texts[cache_layout])
+                self._static_tokens[key] = count
+            return count
+
+    def render(self, text: str, context: str = "") -> str:
+        return self.template.replace("{text}", text).replace("{context}", context)
+
+    def messages(self, text: str, context: str = "", cache_layout: bool = False) -> list[dict]:
+        """组装 chat/completions 的 messages"""
+        if not cache_layout:
+            return [{"role": "user", "content": self.render(text, context)}]
+        # 顺序固定：system（全局不变）→ 上下文（同一页不变）→ 选中文本（每次不同）
+        sections = []
+        if self.has_context and context:
+            sections.append(f"{CONTEXT_HEADING}\n{context}")
+        sections.append(f"{TEXT_HEADING}\n{text}")
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": "\n\n".join(sections)},
+        ]
+
+
+@functools.lru_cache(maxsize=16)
+def compile_template(template: str) -> PromptTemplate:
+    return PromptTemplate(template)
+
+
+def render_prompt(template: str, text: str, context: str = "") -> str:
+    """只填充占位符，不做预算裁剪"""
+    return compile_template(template).render(text, context)
+
+
+class BuiltPrompt:
+    """一次组装结果：最终 messages 及其 token 统计"""
+
+    def __init__(
+        self,
+        messages: list[dict],
+        prompt_tokens: int,
+        context_tokens: int,
+        budget: int,
+        truncated: bool,
+        tokenizer: str,
+        cache_layout: bool = False,
+    ):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+        self.context_tokens = context_tokens
+        self.budget = budget
+        self.truncated = truncated
+        self.tokenizer = tokenizer
+        self.cache_layout = cache_layout
+
+    def to_dict(self) -> dict:
+        return {
+            "tokens": self.prompt_tokens,
+            "context_tokens": self.context_tokens,
+            "budget": self.budget,
+            "truncated": self.truncated,
+            "tokenizer": self.tokenizer,
+            "layout": "cached" if self.cache_layout else "single",
+        }
+
+
+class PromptBuilder:
+    """
+    按模型预算组装 Prompt。
+
+    标准解释：
+    固定部分（模板）+ 选中文本的 token 数先扣掉，剩下的预算留给上下文；
+    上下文超出时以选中内容为中心重新挑选（与划词时的上下文选择同一套算法），
+    但改用该模型的分词器计数，中英文页面都能准确卡在预算内。
+    缓存友好布局下按固定窗口重新挑选，保证同一页上的上下文仍然逐字节相同。
+    选中文本本身不裁剪。
+
+    小学生解释：
+    每个 AI 一次能听的话有限。我们先数一数"题目"和"你划的词"用了多少字，
+    剩下的名额才留给文章；文章太长，就只念你划词附近最要紧的那几段。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tokenizer_kind = "auto"
+        self.default_budget = 4000
+        self.model_budgets: dict[str, int] = {}
+        self.cache_layout = True
+
+    def configure(self, config: dict):
+        with self._lock:
+            self.tokenizer_kind = config.get("tokenizer", "auto")
+            self.default_budget = int(config.get("prompt_token_budget", 4000))
+            self.model_budgets = {
+                name: int(budget)
+                for name, budget in (config.get("model_token_budgets") or {}).items()
+            }
+            self.cache_layout = bool(config.get("prompt_cache_layout", True))
+
+    def budget_for(self, model_name: str) -> int:
+        with self._lock:
+            return self.model_budgets.get(model_name, self.default_budget)
+
+    def tokenizer_for(self, model_name: str):
+        return get_tokenizer(model_name, self.tokenizer_kind)
+
+    def preload(self, model_names, offline: bool = False, timeout: float = 3.0):
+        """（启动预热）提前加载这些模型的分词器，配置为 approx 时什么也不做"""
+        if self.tokenizer_kind == "approx":
+            return
+        _tokenizer.preload(model_names, offline=offline, timeout=timeout)
+
+    def build(
+        self, template: str, text: str, context: str, model_name: str, budget: int = 0
+    ) -> BuiltPrompt:
+        """budget > 0 时与配置的预算取较小值（本地模型受上下文长度限制）"""
+        tokenizer = self.tokenizer_for(model_name)
+        compiled = compile_template(template)
+        configured = self.budget_for(model_name)
+        budget = min(configured, budget) if budget > 0 else configured
+        cache_layout = self.cache_layout
+
+        fixed = compiled.static_tokens(tokenizer, cache_layout) + tokenizer.count(text)
+        context_tokens = 0
+        truncated = False
+        if compiled.has_context and context:
+            context_tokens = tokenizer.count(context)
+            if fixed + context_tokens > budget:
+                remaining = budget - fixed
+                context = (
+                    select_context(
+                        context,
+                        text,
+                        token_budget=remaining,
+                        count_tokens=tokenizer.count,
+                        stable=cache_layout,
+                    )
+                    if remaining > 0
+                    else ""
+                )
+                context_tokens = tokenizer.count(context)
+                truncated = True
+        else:
+            context = ""
+
+        return BuiltPrompt(
+            compiled.messages(text, context, cache_layout),
+            fixed + context_tokens,
+            context_tokens,
+            budget,
+            truncated,
+            tokenizer.name,
+            cache_layout,
+        )
+
+
+# 进程内唯一的 Prompt 组装器
+_builder = PromptBuilder()
+
+
+def configure(config: dict) -> None:
+    _builder.configure(config)
+
+
+def preload_tokenizers(model_names, offline: bool = False, timeout: float = 3.0) -> None:
+    _builder.preload(model_names, offline, timeout)
+
+
+def build(
+    template: str, text: str, context: str, model_name: str, budget: int = 0
+) -> BuiltPrompt:
+    return _builder.build(template, text, context, model_name, budget)
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """按当前配置下该模型的分词器计数（用于统计回答的 token 数）"""
+    return _builder.tokenizer_for(model_name).count(text)
+
+
+def tokenizer_name(model_name: str) -> str:
+    return _builder.tokenizer_for(model_name).name
+
+
+def cache_layout() -> bool:
+    """当前是否使用前缀缓存友好的消息布局（上下文选择需要跟着用固定窗口）"""
+    return _builder.cache_layout
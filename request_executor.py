@@ -0,0 +1,121 @@
+"""
+常驻请求执行器模块
+启动时创建固定数量的后台线程，之后所有 LLM 请求都作为任务投递进来，
+连续划词不再为每次查词新建线程
+"""
+
+import queue
+import threading
+
+
+class Job:
+    """一个已提交的任务：可查询是否结束、可限时等待"""
+
+    def __init__(self, func):
+        self._func = func
+        self._done = threading.Event()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _run(self):
+        try:
+            self._func()
+        finally:
+            self._done.set()
+
+
+class RequestExecutor:
+    """
+    常驻请求执行器。
+
+    标准解释：
+    维护一组长期存活的守护线程，从任务队列里取任务执行。线程数只增不减
+    （configure 可以调大），取消由任务自己负责（关闭响应流），
+    执行器从不阻塞调用方，也就不会卡住 UI 线程。
+
+    小学生解释：
+    以前每查一个词就临时招一个快递员，送完就辞退，下次再招。
+    现在公司里养着几个常驻快递员，有活就派，没活就在门口等着。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._jobs_run = 0
+        self._busy = 0
+        self._ensure_workers(max_workers)
+
+    def configure(self, config: dict):
+        self._ensure_workers(int(config.get("request_workers", 4)))
+
+    def submit(self, func) -> Job:
+        job = Job(func)
+        self._queue.put(job)
+        return job
+
+    def shutdown(self):
+        """通知所有线程在手头任务结束后退出（不等待）"""
+        with self._lock:
+            count = len(self._threads)
+        for _ in range(count):
+            self._queue.put(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threads": len(self._threads),
+                "busy": self._busy,
+                "jobs_run": self._jobs_run,
+            }
+
+    def _ensure_workers(self, count: int):
+        with self._lock:
+            while len(self._threads) < count:
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f"llm-request-{len(self._threads) + 1}",
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self._busy += 1
+            try:
+                job._run()
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._jobs_run += 1
+
+
+# 进程内唯一的请求执行器
+_executor = RequestExecutor()
+
+
+def configure(config: dict) -> None:
+    _executor.configure(config)
+
+
+def submit(func) -> Job:
+    return _executor.submit(func)
+
+
+def stats() -> dict:
+    return _executor.stats()
+
+
+def shutdown() -> None:
+    _executor.shutdown()
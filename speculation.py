@@ -0,0 +1,152 @@
+"""
+推测请求模块
+选中文本一到手就先发出 LLM 请求（只带窗口标题作上下文），与上下文获取并行；
+最终上下文与推测时相差不大则直接沿用这路回答，否则取消并带上下文重新请求
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from context_selector import estimate_tokens, select_context, term_containment
+
+# off      - 不做任何推测
+# connect  - 只提前建好 HTTP 连接
+# request  - 提前发出不带整页上下文的请求
+PREFETCH_POLICIES = ("off", "connect", "request")
+
+
+# 判断上下文差别时只看选中内容附近这么多 token（估算）
+NEIGHBORHOOD_TOKENS = 200
+
+
+def context_differs(
+    speculative: str, final: str, threshold: float, selection: str = ""
+) -> bool:
+    """
+    最终上下文是否与推测时使用的上下文有实质差别。
+    推测的回答只看过窗口标题，而标题几乎总会出现在页面正文里，看"标题是否出现在正文中"
+    等于总是沿用推测的回答、白白丢掉整页上下文。这里反过来：取最终上下文里选中内容
+    附近的一小段（与 select_context 同样的窗口），看它的词项有多少已经在推测时的上下文里；
+    比例低于 threshold 说明附近的正文提供了推测时没有的信息，需要带上下文重新请求。
+    """
+    final = final.strip()
+    speculative = speculative.strip()
+    if not final or final == speculative:
+        # 上下文获取失败（或同样只拿到窗口标题）：推测的回答已经是能拿到的最好结果
+        return False
+    neighborhood = select_context(
+        final, selection, token_budget=NEIGHBORHOOD_TOKENS, relevance=False
+    )
+    if selection:
+        # 选中内容本身已经在推测请求的 Prompt 里，不算新信息
+        neighborhood = neighborhood.replace(selection, " ")
+    return term_containment(neighborhood, speculative) < threshold
+
+
+class SpeculativeRequest(QObject):
+    """
+    一次推测请求。
+
+    标准解释：
+    包装一个已启动的 LLMStreamWorker，在被采用（adopt）之前把 token 缓存在内存里，
+    不上屏；adopt() 时一次性补发已缓存的内容，之后原样转发。
+    对外信号与 LLMStreamWorker 相同，控制器可以像对待普通请求一样接线。
+
+    小学生解释：
+    小特工还在翻文章的时候，接线员已经先把问题（只带上窗口名）打电话问 AI 了。
+    AI 的回答先记在小本子上，等文章翻完一看"差不多"，就直接把小本子念出来；
+    要是文章内容很关键，就挂掉这通电话，带上文章重新问。
+    """
+
+    token_received = pyqtSignal(str)
+    stream_finished = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, worker, selection: str, context: str, parent=None):
+        super().__init__(parent)
+        self.worker = worker
+        self.selection = selection
+        self.context = context
+        self.adopted = False
+        self._buffer: list[str] = []
+        self._finished = False
+        self._error: str | None = None
+        worker.token_received.connect(self._on_token)
+        worker.stream_finished.connect(self._on_finished)
+        worker.error_occurred.connect(self._on_error)
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    @property
+    def answer_text(self) -> str:
+        return self.worker.answer_text
+
+    def adopt(self):
+        """采用这路回答：补发已缓存的 token（以及已经到达的结束 / 出错状态）"""
+        self.adopted = True
+        if self._buffer:
+            self.token_received.emit("".join(self._buffer))
+            self._buffer.clear()
+        if self._error is not None:
+            self.error_occurred.emit(self._error)
+        elif self._finished:
+            self.stream_finished.emit()
+
+    def cancel(self) -> int:
+        """放弃这路回答，返回已经消耗（浪费）的 token 数：已发出的 Prompt + 已生成的回答（估算）"""
+        self.worker.cancel()
+        prompt_tokens = getattr(self.worker, "sent_prompt_tokens", 0)
+        return prompt_tokens + estimate_tokens(self.worker.answer_text)
+
+    def _on_token(self, token: str):
+        if self.adopted:
+            self.token_received.emit(token)
+        else:
+            self._buffer.append(token)
+
+    def _on_finished(self):
+        self._finished = True
+        if self.adopted:
+            self.stream_finished.emit()
+
+    def _on_error(self, message: str):
+        self._error = message
+        if self.adopted:
+            self.error_occurred.emit(message)
+
+
+class SpeculationStats:
+    """推测请求的命中率与浪费的 token 数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.wins = 0
+        self.discarded = 0
+        self.wasted_tokens = 0
+
+    def record_start(self):
+        with self._lock:
+            self.started += 1
+
+    def record_win(self):
+        with self._lock:
+            self.wins += 1
+
+    def record_discard(self, wasted_tokens: int):
+        with self._lock:
+            self.discarded += 1
+            self.wasted_tokens += wasted_tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "wins": self.wins,
+                "discarded": self.discarded,
+                "win_rate": self.wins / self.started if self.started else 0.0,
+                "wasted_tokens": self.wasted_tokens,
+            }
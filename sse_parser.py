@@ -0,0 +1,173 @@
+"""
+SSE 流解析模块
+直接在字节块上做 Server-Sent Events 分帧（正确处理跨读取边界和多行 data:），
+并用快速路径只取出 choices[0].delta.content，不必每个事件都完整解析 JSON
+"""
+
+import json
+
+# 可选的更快 JSON 后端：pip install orjson；未安装时退回标准库 json
+try:
+    import orjson
+
+    HAS_ORJSON = True
+
+    def _loads(data: bytes):
+        return orjson.loads(data)
+
+except ImportError:
+    HAS_ORJSON = False
+
+    def _loads(data: bytes):
+        return json.loads(data)
+
+
+DONE = b"[DONE]"
+_CONTENT_KEY = b'"content":'
+_USAGE_KEY = b'"usage"'
+
+
+class SSEDecoder:
+    """
+    增量 SSE 解码器。
+
+    标准解释：
+    feed() 接收任意切分的字节块，按行（\\n、\\r\\n 或 \\r）拆分；
+    同一事件的多行 data: 以 \\n 拼接，遇到空行才派发；注释行（以 : 开头）
+    与 event: / id: / retry: 等字段被忽略。收到 [DONE] 后 done 置为 True，
+    之后的数据全部丢弃。
+
+    小学生解释：
+    网络送来的是一截一截的"纸条碎片"，一句话可能被撕成两半。
+    解码器先把碎片拼好，等看到"空行"这个句号，才把整句话交出去。
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._data: list[bytes] = []
+        self._pending_cr = False
+        self.done = False
+        self.events = 0
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """喂入一块字节，返回其中完整事件的 data 内容列表"""
+        if self.done or not chunk:
+            return []
+        if self._pending_cr and chunk.startswith(b"\n"):
+            # 上一块以 \r 结尾、这一块以 \n 开头：是同一个 \r\n
+            chunk = chunk[1:]
+        self._pending_cr = chunk.endswith(b"\r")
+
+        buffer = self._buffer + chunk if self._buffer else chunk
+        if b"\n" not in chunk and b"\r" not in chunk:
+            # 还没有完整的行：只攒着，避免对长事件反复切分
+            self._buffer = buffer
+            return []
+        if b"\r" in buffer:
+            buffer = buffer.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        lines = buffer.split(b"\n")
+        self._buffer = lines.pop()
+
+        events = []
+        for line in lines:
+            if not line:
+                if self._data:
+                    events.append(self._dispatch())
+                    if self.done:
+                        break
+                continue
+            if line.startswith(b"data:"):
+                value = line[5:]
+                if value.startswith(b" "):
+                    value = value[1:]
+                self._data.append(value)
+            # 注释行与其它字段对 chat.completions 流没有意义，直接忽略
+        return events
+
+    def flush(self) -> list[bytes]:
+        """流结束：派发最后一个没有以空行收尾的事件（部分服务端会省略）"""
+        if self.done:
+            return []
+        line = self._buffer
+        self._buffer = b""
+        if line.startswith(b"data:"):
+            value = line[5:]
+            self._data.append(value[1:] if value.startswith(b" ") else value)
+        if self._data:
+            return [self._dispatch()]
+        return []
+
+    def _dispatch(self) -> bytes:
+        data = b"\n".join(self._data)
+        self._data = []
+        self.events += 1
+        if data == DONE:
+            self.done = True
+        return data
+
+
+def _string_end(data: bytes, start: int) -> int:
+    """从 start（开头引号之后）找到 JSON 字符串的结束引号位置，找不到返回 -1"""
+    pos = start
+    while True:
+        pos = data.find(b'"', pos)
+        if pos < 0:
+            return -1
+        backslashes = 0
+        check = pos - 1
+        while check >= start and data[check] == 0x5C:  # "\\"
+            backslashes += 1
+            check -= 1
+        if backslashes % 2 == 0:
+            return pos
+        pos += 1
+
+
+def extract_content(data: bytes) -> str | None:
+    """
+    从一个 chat.completion.chunk 事件中取出 choices[0].delta.content。
+
+    快速路径：事件里只有一个 "content" 键时，直接定位其字符串值，
+    只对这一小段做 JSON 反转义；其它情况（多个 choice、值为 null 等）
+    退回完整解析。没有 content 的事件（role、usage、finish_reason）不解析。
+    JSON 损坏时抛出 ValueError，由调用方计数。
+    """
+    index = data.find(_CONTENT_KEY)
+    if index < 0:
+        return None
+    pos = index + len(_CONTENT_KEY)
+    if data[pos : pos + 1] == b" ":
+        pos += 1
+    if data[pos : pos + 1] == b'"' and data.endswith(b"}"):
+        end = data.find(b'"', pos + 1)
+        if end > 0 and data[end - 1] == 0x5C:  # 以反斜杠结尾，可能是转义引号
+            end = _string_end(data, pos + 1)
+        # 只有一个 content 键（单个 choice）时快速路径才等价于完整解析
+        if end > 0 and data.find(_CONTENT_KEY, end) < 0:
+            literal = data[pos : end + 1]
+            if b"\\" not in literal:
+                return literal[1:-1].decode("utf-8")
+            return json.loads(literal)
+    elif data[pos : pos + 4] == b"null":
+        return None
+
+    chunk = _loads(data)
+    choices = chunk.get("choices") or [{}]
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or None
+
+
+def extract_usage(data: bytes) -> dict | None:
+    """
+    从事件中取出 usage（请求带 stream_options.include_usage 时，最后一个事件携带）。
+    不含 usage 的事件不解析；JSON 损坏时抛出 ValueError。
+    """
+    index = data.find(_USAGE_KEY)
+    if index < 0:
+        return None
+    # OpenAI 在带 include_usage 时每个事件都有 "usage": null，不为它完整解析
+    pos = data.find(b":", index + len(_USAGE_KEY)) + 1
+    if data[pos : pos + 5].lstrip().startswith(b"null"):
+        return None
+    usage = _loads(data).get("usage")
+    return usage if isinstance(usage, dict) else None
@@ -0,0 +1,93 @@
+"""
+Token 合并模块
+在后台线程缓冲 SSE 增量文本，按显示帧节奏批量推送给 UI 线程
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+
+class TokenCoalescer(QObject):
+    """
+    Token 合并器。
+
+    标准解释：
+    工作线程每收到一段 delta 就调用 push()。第一段立即推送（不拖慢首字出现），
+    之后的 delta 先进缓冲区，由 UI 线程上的单次定时器在 interval_ms 后统一
+    合并推送，保证每个显示帧最多触发一次渲染 / 滚动 / 调整高度。
+    同时统计收到的 delta 数和实际触发的 UI 更新次数。
+
+    小学生解释：
+    快递员以前每拿到一颗糖就跑一趟送到你家，跑断了腿。
+    现在第一颗糖马上送到，之后的糖先装进袋子，每隔一小会儿送一袋。
+
+    注意：必须在 UI 线程创建（定时器跟随创建线程）。
+    """
+
+    _flush_requested = pyqtSignal()
+
+    def __init__(self, emit, interval_ms: int = 16, parent=None):
+        super().__init__(parent)
+        self._emit = emit
+        self._interval_ms = max(0, int(interval_ms))
+        self._lock = threading.Lock()
+        self._buffer: list[str] = []
+        self._first = True
+        self._scheduled = False
+        self._cancelled = False
+        self.deltas_received = 0
+        self.ui_updates = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        # 工作线程发射 → 自动排队到 UI 线程执行
+        self._flush_requested.connect(self._start_timer)
+
+    def push(self, delta: str):
+        """（任意线程）收到一段新文本"""
+        with self._lock:
+            if self._cancelled:
+                return
+            self.deltas_received += 1
+            if self._first or self._interval_ms == 0:
+                # 首个 token 立即推送，不影响首字出现时间
+                self._first = False
+                self.ui_updates += 1
+                self._emit(delta)
+                return
+            self._buffer.append(delta)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._flush_requested.emit()
+
+    def flush(self):
+        """（任意线程）立即推送缓冲区里的全部文本"""
+        with self._lock:
+            self._scheduled = False
+            if self._cancelled or not self._buffer:
+                return
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self.ui_updates += 1
+            # 持锁发射，保证与其它线程的 flush 顺序一致
+            self._emit(text)
+
+    def cancel(self):
+        """丢弃缓冲区，之后的 push 全部忽略"""
+        with self._lock:
+            self._cancelled = True
+            self._buffer.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "deltas_received": self.deltas_received,
+                "ui_updates": self.ui_updates,
+            }
+
+    def _start_timer(self):
+        if not self._timer.isActive():
+            self._timer.start(self._interval_ms)
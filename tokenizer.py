@@ -0,0 +1,145 @@
+"""
+离线分词计数模块
+发请求前统计 Prompt 的 token 数：默认用快速估算；安装了 tiktoken 时可用 BPE 精确计数
+
+tiktoken 是可选依赖（pip install tiktoken），对 OpenAI 模型是精确值，
+对 DeepSeek / Qwen 等其它模型是比字符估算准得多的近似值。
+编码表在启动后的后台预热中加载（preload），查词路径上从不同步加载、也不联网：
+还没加载好时先用估算，同时在后台加载；加载失败（未安装、离线环境下载不到编码表）时一直用估算。
+离线模式（本地模型后端）只使用已缓存的编码表，不尝试下载。
+"""
+
+import hashlib
+import importlib.util
+import os
+import tempfile
+import threading
+
+from context_selector import estimate_tokens
+
+# tiktoken 是可选依赖；导入本身要几十毫秒，只在第一次需要 BPE 计数时才导入
+HAS_TIKTOKEN = importlib.util.find_spec("tiktoken") is not None
+
+# auto   - 装了 tiktoken 就用 BPE，否则（或编码表加载失败时）估算
+# approx - 总是估算（最快）
+TOKENIZER_KINDS = ("auto", "approx")
+
+# 不在 tiktoken 模型表里的模型（DeepSeek、Qwen 等）使用的编码
+_FALLBACK_ENCODING = "cl100k_base"
+# tiktoken 下载编码表的地址（缓存文件名是它的 SHA-1，见 tiktoken.load.read_file_cached）
+_ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/{}.tiktoken"
+
+
+class ApproxTokenizer:
+    """字符估算：CJK 字符每个约 1 token，其余约 4 个字符 1 token"""
+
+    name = "approx"
+    exact = False
+
+    def count(self, text: str) -> int:
+        return estimate_tokens(text)
+
+
+class TiktokenTokenizer:
+    """tiktoken BPE 计数"""
+
+    exact = True
+
+    def __init__(self, encoding):
+        self._encoding = encoding
+        self.name = f"tiktoken:{encoding.name}"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        # 用户文本里可能恰好出现 <|endoftext|> 这类特殊标记，按普通文本计数
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+_lock = threading.Lock()
+_tokenizers: dict[str, "ApproxTokenizer | TiktokenTokenizer"] = {}
+# 正在后台加载的模型：model_name -> 加载完成事件
+_loading: dict[str, threading.Event] = {}
+_offline = False
+_approx = ApproxTokenizer()
+
+
+def _encoding_cached(encoding_name: str) -> bool:
+    """tiktoken 的本地缓存里是否已有这个编码表（有则加载不会联网）"""
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR") or os.environ.get("DATA_GYM_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return False
+    url = _ENCODING_URL.format(encoding_name)
+    return os.path.exists(os.path.join(cache_dir, hashlib.sha1(url.encode()).hexdigest()))
+
+
+def _load_tiktoken(model_name: str, offline: bool):
+    try:
+        import tiktoken
+        from tiktoken.model import encoding_name_for_model
+
+        try:
+            encoding_name = encoding_name_for_model(model_name)
+        except KeyError:
+            encoding_name = _FALLBACK_ENCODING
+        if offline and not _encoding_cached(encoding_name):
+            return None
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception:
+        # 离线环境首次使用时下载编码表会失败
+        return None
+    return TiktokenTokenizer(encoding)
+
+
+def _start_loading(model_name: str) -> threading.Event:
+    """（持有 _lock 时调用）在后台线程加载该模型的编码表，返回加载完成事件"""
+    done = _loading.get(model_name)
+    if done is not None:
+        return done
+    done = threading.Event()
+    _loading[model_name] = done
+    offline = _offline
+
+    def _run():
+        tokenizer = _load_tiktoken(model_name, offline) or _approx
+        with _lock:
+            _tokenizers[model_name] = tokenizer
+            _loading.pop(model_name, None)
+        done.set()
+
+    threading.Thread(target=_run, name="tokenizer-load", daemon=True).start()
+    return done
+
+
+def preload(model_names, offline: bool = False, timeout: float = 3.0) -> None:
+    """
+    （启动预热 / 批量脚本）加载这些模型的编码表，最多等待 timeout 秒。
+    offline=True 时只使用已缓存的编码表；超时的加载在后台继续，完成后自动启用。
+    """
+    global _offline
+    if not HAS_TIKTOKEN:
+        return
+    with _lock:
+        _offline = offline
+        events = [
+            _start_loading(name) for name in dict.fromkeys(model_names) if name not in _tokenizers
+        ]
+    for done in events:
+        done.wait(timeout)
+
+
+def get_tokenizer(model_name: str = "", kind: str = "auto"):
+    """
+    按模型和配置返回分词器。编码表还没加载好时返回估算器，
+    并在后台开始加载（不阻塞调用方，也不在调用方线程里联网）。
+    """
+    if kind == "approx" or not HAS_TIKTOKEN:
+        return _approx
+    with _lock:
+        tokenizer = _tokenizers.get(model_name)
+        if tokenizer is None:
+            _start_loading(model_name)
+            return _approx
+        return tokenizer
@@ -0,0 +1,300 @@
+"""
+端到端延迟追踪模块
+记录一次划词从按键到首个 token 上屏的各阶段耗时（单调时钟），
+写入滚动的 JSONL 文件，并汇总最近 N 次查词的 p50 / p95
+"""
+
+import contextlib
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from config import CONFIG_DIR
+
+TRACE_FILE = CONFIG_DIR / "traces.jsonl"
+
+# 这些结束状态不算一次查词（如没选中文字的空按键）：不落盘、不进分位数窗口，只计数
+UNRECORDED_STATUSES = frozenset({"no_text"})
+
+
+class Trace:
+    """
+    一次查词的追踪记录。
+
+    span    - 有起止时间的阶段（如 extract_text、llm.connect）
+    mark    - 瞬时事件，记录相对按键时刻的偏移（如 llm.first_delta、ui.first_paint）
+    counter - 高频小操作的累计耗时（如每次 append_token 的渲染），只记次数 / 总和 / 最大值
+    所有时间都以毫秒为单位，相对 trace 开始时刻。
+    """
+
+    def __init__(self, trace_id: int):
+        self.trace_id = trace_id
+        self.start_ns = time.monotonic_ns()
+        self.wall_time = time.time()
+        self.spans: list[dict] = []
+        self.marks: dict[str, float] = {}
+        self.counters: dict[str, dict] = {}
+        self.attrs: dict = {}
+        self.status = ""
+        self._lock = threading.Lock()
+
+    def _offset_ms(self, ns: int) -> float:
+        return (ns - self.start_ns) / 1e6
+
+    def add_span(self, name: str, start_ns: int, end_ns: int):
+        with self._lock:
+            self.spans.append(
+                {
+                    "name": name,
+                    "start_ms": round(self._offset_ms(start_ns), 3),
+                    "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+                }
+            )
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        start = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.monotonic_ns())
+
+    def mark(self, name: str, once: bool = True):
+        """记录瞬时事件；once=True 时只保留第一次"""
+        offset = round(self._offset_ms(time.monotonic_ns()), 3)
+        with self._lock:
+            if once and name in self.marks:
+                return
+            self.marks[name] = offset
+
+    def accumulate(self, name: str, duration_ns: int):
+        duration_ms = duration_ns / 1e6
+        with self._lock:
+            counter = self.counters.setdefault(
+                name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            counter["count"] += 1
+            counter["total_ms"] += duration_ms
+            counter["max_ms"] = max(counter["max_ms"], duration_ms)
+
+    @contextlib.contextmanager
+    def measure(self, name: str):
+        """累计型计时：with trace.measure("ui.render"): ..."""
+        start = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            self.accumulate(name, time.monotonic_ns() - start)
+
+    def set(self, key: str, value):
+        with self._lock:
+            self.attrs[key] = value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.trace_id,
+                "time": self.wall_time,
+                "status": self.status,
+                "total_ms": round(self._offset_ms(time.monotonic_ns()), 3),
+                "spans": list(self.spans),
+                "marks": dict(self.marks),
+                "counters": {
+                    name: {
+                        "count": c["count"],
+                        "total_ms": round(c["total_ms"], 3),
+                        "max_ms": round(c["max_ms"], 3),
+                    }
+                    for name, c in self.counters.items()
+                },
+                "attrs": dict(self.attrs),
+            }
+
+
+class _NullTrace:
+    """未启用追踪 / 没有进行中的 trace 时使用，所有操作都是空操作"""
+
+    trace_id = 0
+
+    def add_span(self, name, start_ns, end_ns):
+        pass
+
+    def span(self, name):
+        return contextlib.nullcontext()
+
+    def mark(self, name, once=True):
+        pass
+
+    def accumulate(self, name, duration_ns):
+        pass
+
+    def measure(self, name):
+        return contextlib.nullcontext()
+
+    def set(self, key, value):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Tracer:
+    """
+    延迟追踪器。
+
+    标准解释：
+    start_trace() 在按下热键时创建新 trace 并设为"当前 trace"，
+    各模块通过 current() 取到它记录阶段耗时；finish() 把结果写入滚动 JSONL 文件
+    （超过上限自动轮转），同时保存在内存里供 summary() 计算最近 N 次的分位数。
+
+    小学生解释：
+    给每次查词配一个秒表，按 Shift 时开始计时，
+    剪贴板、读文章、连服务器、AI 第一个字、画到屏幕上……每一步都掐一下表。
+    最后把成绩单存起来，就知道慢在哪一步了。
+    """
+
+    def __init__(
+        self, path=TRACE_FILE, max_bytes: int = 2 * 1024 * 1024, backups: int = 3
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._current: Trace | None = None
+        self._recent: deque[dict] = deque(maxlen=200)
+        self._logger = None
+        self.unrecorded: dict[str, int] = {}
+
+    def configure(self, config: dict):
+        self.enabled = bool(config.get("trace_enabled", True))
+        history = int(config.get("trace_history", 200))
+        with self._lock:
+            if history != self._recent.maxlen:
+                self._recent = deque(self._recent, maxlen=history)
+
+    # ==================== trace 生命周期 ====================
+
+    def start_trace(self) -> "Trace | _NullTrace":
+        if not self.enabled:
+            return NULL_TRACE
+        trace = Trace(next(self._ids))
+        with self._lock:
+            self._current = trace
+        return trace
+
+    def current(self) -> "Trace | _NullTrace":
+        with self._lock:
+            return self._current or NULL_TRACE
+
+    def finish(self, trace, status: str = "ok"):
+        """结束 trace 并落盘；同一个 trace 只会结束一次，UNRECORDED_STATUSES 只计数"""
+        if not isinstance(trace, Trace):
+            return
+        with self._lock:
+            if trace.status:
+                return
+            trace.status = status
+            if self._current is trace:
+                self._current = None
+            if status in UNRECORDED_STATUSES:
+                self.unrecorded[status] = self.unrecorded.get(status, 0) + 1
+                return
+        record = trace.to_dict()
+        with self._lock:
+            self._recent.append(record)
+        self._write(record)
+
+    def _write(self, record: dict):
+        try:
+            if self._logger is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    self.path,
+                    maxBytes=self.max_bytes,
+                    backupCount=self.backups,
+                    encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger = logging.getLogger("floating_word_explainer.trace")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                logger.addHandler(handler)
+                self._logger = logger
+            self._logger.info(json.dumps(record, ensure_ascii=False))
+        except OSError:
+            pass
+
+    # ==================== 汇总 ====================
+
+    def summary(self, last_n: int | None = None) -> dict:
+        """
+        最近 N 次查词各指标的 p50 / p95（毫秒）。
+        span 取时长；mark 取相对按键的偏移；counter 取每次查词的累计总耗时；
+        #tokens.* 是发送前统计的 token 数（不是毫秒），ms/token 是首个到最后一个 delta 间每 token 的耗时。
+        """
+        with self._lock:
+            records = list(self._recent)
+        if last_n:
+            records = records[-last_n:]
+
+        samples: dict[str, list[float]] = {}
+        for record in records:
+            for span in record["spans"]:
+                samples.setdefault(span["name"], []).append(span["duration_ms"])
+            for name, offset in record["marks"].items():
+                samples.setdefault(f"@{name}", []).append(offset)
+            for name, counter in record["counters"].items():
+                samples.setdefault(f"Σ{name}", []).append(counter["total_ms"])
+            samples.setdefault("total", []).append(record["total_ms"])
+            tokens = record["attrs"].get("tokens")
+            if tokens:
+                samples.setdefault("#tokens.prompt", []).append(tokens["prompt"])
+                samples.setdefault("#tokens.completion", []).append(tokens["completion"])
+                if tokens.get("source") == "usage":
+                    samples.setdefault("#tokens.cached", []).append(tokens.get("cached", 0))
+                marks = record["marks"]
+                if tokens["completion"] > 1 and "llm.first_delta" in marks:
+                    decode_ms = marks.get("llm.last_delta", 0) - marks["llm.first_delta"]
+                    samples.setdefault("ms/token", []).append(
+                        decode_ms / (tokens["completion"] - 1)
+                    )
+
+        return {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            }
+            for name, values in samples.items()
+        }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """最近秩法分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+# 进程内唯一的追踪器
+tracer = Tracer()
+
+
+def start_trace():
+    return tracer.start_trace()
+
+
+def current():
+    return tracer.current()
+
+
+def finish(trace, status: str = "ok") -> None:
+    tracer.finish(trace, status)
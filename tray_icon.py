@@ -47,6 +47,8 @@ class TrayIcon(QSystemTrayIcon):
     """
 
     settings_requested = pyqtSignal()
+    history_requested = pyqtSignal()
+    latency_stats_requested = pyqtSignal()
     quit_requested = pyqtSignal()
 
     def __init__(self, parent=None):
@@ -62,6 +64,12 @@ class TrayIcon(QSystemTrayIcon):
         settings_action = menu.addAction("⚙️ 设置")
         settings_action.triggered.connect(self.settings_requested.emit)
 
+        history_action = menu.addAction("🕘 历史记录")
+        history_action.triggered.connect(self.history_requested.emit)
+
+        stats_action = menu.addAction("📊 延迟统计")
+        stats_action.triggered.connect(self.latency_stats_requested.emit)
+
         menu.addSeparator()
 
         quit_action = menu.addAction("❌ 退出")